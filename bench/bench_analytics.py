@@ -0,0 +1,73 @@
+"""Answer log reports over a large synthetic history.
+
+Writes `rows` random answers (1M users, 500 verbs, 5 levels) as chunks
+in the answer log format into a temporary directory, then times
+analytics.aggregate() over them. Needs NumPy, like analytics.py.
+
+    python bench/bench_analytics.py [rows] [--keep DIR]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, SRC)
+
+from analytics import aggregate, np, report  # noqa: E402
+from answer_log import MODES, write_chunk  # noqa: E402
+
+CHUNK_ROWS = 1 << 20
+VERBS = [f"verb{i}" for i in range(500)]
+
+
+def write_history(directory, rows, seed=1):
+    rng = np.random.default_rng(seed)
+    # Трудность глагола задаёт вероятность ошибки
+    difficulty = rng.uniform(0.02, 0.6, len(VERBS))
+    written, n = 0, 0
+    while written < rows:
+        size = min(CHUNK_ROWS, rows - written)
+        verb = rng.integers(0, len(VERBS), size, dtype=np.uint16)
+        columns = [
+            rng.integers(1, 1_000_000, size, dtype=np.int64),
+            verb,
+            rng.integers(0, len(MODES), size, dtype=np.uint8),
+            (verb % 5 + 1).astype(np.uint8),
+            (rng.random(size) >= difficulty[verb]).astype(np.uint8),
+            rng.integers(500, 20_000, size, dtype=np.uint32),
+            np.full(size, int(time.time()), dtype=np.uint32),
+        ]
+        n += 1
+        write_chunk(os.path.join(directory, f"bench-{n:06d}.cols"), size, columns, VERBS)
+        written += size
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("rows", type=int, nargs="?", default=10_000_000)
+    parser.add_argument("--keep", help="write chunks here and keep them")
+    args = parser.parse_args()
+
+    directory = args.keep or tempfile.mkdtemp(prefix="answer-log-")
+    os.makedirs(directory, exist_ok=True)
+    try:
+        started = time.perf_counter()
+        write_history(directory, args.rows)
+        print(f"wrote {args.rows:,} rows in {time.perf_counter() - started:.1f}s")
+
+        paths = sorted(os.path.join(directory, p) for p in os.listdir(directory))
+        started = time.perf_counter()
+        result = aggregate(paths)
+        elapsed = time.perf_counter() - started
+        report(result, top=5, min_answers=50)
+        print(f"\naggregate: {elapsed:.2f}s, {args.rows / elapsed / 1e6:.1f}M rows/s")
+    finally:
+        if not args.keep:
+            shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
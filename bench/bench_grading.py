@@ -0,0 +1,131 @@
+"""Grade a corpus of answers with the old per-message checks and the compiled engine.
+
+Verdicts must be identical; timings show the cost per graded answer.
+
+    python bench/bench_grading.py [repeat]
+"""
+import json
+import os
+import random
+import sys
+import time
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, SRC)
+
+from grading import check_forms, check_speed, check_translation, compile_answers  # noqa: E402
+
+
+# ---------- старые проверки из process_forms / process_speed / process_translation ----------
+
+def legacy_normalize_forms(value):
+    if isinstance(value, list):
+        return [v.lower().strip() for v in value]
+    if isinstance(value, str):
+        return [v.lower().strip() for v in value.split("/")]
+    return []
+
+
+def legacy_norm(text):
+    return [p.strip().lower() for p in text.replace(",", " ").split() if p.strip()]
+
+
+def legacy_forms(verb, text):
+    past_forms = legacy_normalize_forms(verb["past"])
+    part_forms = legacy_normalize_forms(verb["part"])
+    user_input = text.lower().strip()
+    if "," in user_input:
+        parts = [p.strip() for p in user_input.split(",")]
+    else:
+        raw = user_input.split()
+        if len(raw) == 3:
+            parts = [" ".join(raw[:-1]), raw[-1]]
+        elif len(raw) == 2:
+            parts = raw
+        elif len(raw) > 3:
+            parts = [raw[0], " ".join(raw[1:])]
+        else:
+            parts = []
+    if len(parts) != 2:
+        return False
+    return all(p in past_forms for p in parts[0].split()) and parts[1] in part_forms
+
+
+def legacy_speed(verb, text):
+    ans = legacy_norm(text)
+    past_forms = legacy_normalize_forms(verb["past"])
+    part_forms = legacy_normalize_forms(verb["part"])
+    return len(ans) >= 2 and ans[0] in past_forms and ans[1] in part_forms
+
+
+def legacy_translation(verb, text):
+    expected = [p.strip() for p in verb["ru"].lower().replace(",", "/").split("/")]
+    return any(text.lower() == e or text.lower() in e for e in expected)
+
+
+# ---------- корпус ответов ----------
+
+def build_corpus(verbs, rnd):
+    corpus = []
+    for i, v in enumerate(verbs):
+        past = legacy_normalize_forms(v["past"])
+        part = legacy_normalize_forms(v["part"])
+        ru = [p.strip() for p in v["ru"].replace(",", "/").split("/")]
+        other = verbs[rnd.randrange(len(verbs))]
+        answers = [
+            f"{past[0]} {part[0]}",
+            f"{past[0]}, {part[-1]}",
+            f"{past[-1].upper()},{part[0]}",
+            " ".join(past + part[:1]),
+            f"  {past[0]}   {part[0]}  ",
+            f"{v['inf']} {v['inf']}",
+            f"{past[0]}",
+            f"{past[0]} {part[0]} extra words here",
+            f"{past[0]}, {part[0]}, {part[0]}",
+            f", {part[0]}",
+            ru[0],
+            ru[-1].upper(),
+            ru[0][: max(1, len(ru[0]) // 2)],
+            v["ru"],
+            other["ru"],
+            other["inf"],
+            "".join(rnd.choice("абвгдежзabcdefg ,") for _ in range(rnd.randrange(1, 12))),
+        ]
+        corpus.extend((i, a) for a in answers)
+    return corpus
+
+
+def timed(fn, corpus, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        verdicts = [fn(i, text) for i, text in corpus]
+    return verdicts, (time.perf_counter() - start) / (repeat * len(corpus))
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+
+    with open(os.path.join(SRC, "verbs.json"), encoding="utf-8") as f:
+        verbs = json.load(f)
+    answers = compile_answers(verbs)
+    corpus = build_corpus(verbs, random.Random(7))
+
+    modes = [
+        ("forms", legacy_forms, check_forms),
+        ("speed", legacy_speed, check_speed),
+        ("translation", legacy_translation, check_translation),
+    ]
+    print(f"{len(corpus)} answers x {repeat}")
+    for name, old, new in modes:
+        old_verdicts, old_time = timed(lambda i, t: old(verbs[i], t), corpus, repeat)
+        new_verdicts, new_time = timed(lambda i, t: new(answers[i], t), corpus, repeat)
+
+        mismatches = [c for c, a, b in zip(corpus, old_verdicts, new_verdicts) if a != b]
+        assert not mismatches, f"{name}: verdicts differ for {mismatches[:5]}"
+
+        print(f"{name:<12} legacy {old_time * 1e6:6.2f} µs   compiled {new_time * 1e6:6.2f} µs   "
+              f"accepted {sum(new_verdicts)}/{len(corpus)}   verdicts identical")
+
+
+if __name__ == "__main__":
+    main()
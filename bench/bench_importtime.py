@@ -0,0 +1,68 @@
+"""Cold-start import cost of the bot module, measured with `python -X importtime`.
+
+Imports src/bot_railway.py in a fresh interpreter several times, takes the
+median cumulative import time per top-level package and prints the heaviest
+ones. With --budget-ms the script exits with status 1 when the total import
+time exceeds the budget, so it can guard against cold start creeping up.
+
+    python bench/bench_importtime.py [--runs 5] [--top 15] [--budget-ms 3500]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+
+
+def import_once():
+    env = dict(os.environ, TELEGRAM_TOKEN="123:bench", RUN_MODE="webhook", LOG_LEVEL="WARNING")
+    env.pop("DB_PATH", None)
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import bot_railway"],
+        cwd=SRC, env=env, capture_output=True, text=True, check=True,
+    )
+
+    # import time: self [us] | cumulative | imported package
+    packages = {}
+    total = 0
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, self_us, cumulative, name = (part.strip() for part in line.replace(":", "|", 1).split("|"))
+        total += int(self_us)
+        top = name.split(".")[0]
+        packages[top] = packages.get(top, 0) + int(self_us)
+    return total, packages
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--budget-ms", type=float, default=None)
+    args = parser.parse_args()
+
+    totals = []
+    per_package = {}
+    for _ in range(args.runs):
+        total, packages = import_once()
+        totals.append(total)
+        for name, us in packages.items():
+            per_package.setdefault(name, []).append(us)
+
+    total_ms = statistics.median(totals) / 1000
+    print(f"import bot_railway: {total_ms:8.1f} ms (median of {args.runs})")
+    ranked = sorted(per_package.items(), key=lambda item: statistics.median(item[1]), reverse=True)
+    for name, samples in ranked[:args.top]:
+        ms = statistics.median(samples) / 1000
+        print(f"  {name:<28} {ms:8.1f} ms  {ms / total_ms * 100:5.1f}%")
+
+    if args.budget_ms is not None and total_ms > args.budget_ms:
+        print(f"FAIL: {total_ms:.1f} ms > budget {args.budget_ms:.1f} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
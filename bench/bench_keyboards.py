@@ -0,0 +1,66 @@
+"""Per-update keyboard cost: building InlineKeyboardMarkup on every answer vs the prebuilt cache.
+
+Measures time and allocated bytes for "get the reply keyboard and serialize it
+for the request", which is what every callback and answer pays.
+
+    python bench/bench_keyboards.py [iterations]
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from aiogram import Bot  # noqa: E402
+from aiogram.client.session.aiohttp import AiohttpSession  # noqa: E402
+
+import keyboards  # noqa: E402
+from client import CachedMarkupSession  # noqa: E402
+
+
+def measure(name, get_markup, session, bot, iterations):
+    files = {}
+
+    start = time.perf_counter()
+    for i in range(iterations):
+        session.prepare_value(get_markup(i), bot=bot, files=files)
+    elapsed = time.perf_counter() - start
+
+    # Пиковый прирост памяти за один апдейт — сколько временных объектов он создаёт
+    tracemalloc.start()
+    sample = min(iterations, 1000)
+    peak_total = 0
+    for i in range(sample):
+        current = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        session.prepare_value(get_markup(i), bot=bot, files=files)
+        peak_total += tracemalloc.get_traced_memory()[1] - current
+    tracemalloc.stop()
+
+    print(f"{name:<8} {elapsed / iterations * 1e6:>8.2f} µs/update   "
+          f"{peak_total / sample:>8.0f} B peak allocation/update")
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    bot = Bot("1:bench")
+    prefixes = keyboards.PREFIXES
+
+    plain = AiohttpSession()
+    cached_session = CachedMarkupSession()
+    cache = keyboards.Keyboards(plain.json_dumps)
+
+    # Кэшированный JSON должен совпадать с тем, что собрал бы aiogram
+    for markup in [*cache.main.values(), *cache.next.values(), cache.speed, cache.settings, *cache.levels.values()]:
+        assert cached_session.prepare_value(markup, bot=bot, files={}) == plain.prepare_value(markup, bot=bot, files={})
+
+    measure("before", lambda i: keyboards._next_kb(prefixes[i % 4]), plain, bot, iterations)
+    measure("after", lambda i: cache.next[prefixes[i % 4]], cached_session, bot, iterations)
+
+    measure("before", lambda i: keyboards._main_menu(i % 2 == 0), plain, bot, iterations)
+    measure("after", lambda i: cache.main[i % 2 == 0], cached_session, bot, iterations)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Event-loop stall under a burst of updates: print() vs queued, leveled logging.
+
+Every simulated update emits the per-question debug lines. stdout is a pipe
+drained by a slow reader, like a container log pipe under load. A ticker
+coroutine measures how late the event loop wakes up while the burst runs.
+
+    python bench/bench_logging.py [updates]
+"""
+import asyncio
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+VARIANTS = ("print", "logging-info", "logging-debug")
+
+
+def slow_pipe():
+    read_fd, write_fd = os.pipe()
+
+    def drain():
+        # ~250 KB/s — забитый пайп логов контейнера
+        while os.read(read_fd, 4096):
+            time.sleep(0.016)
+
+    threading.Thread(target=drain, daemon=True).start()
+    return os.fdopen(write_fd, "w", buffering=1)
+
+
+async def burst(variant, updates, emit):
+    stalls = []
+    done = False
+
+    async def ticker():
+        loop = asyncio.get_running_loop()
+        while not done:
+            t0 = loop.time()
+            await asyncio.sleep(0.001)
+            stalls.append(loop.time() - t0 - 0.001)
+
+    tick = asyncio.create_task(ticker())
+    await asyncio.sleep(0)
+    start = time.perf_counter()
+    for i in range(updates):
+        # Апдейты идут подряд, между ними цикл успевает заняться другими задачами
+        emit(i)
+        await asyncio.sleep(0)
+    elapsed = time.perf_counter() - start
+    done = True
+    await tick
+
+    stalls.sort()
+    p99 = stalls[int(len(stalls) * 0.99)] if stalls else 0.0
+    worst = stalls[-1] if stalls else 0.0
+    sys.__stderr__.write(
+        f"{variant:<14} burst {elapsed * 1e3:8.1f} ms   loop stall p99 {p99 * 1e3:7.2f} ms   "
+        f"max {worst * 1e3:7.2f} ms\n"
+    )
+
+
+def run_variant(variant, updates):
+    out = slow_pipe()
+
+    if variant == "print":
+        sys.stdout = out
+
+        def emit(i):
+            print("DEBUG FORMS:", "go", "LEVEL:", 1)
+            print("DEBUG VERB SELECTED:", "go", "LEVEL:", 1)
+    else:
+        from logs import log_event, setup_logging
+        setup_logging(level="DEBUG" if variant == "logging-debug" else "INFO", stream=out)
+        log = logging.getLogger("bot")
+
+        def emit(i):
+            # Как в bot_railway: поля собираются только при включённом DEBUG
+            if log.isEnabledFor(logging.DEBUG):
+                log_event(log, "question", uid=i, mode="forms", verb="go", level=1)
+                log_event(log, "verb_selected", requested=1, verb="go", level=1)
+
+    asyncio.run(burst(variant, updates, emit))
+
+
+def main():
+    if len(sys.argv) > 2 and sys.argv[1] == "--variant":
+        run_variant(sys.argv[2], int(sys.argv[3]))
+        return
+
+    updates = sys.argv[1] if len(sys.argv) > 1 else "10000"
+    for variant in VARIANTS:
+        # Отдельный процесс на вариант — у каждого свой stdout и свой logging
+        subprocess.run([sys.executable, __file__, "--variant", variant, updates], check=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""Resident memory of user records and training sessions.
+
+Loads N simulated users the way the bot does it (JSON from the store ->
+in-memory objects) and opens a training session for a share of them,
+then reports RSS growth over the bare process with the verb catalog.
+
+Two layouts:
+  dicts    — the previous one: settings / stats dicts as loaded from JSON,
+             session dicts, sampler on Python lists and a position dict;
+  records  — UserRecord / UserStats / Session with __slots__, sampler
+             on array columns sharing the catalog's array('H') pool.
+
+Every case runs in its own process so RSS figures don't mix.
+
+    python bench/bench_memory.py [--users 100000 1000000] [--verbs 20] [--active 0.05]
+                                 [--layouts dicts records]
+
+The dicts layout needs about 9 GB at 1M users with the defaults.
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, SRC)
+
+from dataset import load_verbs  # noqa: E402
+from repetition import RepetitionDeck  # noqa: E402
+from sampler import AdaptiveSampler, FenwickTree, error_weight  # noqa: E402
+from sessions import Session  # noqa: E402
+from stats import verb_counts  # noqa: E402
+from users import UserRecord  # noqa: E402
+from verb_catalog import VerbCatalog  # noqa: E402
+
+SESSION_MAX = 100_000
+
+
+def rss_kb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+
+def user_json(rng, catalog, verbs):
+    # Пользователь, как он лежит в сторе: `verbs` глаголов с ответами, неделя истории
+    now = time.time()
+    names = [catalog[i]["inf"] for i in rng.sample(range(len(catalog)), verbs)]
+    return json.dumps({
+        "settings": {"daily_enabled": rng.random() < 0.3, "level": rng.randint(1, 3)},
+        "stats": {
+            "correct": 40, "wrong": 12, "best": 9, "streak": 2, "last_training": now, "name": "Learner",
+            "verbs": {inf: [rng.randint(0, 3), 3] for inf in names},
+            "days": {time.strftime("%Y-%m-%d", time.gmtime(now - d * 86400)): 7 for d in range(7)},
+        },
+        "errors": [{"inf": inf, "mode": "forms", "box": 1, "due": now + 600} for inf in names[:3]],
+    }, ensure_ascii=False)
+
+
+# ---------- прежняя раскладка: dict на всё ----------
+
+class ListSampler:
+    """Прежний AdaptiveSampler: списки Python и dict позиций."""
+
+    def __init__(self, indices, counts):
+        self.indices = list(indices)
+        self.pos = {idx: k for k, idx in enumerate(self.indices)}
+        self.counts = [list(c) if c else [0, 0] for c in counts]
+        self.weights = [error_weight(c, t) for c, t in self.counts]
+        self.tree = FenwickTree(self.weights)
+        self.tree.tree = self.tree.tree.tolist()
+        self._held = None
+
+
+def load_dicts(rows, catalog, active):
+    settings, stats, errors, sessions = {}, {}, {}, {}
+    for uid, row in enumerate(rows):
+        data = json.loads(row)
+        settings[uid] = data["settings"]
+        stats[uid] = data["stats"]
+        errors[uid] = RepetitionDeck.from_json(data["errors"], known=catalog.by_inf)
+    for uid in range(active):
+        seen = stats[uid]["verbs"]
+        indices = tuple(catalog.indices(settings[uid]["level"]))
+        sessions[uid] = {
+            "mode": "forms",
+            "catalog": catalog,
+            "sampler": ListSampler(indices, [seen.get(catalog[i]["inf"]) for i in indices]),
+            "verb": catalog[indices[0]],
+            "asked": time.monotonic(),
+        }
+    return settings, stats, errors, sessions
+
+
+# ---------- новая раскладка: UserRecord / Session ----------
+
+def load_records(rows, catalog, active):
+    users, sessions = {}, {}
+    for uid, row in enumerate(rows):
+        users[uid] = UserRecord.from_json(json.loads(row), known=catalog.by_inf)
+    for uid in range(active):
+        user = users[uid]
+        indices = catalog.indices(user.level)
+        counts = [verb_counts(user.stats, catalog[i]["inf"]) for i in indices]
+        st = sessions[uid] = Session("forms", catalog, sampler=AdaptiveSampler(indices, counts))
+        st.verb = catalog[indices[0]]
+        st.asked = time.monotonic()
+    return users, sessions
+
+
+def measure(layout, users, verbs, active_share):
+    catalog = VerbCatalog(load_verbs(os.path.join(SRC, "verbs.json")))
+    rng = random.Random(1)
+    # Строки JSON готовятся заранее и не входят в замер
+    rows = [user_json(rng, catalog, verbs) for _ in range(users)]
+    active = min(SESSION_MAX, int(users * active_share))
+
+    base = rss_kb()
+    started = time.perf_counter()
+    loaded = (load_dicts if layout == "dicts" else load_records)(rows, catalog, active)
+    elapsed = time.perf_counter() - started
+    grown = rss_kb() - base
+    print(json.dumps({"kb": grown, "seconds": elapsed, "active": active}))
+    return loaded
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--verbs", type=int, default=20, help="answered verbs per user")
+    parser.add_argument("--active", type=float, default=0.05, help="share of users with a session")
+    parser.add_argument("--layouts", nargs="+", choices=("dicts", "records"), default=["dicts", "records"])
+    parser.add_argument("--case", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        layout, users = args.case.split(":")
+        measure(layout, int(users), args.verbs, args.active)
+        return
+
+    print(f"{'users':>10} {'sessions':>9} {'layout':<8} {'RSS':>10} {'per user':>10} {'load':>8}")
+    for users in args.users:
+        for layout in args.layouts:
+            out = subprocess.run(
+                [sys.executable, __file__, "--case", f"{layout}:{users}",
+                 "--verbs", str(args.verbs), "--active", str(args.active)],
+                check=True, capture_output=True, text=True,
+            ).stdout
+            result = json.loads(out.strip().splitlines()[-1])
+            print(
+                f"{users:>10,} {result['active']:>9,} {layout:<8} {result['kb'] / 1024:>8.0f}MB "
+                f"{result['kb'] * 1024 / users:>9,.0f}B {result['seconds']:>7.1f}s"
+            )
+
+
+if __name__ == "__main__":
+    main()
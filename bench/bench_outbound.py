@@ -0,0 +1,148 @@
+"""Outbound Bot API calls per update: separate answerCallbackQuery vs webhook reply.
+
+Runs the bot in webhook mode against the stub Bot API from load_cluster.py,
+once with WEBHOOK_ANSWER_CALLBACKS=0 and once with =1. Every user sends
+/start, opens Verb Forms, presses Next five times in a burst (as when the
+bot is slow to respond), answers and presses Next again. Updates are
+handled in the background, so the run ends when the stub has been quiet
+for half a second. Reports the HTTP calls the stub received per update,
+by method, and how many callback answers went back inside webhook
+responses instead.
+
+    python bench/bench_outbound.py [users]
+"""
+import asyncio
+import os
+import subprocess
+import sys
+import time
+from collections import Counter
+
+from aiohttp import ClientSession
+
+from load_cluster import StubApi, free_port
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+BOT = os.path.join(ROOT, "src", "bot_railway.py")
+
+NEXT_BURST = 5
+
+
+class CountingStub(StubApi):
+    def __init__(self):
+        super().__init__()
+        self.methods = Counter()
+
+    async def handle(self, request):
+        self.methods[request.match_info["method"]] += 1
+        return await super().handle(request)
+
+
+def updates_for(uid, seq):
+    user = {"id": uid, "is_bot": False, "first_name": "bench"}
+    chat = {"id": uid, "type": "private"}
+
+    def message(text):
+        seq[0] += 1
+        msg = {"message_id": seq[0], "date": int(time.time()), "chat": chat, "from": user, "text": text}
+        if text.startswith("/"):
+            msg["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text)}]
+        return {"update_id": seq[0], "message": msg}
+
+    def callback(data, message_id):
+        seq[0] += 1
+        return {"update_id": seq[0], "callback_query": {
+            "id": str(seq[0]), "chat_instance": "bench", "from": user, "data": data,
+            "message": {"message_id": message_id, "date": int(time.time()), "chat": chat, "text": "x"},
+        }}
+
+    # (апдейты, отправлять ли их одновременно)
+    return [
+        ([message("/start")], False),
+        ([callback("menu_forms", 1)], False),
+        ([callback("forms_next", 2) for _ in range(NEXT_BURST)], True),
+        ([message("went gone")], False),
+        ([callback("forms_next", 2)], False),
+    ]
+
+
+async def run(answer_in_webhook, users):
+    api = CountingStub()
+    api_port, port = free_port(), free_port()
+    runner = await api.start(api_port)
+
+    env = dict(
+        os.environ,
+        TELEGRAM_TOKEN="123:bench",
+        TELEGRAM_API_URL=f"http://127.0.0.1:{api_port}",
+        RUN_MODE="webhook",
+        PORT=str(port),
+        VERBS_WATCH="0",
+        LOG_LEVEL="WARNING",
+        WEBHOOK_ANSWER_CALLBACKS="1" if answer_in_webhook else "0",
+    )
+    env.pop("RAILWAY_STATIC_URL", None)
+    env.pop("DB_PATH", None)
+    proc = subprocess.Popen([sys.executable, BOT], env=env)
+
+    updates = 0
+    inline = 0
+    url = f"http://127.0.0.1:{port}/webhook"
+    try:
+        async with ClientSession() as session:
+            for _ in range(300):
+                try:
+                    async with session.get(f"http://127.0.0.1:{port}/metrics"):
+                        break
+                except OSError:
+                    await asyncio.sleep(0.1)
+
+            async def post(update):
+                async with session.post(url, json=update) as resp:
+                    await resp.read()
+                    # Вызов метода в ответе на вебхук приходит multipart-формой
+                    return resp.content_type.startswith("multipart/")
+
+            async def user(uid, seq):
+                results = []
+                for batch, burst in updates_for(uid, seq):
+                    if burst:
+                        results += await asyncio.gather(*(post(u) for u in batch))
+                    else:
+                        for u in batch:
+                            results.append(await post(u))
+                return results
+
+            seq = [0]
+            for results in await asyncio.gather(*(user(uid, seq) for uid in range(1, users + 1))):
+                updates += len(results)
+                inline += sum(results)
+
+            seen = -1
+            while seen != api.calls:
+                seen = api.calls
+                await asyncio.sleep(0.5)
+    finally:
+        proc.terminate()
+        # Ждём в потоке: бот при остановке дорабатывает очередь, и заглушка
+        # Bot API в этом event loop должна отвечать ему всё это время
+        await asyncio.to_thread(proc.wait, 30)
+        await runner.cleanup()
+
+    return updates, api.methods, inline
+
+
+async def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    for answer_in_webhook in (False, True):
+        updates, methods, inline = await run(answer_in_webhook, users)
+        calls = sum(methods.values())
+        print(f"WEBHOOK_ANSWER_CALLBACKS={int(answer_in_webhook)}: {updates} updates, "
+              f"{calls} API calls ({calls / updates:.2f} per update), "
+              f"{inline} answers in webhook replies")
+        for method, count in methods.most_common():
+            print(f"    {method:<22} {count:6d}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
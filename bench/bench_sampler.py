@@ -0,0 +1,78 @@
+"""Adaptive verb sampler: cost per draw and how fast a session finds weak verbs.
+
+Draw + record time for catalogs of growing size (up to the 65535 verbs
+a catalog can hold), then a simulated
+learner who knows most verbs (5% errors) but fails a tenth of them half
+the time. Reports the share of questions spent on weak verbs by the old
+shuffled pool and by the adaptive sampler, averaged over several seeded
+runs. The sampler needs a few hundred answers to find the weak verbs:
+at 200 questions both land near the 10% base rate.
+
+    python bench/bench_sampler.py [questions] [runs]
+"""
+import os
+import random
+import sys
+import time
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, SRC)
+
+from sampler import AdaptiveSampler  # noqa: E402
+
+
+def draw_cost(n, rounds=100_000):
+    sampler = AdaptiveSampler(range(n), [None] * n)
+    started = time.perf_counter()
+    for _ in range(rounds):
+        sampler.record(sampler.draw(), random.random() < 0.7)
+    return (time.perf_counter() - started) / rounds
+
+
+def simulate(next_verb, record, weak, questions):
+    on_weak = 0
+    for _ in range(questions):
+        idx = next_verb()
+        bad = idx in weak
+        on_weak += bad
+        record(idx, random.random() >= (0.5 if bad else 0.05))
+    return on_weak / questions
+
+
+def session(n, questions, seed):
+    # Один ученик: одинаковые слабые глаголы для пула и сэмплера
+    random.seed(seed)
+    weak = set(random.sample(range(n), n // 10))
+
+    pool = []
+    def pool_next():
+        if not pool:
+            pool.extend(random.sample(range(n), n))
+        return pool.pop()
+
+    sampler = AdaptiveSampler(range(n), [None] * n)
+    return (
+        simulate(pool_next, lambda i, ok: None, weak, questions),
+        simulate(sampler.draw, sampler.record, weak, questions),
+    )
+
+
+def main():
+    questions = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+    for n in (100, 1_000, 10_000, 65_535):
+        print(f"catalog={n:<9} {draw_cost(n) * 1e6:6.2f} us per draw + record")
+
+    n = 300
+    results = [session(n, questions, seed) for seed in range(runs)]
+    pooled = sum(r[0] for r in results) / runs
+    adaptive = sum(r[1] for r in results) / runs
+
+    print(f"\n{n} verbs, {n // 10} weak, {questions} questions, mean of {runs} runs")
+    print(f"shuffled pool: {pooled:.0%} on weak verbs")
+    print(f"adaptive:      {adaptive:.0%} on weak verbs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""Answer handling through the real dispatcher: in-memory store vs SQLite write-behind.
+
+Synthetic users arrive one after another, open Verb Forms and answer a
+few questions each (right about 70% of the time). Every update goes
+through bot_railway's dispatcher, middlewares and handlers against a
+fake Bot API session without latency, so the figures are the bot's own
+cost per answer: get_user, record_review / record_result, mark_dirty.
+
+Reports answers/s, p99 and worst answer latency, user records left in
+memory and RSS growth. With the SQLite store idle records are evicted
+once flushed (USER_CACHE_TTL, set low here so the bound shows within a
+short run); the memory store has nowhere to put them and keeps all.
+
+Every store runs in its own process: bot_railway picks it from DB_PATH
+at import time, and RSS figures don't mix.
+
+    python bench/bench_store.py [--users 20000] [--answers 5] [--ttl 1]
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+
+
+def rss_kb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+
+def first(value):
+    if isinstance(value, list):
+        value = value[0]
+    return value.split("/")[0].strip()
+
+
+def callback(uid, data, n):
+    return {"update_id": n, "callback_query": {
+        "id": str(n), "chat_instance": "s", "data": data,
+        "from": {"id": uid, "is_bot": False, "first_name": "u"},
+        "message": {"message_id": 1, "date": int(time.time()), "text": "-",
+                    "chat": {"id": uid, "type": "private"}},
+    }}
+
+
+def message(uid, text, n):
+    return {"update_id": n, "message": {
+        "message_id": n, "date": int(time.time()), "text": text,
+        "chat": {"id": uid, "type": "private"},
+        "from": {"id": uid, "is_bot": False, "first_name": "u"},
+    }}
+
+
+async def measure(users, answers):
+    # Импорт здесь: окружение (DB_PATH, USER_CACHE_TTL) задано родителем
+    sys.path.insert(0, SRC)
+    from aiogram.client.session.base import BaseSession
+    from aiogram.methods import EditMessageText, SendMessage
+    from aiogram.types import Chat, Message
+
+    import bot_railway
+
+    class FakeSession(BaseSession):
+        async def close(self):
+            pass
+
+        async def stream_content(self, *args, **kwargs):
+            yield b""
+
+        async def make_request(self, bot, method, timeout=None):
+            if isinstance(method, (SendMessage, EditMessageText)):
+                return Message(
+                    message_id=1,
+                    date=datetime.datetime.now(),
+                    chat=Chat(id=method.chat_id, type="private"),
+                    text=method.text,
+                )
+            return True
+
+    await bot_railway.start_services()
+    bot, dp = bot_railway.bot, bot_railway.dp
+    bot.session = FakeSession()
+    rnd = random.Random(1)
+
+    base = rss_kb()
+    latencies = []
+    n = 0
+    started = time.perf_counter()
+    for uid in range(1, users + 1):
+        n += 1
+        await dp.feed_raw_update(bot, callback(uid, "menu_forms", n))
+        for _ in range(answers):
+            verb = bot_railway.user_state.get(uid).verb
+            if rnd.random() < 0.7:
+                text = f"{first(verb['past'])} {first(verb['part'])}"
+            else:
+                text = "goed goed"
+            n += 1
+            t0 = time.perf_counter()
+            await dp.feed_raw_update(bot, message(uid, text, n))
+            latencies.append(time.perf_counter() - t0)
+        # Отдаём управление циклу, как между реальными апдейтами: фоновому сбросу тоже
+        await asyncio.sleep(0)
+    elapsed = time.perf_counter() - started
+
+    grown = rss_kb() - base
+    cached = len(bot_railway.users)
+    t0 = time.perf_counter()
+    await bot_railway.stop_services()
+    drain = time.perf_counter() - t0
+
+    latencies.sort()
+    print(json.dumps({
+        "rate": len(latencies) / elapsed,
+        "p99": latencies[int(len(latencies) * 0.99)],
+        "worst": latencies[-1],
+        "cached": cached,
+        "kb": grown,
+        "drain": drain,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=20_000)
+    parser.add_argument("--answers", type=int, default=5, help="answers per user")
+    parser.add_argument("--ttl", type=int, default=1, help="USER_CACHE_TTL for the sqlite store")
+    parser.add_argument("--case", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        asyncio.run(measure(args.users, args.answers))
+        return
+
+    print(f"{'store':<8} {'answers/s':>10} {'p99':>9} {'worst':>9} {'records':>9} {'RSS':>8} {'final flush':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in ("memory", "sqlite"):
+            env = dict(os.environ, TELEGRAM_TOKEN="1:bench", LOG_LEVEL="WARNING", USER_CACHE_TTL=str(args.ttl))
+            env.pop("DB_PATH", None)
+            if name == "sqlite":
+                env["DB_PATH"] = os.path.join(tmp, "bench.db")
+            out = subprocess.run(
+                [sys.executable, __file__, "--case", name,
+                 "--users", str(args.users), "--answers", str(args.answers)],
+                check=True, capture_output=True, text=True, env=env,
+            ).stdout
+            r = json.loads(out.strip().splitlines()[-1])
+            print(
+                f"{name:<8} {r['rate']:>10,.0f} {r['p99'] * 1e6:>7.0f}µs {r['worst'] * 1e3:>7.1f}ms "
+                f"{r['cached']:>9,} {r['kb'] / 1024:>6.0f}MB {r['drain'] * 1e3:>10.1f}ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Question and feedback text per answer: f-string on every update vs the per-verb cache.
+
+Renders the catalog once (the cost paid on every catalog load), then
+times the texts one answer needs — the next prompt plus the feedback —
+built with f-strings as before and looked up in the cache.
+
+    python bench/bench_templates.py [iterations]
+"""
+import os
+import sys
+import time
+
+os.environ.setdefault("TELEGRAM_TOKEN", "1:bench")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import bot_railway as bot  # noqa: E402
+from dataset import load_verbs  # noqa: E402
+from verb_catalog import VerbCatalog  # noqa: E402
+
+
+def fstring_texts(verb, answers):
+    # Так тексты собирались до кэша (ParseMode.MARKDOWN, без экранирования)
+    prompt = (
+        f"🎲 *Mix — Forms*\n\n"
+        f"Infinitive: *{verb['inf']}*\n"
+        f"Translation: *{verb['ru']}*\n\n"
+        f"Write the 2nd and 3rd forms of the verb.\n"
+        f"Example: go → went, gone"
+    )
+    reply = f"❌ Wrong!\n\nCorrect: {verb['inf']} — {answers.past_text}, {answers.part_text}"
+    return prompt, reply
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    verbs = load_verbs(bot.VERBS_PATH)
+
+    started = time.perf_counter()
+    catalog = VerbCatalog(verbs, bot.TEMPLATES)
+    render = time.perf_counter() - started
+    print(f"render: {len(verbs)} verbs x {len(bot.TEMPLATES)} templates in {render * 1e3:.1f} ms")
+
+    n = len(catalog)
+    started = time.perf_counter()
+    for i in range(iterations):
+        verb = catalog[i % n]
+        fstring_texts(verb, catalog.answers_for(verb))
+    before = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for i in range(iterations):
+        verb = catalog[i % n]
+        catalog.text(("mix", "forms"), verb)
+        catalog.text("forms_wrong", verb)
+    after = time.perf_counter() - started
+
+    print(f"f-string {before / iterations * 1e9:>8.0f} ns/answer")
+    print(f"cache    {after / iterations * 1e9:>8.0f} ns/answer")
+
+
+if __name__ == "__main__":
+    main()
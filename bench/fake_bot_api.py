@@ -0,0 +1,139 @@
+"""Local stand-in for the Telegram Bot API, for offline load tests.
+
+Answers sendMessage, editMessageText, answerCallbackQuery, setWebhook
+(and anything else with a bare `true`) after a configurable delay, and
+turns a share of requests into 429 Too Many Requests with retry_after.
+Keeps the last text sent to each chat and lets a driver wait for the
+next reply in a chat.
+
+    python bench/fake_bot_api.py [--port 8081] [--latency 0.05] [--rate-429 0.01]
+    TELEGRAM_API_URL=http://127.0.0.1:8081 python src/bot_railway.py
+"""
+import argparse
+import asyncio
+import random
+import time
+from collections import Counter
+
+from aiohttp import web
+
+
+class FakeBotApi:
+    def __init__(self, latency=0.0, jitter=0.5, rate_429=0.0, retry_after=1, seed=None):
+        self.latency = latency          # средняя задержка ответа (сек)
+        self.jitter = jitter            # ± доля от latency
+        self.rate_429 = rate_429        # доля запросов, получающих 429
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+
+        self.methods = Counter()
+        self.throttled = Counter()
+        self.message_id = 0
+        self.webhook = None
+        self.last_text = {}             # chat_id -> последний текст
+        self.replies = Counter()        # chat_id -> сколько ответов пришло
+        self._waiters = {}              # chat_id -> [(порог, future)]
+
+    # ---------- ожидание ответа для драйвера ----------
+
+    def wait_reply(self, chat_id, after):
+        """Future, который завершится, когда у чата станет больше `after` ответов."""
+        future = asyncio.get_running_loop().create_future()
+        if self.replies[chat_id] > after:
+            future.set_result(None)
+        else:
+            self._waiters.setdefault(chat_id, []).append((after, future))
+        return future
+
+    def _replied(self, chat_id, text):
+        self.replies[chat_id] += 1
+        if text is not None:
+            self.last_text[chat_id] = text
+        waiters = self._waiters.get(chat_id)
+        if not waiters:
+            return
+        count = self.replies[chat_id]
+        left = []
+        for after, future in waiters:
+            if count > after:
+                if not future.done():
+                    future.set_result(None)
+            else:
+                left.append((after, future))
+        if left:
+            self._waiters[chat_id] = left
+        else:
+            del self._waiters[chat_id]
+
+    # ---------- Bot API ----------
+
+    async def handle(self, request):
+        method = request.match_info["method"]
+        form = await request.post()
+        self.methods[method] += 1
+
+        if self.latency:
+            spread = self.latency * self.jitter
+            await asyncio.sleep(max(0.0, self.latency + self.random.uniform(-spread, spread)))
+
+        if self.rate_429 and method != "setWebhook" and self.random.random() < self.rate_429:
+            self.throttled[method] += 1
+            return web.json_response({
+                "ok": False,
+                "error_code": 429,
+                "description": f"Too Many Requests: retry after {self.retry_after}",
+                "parameters": {"retry_after": self.retry_after},
+            })
+
+        chat_id = form.get("chat_id")
+        if method in ("sendMessage", "editMessageText"):
+            self.message_id += 1
+            result = {
+                "message_id": int(form.get("message_id", 0)) or self.message_id,
+                "date": int(time.time()),
+                "chat": {"id": int(chat_id or 0), "type": "private"},
+                "text": form.get("text", ""),
+            }
+        elif method == "setWebhook":
+            self.webhook = form.get("url")
+            result = True
+        elif method == "getMe":
+            result = {"id": 1, "is_bot": True, "first_name": "Fake", "username": "fake_bot"}
+        else:
+            result = True
+
+        if chat_id is not None:
+            self._replied(int(chat_id), form.get("text"))
+        return web.json_response({"ok": True, "result": result})
+
+    async def start(self, port, host="127.0.0.1"):
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self.handle)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        return runner
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=int, default=1)
+    args = parser.parse_args()
+
+    api = FakeBotApi(args.latency, rate_429=args.rate_429, retry_after=args.retry_after)
+    runner = await api.start(args.port)
+    print(f"Fake Bot API on http://127.0.0.1:{args.port}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
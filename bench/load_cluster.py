@@ -0,0 +1,209 @@
+"""Webhook throughput of src/cluster.py with 1, 2, 4 ... worker processes.
+
+Starts a stub Bot API server, then for every cluster size runs the cluster
+against a shared SQLite file and POSTs a burst of synthetic updates to
+/webhook. Each user sends /start, opens Verb Forms and answers three
+times. Updates are handled in the background after the webhook returns,
+so the clock stops when the stub API has seen every expected reply.
+
+    python bench/load_cluster.py [--sizes 1,2,4] [--users 300] [--concurrency 64]
+                                 [--api-rate 100000] [--chat-rate 1000]
+
+Scaling is bounded by the number of CPU cores. The report prints the
+core count next to the results.
+
+Each worker gets API_RATE / N of the bot's outbound limit, so with the
+defaults (API_RATE=30) the whole cluster is capped at ~30 msg/s whatever
+N is. Like loadtest.py, the bench lifts the limit (--api-rate, --chat-rate)
+to measure the cluster itself.
+"""
+import argparse
+import asyncio
+import os
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from aiohttp import ClientSession, web
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+CLUSTER = os.path.join(ROOT, "src", "cluster.py")
+
+# /start -> 1 сообщение, menu_forms -> ответ на callback + вопрос, 3 ответа -> 3.
+# С WEBHOOK_ANSWER_CALLBACKS=1 (по умолчанию) ответ на callback уходит
+# в ответе на вебхук, и заглушка Bot API его не видит
+UPDATES_PER_USER = 5
+ANSWER_IN_WEBHOOK = os.getenv("WEBHOOK_ANSWER_CALLBACKS", "1") == "1"
+CALLS_PER_USER = 5 if ANSWER_IN_WEBHOOK else 6
+
+# Недоставленный апдейт (503, пока процесс стартует) Telegram повторяет —
+# здесь так же, но не бесконечно
+POST_ATTEMPTS = 20
+WORKER_LABEL = re.compile(r'worker="(\d+)"')
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class StubApi:
+    def __init__(self):
+        self.calls = 0
+        self.message_id = 0
+
+    async def handle(self, request):
+        method = request.match_info["method"]
+        form = await request.post()
+        self.calls += 1
+        if method in ("sendMessage", "editMessageText"):
+            self.message_id += 1
+            result = {
+                "message_id": self.message_id, "date": int(time.time()),
+                "chat": {"id": int(form.get("chat_id", 1)), "type": "private"},
+                "text": form.get("text", ""),
+            }
+        else:
+            result = True
+        return web.json_response({"ok": True, "result": result})
+
+    async def start(self, port):
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self.handle)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, "127.0.0.1", port).start()
+        return runner
+
+
+def user_updates(uid, seq):
+    user = {"id": uid, "is_bot": False, "first_name": "load"}
+    chat = {"id": uid, "type": "private"}
+
+    def message(text):
+        seq[0] += 1
+        msg = {"message_id": seq[0], "date": int(time.time()), "chat": chat, "from": user, "text": text}
+        if text.startswith("/"):
+            msg["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text)}]
+        return {"update_id": seq[0], "message": msg}
+
+    seq[0] += 1
+    callback = {"update_id": seq[0], "callback_query": {
+        "id": str(seq[0]), "chat_instance": "load", "from": user, "data": "menu_forms",
+        "message": {"message_id": 1, "date": int(time.time()), "chat": chat, "text": "menu"},
+    }}
+    return [message("/start"), callback, message("went gone"), message("was been"), message("xx yy")]
+
+
+async def post(session, url, update):
+    for _ in range(POST_ATTEMPTS):
+        async with session.post(url, json=update) as resp:
+            await resp.read()
+            if resp.status < 300:
+                return
+            status = resp.status
+        await asyncio.sleep(0.5)
+    raise RuntimeError(f"update {update['update_id']}: HTTP {status} after {POST_ATTEMPTS} attempts")
+
+
+async def drive(port, api, users, concurrency, uid_base):
+    # Апдейты одного пользователя идут по порядку, пользователи — параллельно
+    queue = asyncio.Queue()
+    seq = [0]
+    for uid in range(uid_base, uid_base + users):
+        queue.put_nowait(user_updates(uid, seq))
+
+    expected = api.calls + users * CALLS_PER_USER
+    url = f"http://127.0.0.1:{port}/webhook"
+
+    async with ClientSession() as session:
+        async def client():
+            while not queue.empty():
+                for update in queue.get_nowait():
+                    await post(session, url, update)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+        while api.calls < expected:
+            if time.perf_counter() - started > 120:
+                raise RuntimeError(f"only {api.calls}/{expected} API calls after 120s")
+            await asyncio.sleep(0.01)
+        return time.perf_counter() - started
+
+
+async def wait_ready(port, size):
+    # Диспетчер отвечает сразу, процессы ещё импортируются. /metrics
+    # диспетчера помечает сэмплы каждого ответившего процесса меткой worker
+    async with ClientSession() as session:
+        for _ in range(600):
+            try:
+                async with session.get(f"http://127.0.0.1:{port}/metrics") as resp:
+                    text = await resp.text()
+                    if resp.status == 200 and len(set(WORKER_LABEL.findall(text))) == size:
+                        return
+            except OSError:
+                pass
+            await asyncio.sleep(0.1)
+    raise RuntimeError("cluster did not start")
+
+
+async def run_size(size, api_port, api, args, db_path):
+    port = free_port()
+    env = dict(
+        os.environ,
+        TELEGRAM_TOKEN="123:load",
+        TELEGRAM_API_URL=f"http://127.0.0.1:{api_port}",
+        DB_PATH=db_path,
+        VERBS_WATCH="0",
+        LOG_LEVEL="WARNING",
+        PORT=str(port),
+        API_RATE=str(args.api_rate),
+        CHAT_RATE=str(args.chat_rate),
+    )
+    env.pop("RAILWAY_STATIC_URL", None)
+    proc = subprocess.Popen([sys.executable, CLUSTER, "--workers", str(size)], env=env)
+    try:
+        await wait_ready(port, size)
+        # Прогрев: первые апдейты каждого процесса
+        await drive(port, api, size * 4, 4, uid_base=10_000_000)
+        elapsed = await drive(port, api, args.users, args.concurrency, uid_base=size * 1_000_000)
+    finally:
+        proc.terminate()
+        # Не блокируем loop: заглушка Bot API отвечает, пока кластер дорабатывает очередь
+        await asyncio.to_thread(proc.wait, 30)
+    return args.users * UPDATES_PER_USER / elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="1,2,4")
+    parser.add_argument("--users", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--api-rate", type=float, default=100_000, help="bot's API_RATE for the whole cluster")
+    parser.add_argument("--chat-rate", type=float, default=1000, help="bot's CHAT_RATE")
+    args = parser.parse_args()
+
+    api = StubApi()
+    api_port = free_port()
+    runner = await api.start(api_port)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in (int(s) for s in args.sizes.split(",")):
+            rate = await run_size(size, api_port, api, args, os.path.join(tmp, f"bot-{size}.db"))
+            results[size] = rate
+
+    await runner.cleanup()
+
+    print(f"CPU cores: {os.cpu_count()}")
+    base = results[min(results)]
+    for size, rate in results.items():
+        print(f"workers={size:<3} {rate:8.0f} updates/s   x{rate / base:.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
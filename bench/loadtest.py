@@ -0,0 +1,325 @@
+"""End-to-end load test: the bot in webhook mode against fake_bot_api.py.
+
+Starts the fake Bot API and the bot (or src/cluster.py with --workers),
+then plays synthetic users against WEBHOOK_PATH. Every user sends
+/start, trains Verb Forms (answers, Next, a burst of Next presses),
+goes back, does a few Translation questions and a short Speed session.
+Answers are right about 70% of the time, using the verb from the
+question the bot sent.
+
+Latency of an update is the time from the POST to the first Bot API
+call the bot makes for that chat (for a Next burst: one sample for the
+whole burst); webhook latency is how long the POST itself took. Reports
+throughput, p50/p90/p99 of both, Bot API calls by method,
+injected 429s and the bot's peak RSS (the whole process tree).
+Runs fully offline.
+
+The bot's own outbound limiter (API_RATE / CHAT_RATE) would cap the run
+at Telegram's ~30 msg/s, so by default the harness lifts it to measure
+the bot itself; --api-rate 30 --chat-rate 1 shows the real limits.
+
+    python bench/loadtest.py [--users 200] [--concurrency 50] [--api-latency 0.05]
+                             [--rate-429 0.01] [--api-rate 30 --chat-rate 1]
+                             [--workers 0] [--db]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+from aiohttp import ClientSession
+
+from fake_bot_api import FakeBotApi
+from load_cluster import free_port
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+BOT = os.path.join(ROOT, "src", "bot_railway.py")
+CLUSTER = os.path.join(ROOT, "src", "cluster.py")
+VERBS = os.path.join(ROOT, "src", "verbs.json")
+
+FORMS_PROMPT = re.compile(r"Infinitive: \*([^*]+)\*")
+TRANSLATION_PROMPT = re.compile(r"Translate:\n\*([^*]+)\*")
+
+
+def first(value):
+    if isinstance(value, list):
+        value = value[0]
+    return value.split("/")[0].strip()
+
+
+class Verbs:
+    def __init__(self, path):
+        with open(path, encoding="utf-8") as f:
+            self.by_inf = {v["inf"]: v for v in json.load(f)}
+        self.infs = list(self.by_inf)
+
+    def forms(self, inf, right):
+        if not right or inf not in self.by_inf:
+            inf = random.choice(self.infs)
+            return f"{first(self.by_inf[inf]['past'])}x {first(self.by_inf[inf]['part'])}"
+        v = self.by_inf[inf]
+        return f"{first(v['past'])} {first(v['part'])}"
+
+    def translation(self, inf, right):
+        if not right or inf not in self.by_inf:
+            return "неизвестно"
+        return re.split(r"[,/;]", self.by_inf[inf]["ru"])[0].strip()
+
+
+class Driver:
+    def __init__(self, api, url, verbs, args):
+        self.api = api
+        self.url = url
+        self.verbs = verbs
+        self.args = args
+        self.seq = 0
+        self.latencies = []
+        self.acks = []
+        self.updates = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.headers = {"X-Telegram-Bot-Api-Secret-Token": args.secret}
+
+    def _next_id(self):
+        self.seq += 1
+        return self.seq
+
+    def message(self, uid, text):
+        n = self._next_id()
+        msg = {
+            "message_id": n, "date": int(time.time()), "text": text,
+            "chat": {"id": uid, "type": "private"},
+            "from": {"id": uid, "is_bot": False, "first_name": f"user{uid}"},
+        }
+        if text.startswith("/"):
+            msg["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text)}]
+        return {"update_id": n, "message": msg}
+
+    def callback(self, uid, data):
+        n = self._next_id()
+        return {"update_id": n, "callback_query": {
+            "id": str(n), "chat_instance": "load", "data": data,
+            "from": {"id": uid, "is_bot": False, "first_name": f"user{uid}"},
+            "message": {"message_id": 1, "date": int(time.time()), "text": "menu",
+                        "chat": {"id": uid, "type": "private"}},
+        }}
+
+    async def _post(self, session, update):
+        started = time.perf_counter()
+        try:
+            async with session.post(self.url, json=update, headers=self.headers) as resp:
+                await resp.read()
+                if resp.status != 200:
+                    self.errors += 1
+        except OSError:
+            self.errors += 1
+        self.acks.append(time.perf_counter() - started)
+        self.updates += 1
+
+    async def send(self, session, uid, *updates):
+        # Несколько апдейтов — одновременно (серия «Next»), одна точка задержки
+        before = self.api.replies[uid]
+        started = time.perf_counter()
+        reply = self.api.wait_reply(uid, before)
+        await asyncio.gather(*(self._post(session, u) for u in updates))
+        try:
+            await asyncio.wait_for(reply, self.args.timeout)
+            self.latencies.append(time.perf_counter() - started)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+        if self.args.think:
+            await asyncio.sleep(random.uniform(0, 2 * self.args.think))
+
+    def asked(self, uid, pattern):
+        match = pattern.search(self.api.last_text.get(uid, ""))
+        return match.group(1) if match else None
+
+    async def user(self, session, uid):
+        right = lambda: random.random() < 0.7
+
+        await self.send(session, uid, self.message(uid, "/start"))
+
+        await self.send(session, uid, self.callback(uid, "menu_forms"))
+        for i in range(4):
+            inf = self.asked(uid, FORMS_PROMPT)
+            await self.send(session, uid, self.message(uid, self.verbs.forms(inf, right())))
+            if i == 1:
+                await self.send(session, uid, *(self.callback(uid, "forms_next") for _ in range(4)))
+            else:
+                await self.send(session, uid, self.callback(uid, "forms_next"))
+        await self.send(session, uid, self.callback(uid, "back"))
+
+        await self.send(session, uid, self.callback(uid, "menu_translation"))
+        for _ in range(2):
+            inf = self.asked(uid, TRANSLATION_PROMPT)
+            await self.send(session, uid, self.message(uid, self.verbs.translation(inf, right())))
+            await self.send(session, uid, self.callback(uid, "translation_next"))
+        await self.send(session, uid, self.callback(uid, "back"))
+
+        await self.send(session, uid, self.callback(uid, "menu_speed"))
+        for _ in range(5):
+            await self.send(session, uid, self.message(uid, self.verbs.forms(None, right())))
+        await self.send(session, uid, self.callback(uid, "speed_stop"))
+        await self.send(session, uid, self.message(uid, "/stats"))
+
+    def reset(self):
+        self.latencies = []
+        self.acks = []
+        self.updates = self.timeouts = self.errors = 0
+
+    async def run(self, users, concurrency, first_uid=1):
+        slots = asyncio.Semaphore(concurrency)
+
+        async with ClientSession() as session:
+            async def one(uid):
+                async with slots:
+                    await self.user(session, uid)
+
+            started = time.perf_counter()
+            await asyncio.gather(*(one(uid) for uid in range(first_uid, first_uid + users)))
+            return time.perf_counter() - started
+
+
+def rss_kb(pid):
+    # VmRSS / VmHWM процесса и всех его потомков (кластер — несколько процессов)
+    children = {}
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+            children.setdefault(ppid, []).append(int(entry))
+
+    rss = peak = 0
+    stack = [pid]
+    while stack:
+        p = stack.pop()
+        stack.extend(children.get(p, []))
+        try:
+            with open(f"/proc/{p}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        rss += int(line.split()[1])
+                    elif line.startswith("VmHWM:"):
+                        peak += int(line.split()[1])
+        except OSError:
+            pass
+    return rss, peak
+
+
+async def wait_ready(port, proc):
+    async with ClientSession() as session:
+        for _ in range(600):
+            if proc.poll() is not None:
+                raise RuntimeError(f"bot exited with {proc.returncode}")
+            try:
+                async with session.get(f"http://127.0.0.1:{port}/metrics") as resp:
+                    if resp.status == 200:
+                        return
+            except OSError:
+                pass
+            await asyncio.sleep(0.1)
+    raise RuntimeError("bot did not start")
+
+
+def percentile(values, p):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100 * len(values)))]
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50, help="users active at once")
+    parser.add_argument("--think", type=float, default=0.0, help="mean pause between a user's updates (sec)")
+    parser.add_argument("--api-latency", type=float, default=0.05)
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--api-rate", type=float, default=100_000, help="bot's API_RATE")
+    parser.add_argument("--chat-rate", type=float, default=1000, help="bot's CHAT_RATE")
+    parser.add_argument("--workers", type=int, default=0, help="run src/cluster.py with N workers")
+    parser.add_argument("--db", action="store_true", help="use a temporary SQLite DB_PATH")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--secret", default="loadtest-secret", help="WEBHOOK_SECRET of the bot")
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    api = FakeBotApi(args.api_latency, rate_429=args.rate_429, retry_after=args.retry_after, seed=args.seed)
+    api_port, port = free_port(), free_port()
+    runner = await api.start(api_port)
+
+    tmp = tempfile.TemporaryDirectory()
+    env = dict(
+        os.environ,
+        TELEGRAM_TOKEN="123:load",
+        TELEGRAM_API_URL=f"http://127.0.0.1:{api_port}",
+        RAILWAY_STATIC_URL="loadtest.invalid",
+        PORT=str(port),
+        VERBS_WATCH="0",
+        LOG_LEVEL="WARNING",
+        API_RATE=str(args.api_rate),
+        CHAT_RATE=str(args.chat_rate),
+        WEBHOOK_SECRET=args.secret,
+    )
+    env.pop("DB_PATH", None)
+    if args.db:
+        env["DB_PATH"] = os.path.join(tmp.name, "bot.db")
+    if args.workers:
+        cmd = [sys.executable, CLUSTER, "--workers", str(args.workers)]
+    else:
+        env["RUN_MODE"] = "webhook"
+        cmd = [sys.executable, BOT]
+    proc = subprocess.Popen(cmd, env=env)
+
+    try:
+        await wait_ready(port, proc)
+        driver = Driver(api, f"http://127.0.0.1:{port}/webhook", Verbs(VERBS), args)
+        # Прогрев: процессы кластера стартуют, пока диспетчер уже принимает
+        await driver.run(4 * max(1, args.workers), 4 * max(1, args.workers), first_uid=10_000_000)
+        driver.reset()
+        idle_rss, _ = rss_kb(proc.pid)
+        elapsed = await driver.run(args.users, args.concurrency)
+        rss, peak = rss_kb(proc.pid)
+
+        # Апдейты обрабатываются в фоне: ждём, пока бот перестанет звать API
+        seen = -1
+        while seen != sum(api.methods.values()):
+            seen = sum(api.methods.values())
+            await asyncio.sleep(0.5)
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+        await runner.cleanup()
+        tmp.cleanup()
+
+    lat, acks = driver.latencies, driver.acks
+    print(f"bot: {'cluster x%d' % args.workers if args.workers else 'single process'}, "
+          f"API latency {args.api_latency * 1000:.0f} ms, 429 rate {args.rate_429:.1%}")
+    print(f"users {args.users} ({args.concurrency} at once), updates {driver.updates}, "
+          f"elapsed {elapsed:.2f}s, throughput {driver.updates / elapsed:.0f} updates/s")
+    print(f"latency p50 {percentile(lat, 50) * 1000:.0f} ms, p90 {percentile(lat, 90) * 1000:.0f} ms, "
+          f"p99 {percentile(lat, 99) * 1000:.0f} ms, max {max(lat, default=0) * 1000:.0f} ms "
+          f"({len(lat)} samples, {driver.timeouts} timeouts, {driver.errors} HTTP errors)")
+    print(f"webhook p50 {percentile(acks, 50) * 1000:.1f} ms, p99 {percentile(acks, 99) * 1000:.1f} ms, "
+          f"max {max(acks, default=0) * 1000:.1f} ms")
+    print(f"RSS after warm-up {idle_rss / 1024:.1f} MB, after {rss / 1024:.1f} MB, peak {peak / 1024:.1f} MB")
+    print(f"webhook set to {api.webhook}")
+    print("Bot API calls:")
+    for method, count in api.methods.most_common():
+        extra = f"  (429: {api.throttled[method]})" if api.throttled[method] else ""
+        print(f"    {method:<22} {count:7d}{extra}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,146 @@
+"""Stress per-user update serialization with interleaved Next taps and answers.
+
+Every user fires "▶️ Next" / answer pairs concurrently through the real
+dispatcher against a fake Bot API session with random latency. An answer
+must be graded against the verb the preceding Next showed; the script
+counts violations with and without UserLockMiddleware.
+
+    python bench/stress_user_lock.py [users] [rounds]
+"""
+import asyncio
+import datetime
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+os.environ.setdefault("TELEGRAM_TOKEN", "1:stress")
+
+from aiogram.client.session.base import BaseSession  # noqa: E402
+from aiogram.methods import EditMessageText, SendMessage  # noqa: E402
+from aiogram.types import Chat, Message  # noqa: E402
+
+import bot_railway  # noqa: E402
+from middlewares import UserLockMiddleware  # noqa: E402
+
+PROMPT = re.compile(r"Infinitive: \*(.+?)\*")
+# Ответы — MarkdownV2: "Correct\!" с экранированным восклицательным знаком
+GRADE = re.compile(r"(?:Correct\\!\n\n|Correct: )(.+?) — ")
+
+
+class FakeSession(BaseSession):
+    def __init__(self):
+        super().__init__()
+        self.log = {}   # chat_id -> [("prompt"|"grade", inf)]
+
+    async def close(self):
+        pass
+
+    async def stream_content(self, *args, **kwargs):
+        yield b""
+
+    async def make_request(self, bot, method, timeout=None):
+        await asyncio.sleep(random.random() * 0.002)
+
+        if isinstance(method, (SendMessage, EditMessageText)):
+            chat_id = method.chat_id
+            for kind, pattern in (("prompt", PROMPT), ("grade", GRADE)):
+                m = pattern.search(method.text)
+                if m:
+                    self.log.setdefault(chat_id, []).append((kind, m.group(1)))
+            return Message(
+                message_id=1,
+                date=datetime.datetime.now(),
+                chat=Chat(id=chat_id, type="private"),
+                text=method.text,
+            )
+        return True
+
+
+def message(uid, text, n):
+    return {"update_id": n, "message": {
+        "message_id": n, "date": int(time.time()), "text": text,
+        "chat": {"id": uid, "type": "private"},
+        "from": {"id": uid, "is_bot": False, "first_name": "u"},
+    }}
+
+
+def callback(uid, data, n):
+    return {"update_id": n, "callback_query": {
+        "id": str(n), "chat_instance": "s", "data": data,
+        "from": {"id": uid, "is_bot": False, "first_name": "u"},
+        "message": {"message_id": 1, "date": int(time.time()), "text": "-",
+                    "chat": {"id": uid, "type": "private"}},
+    }}
+
+
+async def run(users, rounds):
+    bot, dp = bot_railway.bot, bot_railway.dp
+    session = bot.session = FakeSession()
+    n = 0
+
+    # Каждый пользователь начинает сессию форм
+    for uid in range(1, users + 1):
+        n += 1
+        await dp.feed_raw_update(bot, callback(uid, "menu_forms", n))
+    session.log.clear()
+
+    # Next + ответ, всё сразу и вперемешку между пользователями
+    tasks = []
+    for _ in range(rounds):
+        for uid in range(1, users + 1):
+            n += 2
+            tasks.append(dp.feed_raw_update(bot, callback(uid, "forms_next", n - 1)))
+            tasks.append(dp.feed_raw_update(bot, message(uid, "went gone", n)))
+
+    start = time.perf_counter()
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+
+    violations = 0
+    for events in session.log.values():
+        shown = None
+        for kind, inf in events:
+            if kind == "prompt":
+                shown = inf
+            elif inf != shown:
+                violations += 1
+    return violations, len(tasks), elapsed
+
+
+async def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    random.seed(3)
+
+    # Каталог и хранилище грузятся здесь; до этого ReadyMiddleware держит апдейты
+    await bot_railway.start_services()
+
+    outer = bot_railway.dp.update.outer_middleware
+    lock_mw = next(m for m in outer if isinstance(m, UserLockMiddleware))
+
+    # Все Next пользователя тут в полёте одновременно, и EditCoalescer
+    # пропускает все, кроме последнего. Ответ тогда проверяется по
+    # глаголу, которого не показывали, — для проверки лока это шум
+    outer.unregister(bot_railway.edit_coalescer)
+
+    outer.unregister(lock_mw)
+    violations, updates, elapsed = await run(users, rounds)
+    print(f"without lock: {violations:>6} answers graded against the wrong verb "
+          f"({updates} updates, {updates / elapsed:,.0f} updates/s)")
+
+    outer.register(lock_mw)
+    violations, updates, elapsed = await run(users, rounds)
+    print(f"with lock:    {violations:>6} answers graded against the wrong verb "
+          f"({updates} updates, {updates / elapsed:,.0f} updates/s)")
+    print(f"locks left in table: {len(bot_railway.user_locks)}")
+
+    await bot_railway.stop_services()
+    if violations:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
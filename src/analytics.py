@@ -0,0 +1,178 @@
+import argparse
+import glob
+import json
+import os
+import sys
+
+from answer_log import CHUNK_SUFFIX
+
+# ============================
+#  ANSWER LOG REPORTS
+# ============================
+#
+# Офлайн-отчёт по журналу ответов (answer_log.py): точность по режимам,
+# уровням и глаголам, самые трудные глаголы. Чанки читаются по одному
+# прямо в массивы NumPy и сворачиваются через bincount — в памяти
+# только один чанк и итоговые суммы, без dict на строку.
+#
+#     python3 src/analytics.py /data/answers [--top 20] [--min-answers 50]
+#
+# NumPy нужен только здесь, в зависимости бота он не входит:
+#     pip install numpy
+
+try:
+    import numpy as np
+except ImportError:
+    sys.exit("analytics.py needs NumPy: pip install numpy")
+
+
+def read_chunk(path):
+    with open(path, "rb") as f:
+        header = json.loads(f.readline())
+        order = "<" if header["byteorder"] == "little" else ">"
+        rows = header["rows"]
+        columns = {
+            name: np.fromfile(f, dtype=np.dtype(code).newbyteorder(order), count=rows)
+            for name, code in header["columns"]
+        }
+    return header, columns
+
+
+def sorted_unique(values):
+    # np.unique тут в разы медленнее: sort + сравнение соседей
+    values = np.sort(values)
+    if len(values):
+        keep = np.empty(len(values), dtype=bool)
+        keep[0] = True
+        np.not_equal(values[1:], values[:-1], out=keep[1:])
+        values = values[keep]
+    return values
+
+
+class Users:
+    """Число разных uid: уникальные по чанкам, склеиваемые время от времени."""
+
+    def __init__(self, compact_at=1 << 24):
+        self.parts = []
+        self.size = 0
+        self.compact_at = compact_at
+
+    def add(self, uids):
+        part = sorted_unique(uids)
+        self.parts.append(part)
+        self.size += len(part)
+        if self.size >= self.compact_at:
+            self.parts = [sorted_unique(np.concatenate(self.parts))]
+            self.size = len(self.parts[0])
+            self.compact_at = max(self.compact_at, 2 * self.size)
+
+    def __len__(self):
+        if len(self.parts) > 1:
+            self.parts = [sorted_unique(np.concatenate(self.parts))]
+        return len(self.parts[0]) if self.parts else 0
+
+
+class Totals:
+    """Ответов / верных / сумма времени ответа по значениям одного ключа."""
+
+    def __init__(self):
+        self.answers = np.zeros(0, dtype=np.int64)
+        self.correct = np.zeros(0, dtype=np.int64)
+        self.latency = np.zeros(0, dtype=np.float64)
+
+    def _grow(self, size):
+        if size > len(self.answers):
+            pad = size - len(self.answers)
+            self.answers = np.concatenate([self.answers, np.zeros(pad, dtype=np.int64)])
+            self.correct = np.concatenate([self.correct, np.zeros(pad, dtype=np.int64)])
+            self.latency = np.concatenate([self.latency, np.zeros(pad, dtype=np.float64)])
+
+    def add(self, keys, correct, latency, size):
+        self._grow(size)
+        self.answers[:size] += np.bincount(keys, minlength=size)
+        self.correct[:size] += np.bincount(keys, weights=correct, minlength=size).astype(np.int64)
+        self.latency[:size] += np.bincount(keys, weights=latency, minlength=size)
+
+    def rows(self, labels, min_answers=1):
+        # (метка, ответов, точность, среднее время сек) для ключей с ответами
+        for key in np.flatnonzero(self.answers >= max(1, min_answers)):
+            n = self.answers[key]
+            yield labels[key], int(n), self.correct[key] / n, self.latency[key] / n / 1000
+
+
+def aggregate(paths):
+    verbs = []                      # общий список глаголов по всем чанкам
+    verb_ids = {}
+    modes = []
+    mode_ids = {}
+    by_verb, by_level, by_mode = Totals(), Totals(), Totals()
+    users = Users()
+    rows = 0
+
+    for path in paths:
+        header, c = read_chunk(path)
+        if not header["rows"]:
+            continue
+        rows += header["rows"]
+
+        # Номера глаголов и режимов чанка -> общие номера, одним take()
+        for table, ids, names in ((verbs, verb_ids, header["verbs"]), (modes, mode_ids, header["modes"])):
+            for name in names:
+                if name not in ids:
+                    ids[name] = len(table)
+                    table.append(name)
+        verb_map = np.array([verb_ids[v] for v in header["verbs"]] or [0], dtype=np.int64)
+        mode_map = np.array([mode_ids[m] for m in header["modes"]] + [len(modes)], dtype=np.int64)
+
+        correct = c["correct"].astype(np.float64)
+        latency = c["latency_ms"].astype(np.float64)
+        by_verb.add(verb_map.take(c["verb"]), correct, latency, len(verbs))
+        by_level.add(c["level"], correct, latency, 256)
+        # 255 — неизвестный режим: он встаёт последним после известных
+        mode_codes = np.minimum(c["mode"], len(header["modes"]))
+        by_mode.add(mode_map.take(mode_codes), correct, latency, len(modes) + 1)
+        users.add(c["uid"])
+
+    return {
+        "rows": rows,
+        "users": len(users),
+        "verbs": verbs,
+        "modes": modes + ["other"],
+        "by_verb": by_verb,
+        "by_level": by_level,
+        "by_mode": by_mode,
+    }
+
+
+def print_table(title, rows):
+    print(f"\n{title}")
+    print(f"  {'':<16} {'answers':>12} {'accuracy':>9} {'avg time':>9}")
+    for label, answers, acc, latency in rows:
+        print(f"  {str(label):<16} {answers:>12,} {acc:>9.1%} {latency:>8.1f}s")
+
+
+def report(result, top, min_answers):
+    print(f"Answers: {result['rows']:,}   users: {result['users']:,}   verbs: {len(result['verbs'])}")
+    print_table("By mode", result["by_mode"].rows(result["modes"]))
+    print_table("By level", result["by_level"].rows(range(256)))
+
+    verb_rows = list(result["by_verb"].rows(result["verbs"], min_answers))
+    verb_rows.sort(key=lambda row: row[2])
+    print_table(f"Hardest verbs (at least {min_answers} answers)", verb_rows[:top])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Accuracy reports over the answer log")
+    parser.add_argument("directory", help="ANSWER_LOG_DIR of the bot")
+    parser.add_argument("--top", type=int, default=20, help="how many hardest verbs to show")
+    parser.add_argument("--min-answers", type=int, default=50, help="ignore verbs with fewer answers")
+    args = parser.parse_args()
+
+    paths = sorted(glob.glob(os.path.join(args.directory, f"*{CHUNK_SUFFIX}")))
+    if not paths:
+        sys.exit(f"No answer log chunks in {args.directory}")
+    report(aggregate(paths), args.top, args.min_answers)
+
+
+if __name__ == "__main__":
+    main()
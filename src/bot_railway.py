@@ -1,15 +1,74 @@
-print("🔥 FILE LOADED: bot_railway.py")
+import time
+IMPORTS_STARTED = time.perf_counter()
+
+import asyncio
+import logging
 import os
-import json
 import random
-import time
+import signal
+import socket
+from contextlib import contextmanager
 from aiohttp import web
 from aiogram import Bot, Dispatcher, types, F
 from aiogram.enums import ParseMode
 from aiogram.filters import Command
-from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
 from aiogram.client.default import DefaultBotProperties
-from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.exceptions import TelegramBadRequest
+
+from answer_log import AnswerLog
+
+from client import CachedMarkupSession
+from concurrency import KeyedLock, Lease
+from dataset import DatasetError, DatasetWatcher, load_verbs
+from grading import check_forms, check_speed, check_translation
+from keyboards import Keyboards
+from logs import log_event, setup_logging
+from metrics import REGISTRY, Counter, Gauge, Histogram
+from middlewares import (
+    ApiTimingMiddleware,
+    EditCoalescer,
+    HandlerTimingMiddleware,
+    InFlightMiddleware,
+    RateLimitMiddleware,
+    ReadyMiddleware,
+    UserLockMiddleware,
+)
+from polling import UserOrderedWorkers, run_polling
+from ratelimit import BULK, PRIORITY, RateLimiter
+from reminders import Broadcaster, ReminderScheduler, get_zone
+from sampler import AdaptiveSampler
+from stats import Leaderboard, accuracy, answers_on, record_answer, verb_counts
+from sessions import Session, SessionCache
+from storage import MemoryStore, SqliteStore
+from timing_wheel import TimingWheel
+from users import UserCache, UserRecord
+from verb_catalog import VerbCatalog
+
+setup_logging()
+log = logging.getLogger("bot")
+
+# ============================
+#  STARTUP TIMING
+# ============================
+#
+# Фазы запуска (сек): imports, module, bind, verbs, keyboards, store,
+# webhook. Итог пишется одной строкой в лог и отдаётся в /metrics.
+
+STARTUP_PHASES = {"imports": time.perf_counter() - IMPORTS_STARTED}
+
+@contextmanager
+def startup_phase(name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        STARTUP_PHASES[name] = time.perf_counter() - started
+
+def log_startup():
+    total = sum(STARTUP_PHASES.values())
+    phases = " ".join(f"{name}={seconds * 1000:.0f}ms" for name, seconds in STARTUP_PHASES.items())
+    log.info("🚀 Started in %.2fs: %s", total, phases)
 
 # ============================
 #  CONFIG
@@ -17,27 +76,165 @@ from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 
 HOST = os.getenv("RAILWAY_STATIC_URL")
 WEBHOOK_PATH = "/webhook"
+METRICS_PATH = "/metrics"
 WEBHOOK_URL = f"https://{HOST}{WEBHOOK_PATH}" if HOST else None
 
+# Путь к SQLite базе; без него всё хранится только в памяти процесса
+DB_PATH = os.getenv("DB_PATH")
+
+# Сессии тренировок: максимум записей и время простоя до выселения (сек)
+SESSION_MAX = int(os.getenv("SESSION_MAX", 100_000))
+SESSION_TTL = int(os.getenv("SESSION_TTL", 6 * 3600))
+
+# Записи пользователей в памяти (только с DB_PATH): максимум и простой до выселения (сек)
+USER_CACHE_MAX = int(os.getenv("USER_CACHE_MAX", 100_000))
+USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL", 3600))
+
+# Ежедневное напоминание: местное время и пояс по умолчанию
+REMINDER_TIME = os.getenv("REMINDER_TIME", "09:00")
+REMINDER_TZ = os.getenv("REMINDER_TZ", "UTC")
+
+# Каталог журнала ответов для офлайн-отчётов (src/analytics.py); пусто — не пишем
+ANSWER_LOG_DIR = os.getenv("ANSWER_LOG_DIR")
+
+# Режим запуска: webhook или polling (по умолчанию — webhook, если есть адрес)
+RUN_MODE = os.getenv("RUN_MODE") or ("webhook" if WEBHOOK_URL else "polling")
+POLLING_WORKERS = int(os.getenv("POLLING_WORKERS", 8))
+
+# Несколько процессов за одним вебхуком (src/cluster.py задаёт их сам):
+# номер процесса, их число и unix-сокет, на котором процесс слушает.
+# Процесс обслуживает только пользователей с uid % CLUSTER_SIZE == WORKER_ID.
+WORKER_ID = int(os.getenv("WORKER_ID", 0))
+CLUSTER_SIZE = int(os.getenv("CLUSTER_SIZE", 1))
+WORKER_SOCKET = os.getenv("WORKER_SOCKET")
+
+# Админы бота (через запятую): им доступна /reload
+ADMIN_IDS = {int(x) for x in os.getenv("ADMIN_IDS", "").replace(" ", "").split(",") if x}
+
+# Как часто проверять verbs.json на изменения (сек); 0 — не следить
+VERBS_WATCH = float(os.getenv("VERBS_WATCH", 5))
+
+# Пул соединений к Bot API: размер и сколько держать простаивающее соединение (сек)
+API_POOL_SIZE = int(os.getenv("API_POOL_SIZE", 100))
+API_KEEPALIVE = float(os.getenv("API_KEEPALIVE", 60))
+
+# Лимиты Telegram на отправку: всего (msg/s, делится между процессами
+# кластера), на один чат (msg/s и сколько можно подряд), сколько запросов
+# может ждать очереди, прежде чем рассылка начнёт отбрасываться
+API_RATE = float(os.getenv("API_RATE", 30))
+CHAT_RATE = float(os.getenv("CHAT_RATE", 1))
+CHAT_BURST = int(os.getenv("CHAT_BURST", 3))
+API_QUEUE_LIMIT = int(os.getenv("API_QUEUE_LIMIT", 1000))
+
+# Отвечать на callback прямо в ответе на вебхук, без отдельного запроса
+WEBHOOK_ANSWER_CALLBACKS = os.getenv("WEBHOOK_ANSWER_CALLBACKS", "1") == "1"
+
+# Приём вебхука: секрет (передаётся в setWebhook и проверяется в каждом
+# запросе), число воркеров, длина очереди одного воркера и что делать,
+# когда она полна: retry — 503 и Telegram повторит, drop — потерять апдейт
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET") or None
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", 64))
+WEBHOOK_QUEUE = int(os.getenv("WEBHOOK_QUEUE", 100))
+WEBHOOK_SHED = os.getenv("WEBHOOK_SHED", "retry")
+# Сколько при остановке дорабатывать уже принятые апдейты (сек)
+SHUTDOWN_DRAIN_SECONDS = float(os.getenv("SHUTDOWN_DRAIN_SECONDS", 10))
+
+# Другой адрес Bot API (локальный сервер / фейк для нагрузочных тестов)
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL")
+
 TOKEN = os.getenv("TELEGRAM_TOKEN")
 if not TOKEN:
     raise RuntimeError("TELEGRAM_TOKEN missing")
 
+if TELEGRAM_API_URL:
+    session = CachedMarkupSession(API_POOL_SIZE, API_KEEPALIVE, api=TelegramAPIServer.from_base(TELEGRAM_API_URL))
+else:
+    session = CachedMarkupSession(API_POOL_SIZE, API_KEEPALIVE)
+
 bot = Bot(
     token=TOKEN,
+    session=session,
     default=DefaultBotProperties(parse_mode=ParseMode.MARKDOWN)
 )
 dp = Dispatcher()
 
+# ============================
+#  METRICS
+# ============================
+
+HANDLER_SECONDS = Histogram("bot_handler_seconds", "Update handling time by route", ["route"])
+API_SECONDS = Histogram("bot_api_request_seconds", "Outgoing Bot API request time", ["method"])
+API_ERRORS = Counter("bot_api_errors_total", "Failed Bot API requests", ["method", "error"])
+HTTP_SECONDS = Histogram("bot_http_request_seconds", "Incoming HTTP request time", ["path"])
+WEBHOOK_REJECTED = Counter("bot_webhook_rejected_total", "Webhook requests refused before queueing", ["reason"])
+WEBHOOK_SHED_TOTAL = Counter("bot_webhook_shed_total", "Updates shed because the worker queue was full", ["policy"])
+UPDATES_IN_FLIGHT = Gauge("bot_updates_in_flight", "Updates inside the dispatcher, including those waiting for the user lock")
+
+COMMAND_ROUTES = {"/start", "/help", "/stats", "/top", "/timezone", "/reload"}
+
+def callback_route(q):
+    # Только callback_data из таблицы маршрутов; остальное идёт в "other"
+    return q.data if q.data in CALLBACKS else "other"
+
+def message_route(msg):
+    text = msg.text or ""
+    if text.startswith("/"):
+        command = text.split(maxsplit=1)[0]
+        return command if command in COMMAND_ROUTES else "command"
+
+    st = user_state.get(msg.from_user.id, count=False) if msg.from_user else None
+    return f"text:{st.mode if st else 'none'}"
+
+dp.update.outer_middleware(InFlightMiddleware(UPDATES_IN_FLIGHT))
+dp.callback_query.outer_middleware(HandlerTimingMiddleware(HANDLER_SECONDS, callback_route))
+dp.message.outer_middleware(HandlerTimingMiddleware(HANDLER_SECONDS, message_route))
+
+# Лимитер снаружи: время запроса считается без ожидания токена, каждый повтор отдельно
+rate_limiter = RateLimiter(API_RATE / CLUSTER_SIZE, CHAT_RATE, CHAT_BURST, API_QUEUE_LIMIT)
+API_RETRIED = Counter("bot_api_retried_total", "Bot API requests repeated after 429", ["method"])
+API_DROPPED = Counter("bot_api_dropped_total", "Messages not sent because of rate limits", ["priority", "reason"])
+Gauge("bot_api_queue_depth", "Requests waiting for a global rate limit token", ["priority"], func=rate_limiter.depth)
+bot.session.middleware(RateLimitMiddleware(rate_limiter, retried=API_RETRIED, dropped=API_DROPPED))
+bot.session.middleware(ApiTimingMiddleware(API_SECONDS, API_ERRORS))
+
+# Повторные «Next» по одному сообщению: перерисовывает только последнее.
+# Считать нажатия нужно до лока пользователя — пока они ждут очереди
+EDITS_COALESCED = Counter("bot_edits_coalesced_total", "Next presses skipped because a newer one was queued")
+edit_coalescer = EditCoalescer(lambda data: bool(data) and data.endswith("_next"), EDITS_COALESCED)
+dp.update.outer_middleware(edit_coalescer)
+
+# Один апдейт на пользователя за раз
+user_locks = KeyedLock()
+dp.update.outer_middleware(UserLockMiddleware(user_locks))
+
+# Порт открывается раньше, чем загружены глаголы и хранилище:
+# апдейты, пришедшие в этот промежуток, ждут готовности
+services_ready = asyncio.Event()
+dp.update.outer_middleware(ReadyMiddleware(services_ready))
+
+Gauge("bot_startup_seconds", "Startup time by phase", ["phase"], func=lambda: STARTUP_PHASES)
+
 # ============================
 #  LOAD VERBS
 # ============================
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-VERBS_PATH = os.path.join(BASE_DIR, "verbs.json")
+VERBS_PATH = os.getenv("VERBS_PATH") or os.path.join(BASE_DIR, "verbs.json")
 
-with open(VERBS_PATH, "r", encoding="utf-8") as f:
-    verbs = json.load(f)
+# Загружается в start_services(), уже после открытия порта
+catalog = None
+
+def reload_catalog():
+    # Новый каталог собирается целиком и подменяется одним присваиванием.
+    # Начатые сессии держат ссылку на свой каталог (st.catalog),
+    # поэтому их индексы в пуле остаются верными до конца сессии.
+    global catalog
+    new = VerbCatalog(load_verbs(VERBS_PATH), TEMPLATES)
+    catalog = new
+    log.info("📚 Verbs loaded: %d verbs, levels %s", len(new), new.levels)
+    return new
+
+verbs_watcher = DatasetWatcher(VERBS_PATH, reload_catalog, interval=VERBS_WATCH)
 
 EXPLANATION = (
     "*Past Simple vs Present Perfect*\n\n"
@@ -69,663 +266,636 @@ EXPLANATION = (
 #  USER STORAGE
 # ============================
 
-user_state = {}
-user_stats = {}
-user_settings = {}
-user_errors = {}
-
-def ensure_user_settings(uid):
-    if uid not in user_settings:
-        user_settings[uid] = {"daily_enabled": False, "level": 1}
+user_state = SessionCache(max_entries=SESSION_MAX, ttl=SESSION_TTL)
+
+Gauge("bot_sessions", "Session cache counters", ["counter"], func=user_state.stats)
+Gauge("bot_store_dirty_users", "Users waiting for the next store flush", func=lambda: store.pending())
+
+# Рейтинг по всем пользователям базы: заполняется в start_services(),
+# дальше обновляется на каждый ответ. В кластере процесс видит свежие
+# очки только своих пользователей, чужие — на момент своего запуска
+leaderboard = Leaderboard()
+
+def user_snapshot(uid):
+    user = users.get(uid, touch=False)
+    return user.to_json() if user is not None else None
+
+if DB_PATH:
+    store = SqliteStore(DB_PATH, user_snapshot)
+    # Сохранённую запись можно выселить: get_user подгрузит её из базы
+    users = UserCache(USER_CACHE_MAX, USER_CACHE_TTL, persisted=lambda uid: not store.is_pending(uid))
+else:
+    store = MemoryStore()
+    users = UserCache()
+
+Gauge("bot_user_cache", "User record cache counters", ["counter"], func=users.stats)
+
+def get_user(uid):
+    # Из памяти, из стора при первом обращении или новый
+    user = users.get(uid)
+    if user is None:
+        data = store.load(uid)
+        if data is not None:
+            user = UserRecord.from_json(data, known=catalog.by_inf)
+        else:
+            user = UserRecord()
+        users[uid] = user
+    return user
 
-def init_user(uid):
-    ensure_user_settings(uid)
-    user_stats.setdefault(uid, {"correct": 0, "wrong": 0, "best": 0, "streak": 0, "last_training": 0})
-    user_errors.setdefault(uid, [])
-    user_state.setdefault(uid, {})
+# ============================
+#  DAILY REMINDERS
+# ============================
 
-def get_user_level(uid):
-    return user_settings[uid]["level"]
+async def send_reminder(uid):
+    # Каждое напоминание — в своей задаче, приоритет не утечёт к ответам
+    PRIORITY.set(BULK)
+    await bot.send_message(uid, "⏰ Time to practise your verbs!")
 
-def get_random_verb(level):
-    available = [v for v in verbs if v.get("level", 1) <= level]
-    verb = random.choice(available)
-    print("DEBUG LEVEL REQUESTED:", level)
-    print("DEBUG VERB SELECTED:", verb["inf"], "LEVEL:", verb["level"])
-    return verb
+def on_reminder_blocked(uid):
+    get_user(uid).daily = False
+    store.mark_dirty(uid)
+    reminders.disable(uid)
 
-def build_verb_pool(level):
-    # Берём все глаголы уровней ≤ текущего
-    pool = [v for v in verbs if v.get("level", 1) <= level]
-    random.shuffle(pool)
-    return pool
+reminders = ReminderScheduler(
+    Broadcaster(send_reminder, on_blocked=on_reminder_blocked),
+    at=REMINDER_TIME,
+    default_tz=REMINDER_TZ,
+)
 
-def get_next_verb(uid):
-    st = user_state[uid]
+def owns_user(uid):
+    return uid % CLUSTER_SIZE == WORKER_ID
+
+async def start_reminders():
+    # Подписчики из базы (только свои) + запуск планировщика напоминаний
+    for uid, settings in store.daily_users():
+        if owns_user(uid):
+            reminders.enable(uid, settings.get("tz"))
+    reminders.start()
+
+# Напоминания своей доли пользователей шлёт только держатель аренды:
+# при выкатке старый и новый процесс не отправят их дважды
+reminder_lease = Lease(
+    store,
+    f"reminders:{WORKER_ID}/{CLUSTER_SIZE}",
+    f"{socket.gethostname()}:{os.getpid()}",
+    on_acquire=start_reminders,
+    on_release=reminders.stop,
+)
 
-    # Если пула нет или он закончился — пересобираем
-    if "pool" not in st or "index" not in st or st["index"] >= len(st["pool"]):
-        level = get_user_level(uid)
-        st["pool"] = build_verb_pool(level)
-        st["index"] = 0
+def sync_reminder(uid):
+    user = get_user(uid)
+    if user.daily:
+        reminders.enable(uid, user.tz)
+    else:
+        reminders.disable(uid)
+
+def build_sampler(uid, cat):
+    # Глаголы уровней ≤ текущего, веса — по ошибкам пользователя за всё время
+    user = get_user(uid)
+    indices = cat.indices(user.level)
+    return AdaptiveSampler(indices, [verb_counts(user.stats, cat[i]["inf"]) for i in indices])
+
+def session_catalog(st):
+    return st.catalog or catalog
+
+def get_next_verb(uid, st):
+    cat = session_catalog(st)
+    if st.sampler is None:
+        st.sampler = build_sampler(uid, cat)
+    st.asked = time.monotonic()
+    return cat[st.sampler.draw()]
+
+def adapt(st, verb, ok):
+    # Итог проверки сдвигает вес глагола в выборе до конца сессии
+    sampler = st.sampler
+    if sampler is not None:
+        sampler.record(session_catalog(st).by_inf[verb["inf"]], ok)
+
+answer_log = AnswerLog(ANSWER_LOG_DIR, writer=str(WORKER_ID)) if ANSWER_LOG_DIR else None
+
+def log_answer(uid, st, verb, ok):
+    if answer_log is None:
+        return
+    latency = time.monotonic() - st.asked if st.asked is not None else 0.0
+    answer_log.append(uid, verb["inf"], st.mode, verb.get("level", 1), ok, latency)
 
-    verb = st["pool"][st["index"]]
-    st["index"] += 1
-    return verb
+def new_session(uid, mode, **extra):
+    st = Session(mode, catalog, sampler=build_sampler(uid, catalog), **extra)
+    user_state[uid] = st
+    return st
 
-def add_error(uid, error):
-    if not any(e["verb"]["inf"] == error["verb"]["inf"] and e["mode"] == error["mode"] for e in user_errors[uid]):
-        user_errors[uid].append(error)
+def record_review(uid, verb, task, ok):
+    # Ошибка ставит карточку на повтор, верный ответ в срок — отодвигает
+    deck = get_user(uid).errors
+    if ok:
+        changed = deck.hit(verb["inf"], task)
+    else:
+        changed = deck.miss(verb["inf"], task)
+    if changed:
+        store.mark_dirty(uid)
+
+def record_result(uid, verb, ok, name):
+    stats = get_user(uid).stats
+    record_answer(stats, verb["inf"], ok)
+    if name and stats.name != name:
+        stats.name = name
+    leaderboard.update(uid, stats.correct, name)
+    store.mark_dirty(uid)
+
+def format_wait(seconds):
+    if seconds < 3600:
+        return f"{max(1, round(seconds / 60))} min"
+    if seconds < 2 * 86400:
+        return f"{round(seconds / 3600)} h"
+    return f"{round(seconds / 86400)} days"
 
 # ============================
 #  KEYBOARDS
 # ============================
 
+# Все варианты строятся один раз, в start_services()
+keyboards = None
+
+def build_keyboards():
+    global keyboards
+    keyboards = Keyboards()
+
 def main_menu(uid):
-    daily = user_settings[uid]["daily_enabled"]
-    daily_text = "🔔 Daily reminder: ON" if daily else "🔕 Daily reminder: OFF"
-
-    return InlineKeyboardMarkup(inline_keyboard=[
-        [
-            InlineKeyboardButton(text="📘 Verb Forms", callback_data="menu_forms"),
-            InlineKeyboardButton(text="🌐 Translation", callback_data="menu_translation"),
-        ],
-        [
-            InlineKeyboardButton(text="🎲 Mix", callback_data="menu_mix"),
-            InlineKeyboardButton(text="⚡ Speed", callback_data="menu_speed"),
-        ],
-        [InlineKeyboardButton(text="🔁 Repeat Mistakes", callback_data="menu_repeat")],
-        [
-            InlineKeyboardButton(text="📊 My Stats", callback_data="menu_stats"),
-            InlineKeyboardButton(text="⚙️ Settings", callback_data="menu_settings"),
-        ],
-        [InlineKeyboardButton(text=daily_text, callback_data="toggle_daily")],
-        [InlineKeyboardButton(text="ℹ️ Help", callback_data="menu_help")],
-    ])
-
-
-def forms_kb(prefix="forms"):
-    return InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="▶️ Next", callback_data=f"{prefix}_next")],
-        [InlineKeyboardButton(text="⬅️ Back", callback_data="back")]
-    ])
-
-
-def translation_kb(prefix="translation"):
-    return InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="▶️ Next", callback_data=f"{prefix}_next")],
-        [InlineKeyboardButton(text="⬅️ Back", callback_data="back")]
-    ])
-
-
-def speed_kb():
-    return InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="⏹ Stop", callback_data="speed_stop")],
-        [InlineKeyboardButton(text="⬅️ Back", callback_data="back")]
-    ])
-
-
-def difficulty_kb():
-    return InlineKeyboardMarkup(inline_keyboard=[
-        [
-            InlineKeyboardButton(text="1️⃣ Level 1", callback_data="difficulty_1"),
-            InlineKeyboardButton(text="2️⃣ Level 2", callback_data="difficulty_2"),
-            InlineKeyboardButton(text="3️⃣ Level 3", callback_data="difficulty_3"),
-        ],
-        [InlineKeyboardButton(text="⬅️ Back", callback_data="menu_settings")]
-    ])
-
-# ============================
-#  TRAINING START FUNCTIONS
-# ============================
-
-async def start_forms(uid, cid):
-    ensure_user_settings(uid)
-
-    user_state[uid] = {
-        "mode": "forms",
-        "pool": build_verb_pool(get_user_level(uid)),
-        "index": 0
-    }
-
-    verb = get_next_verb(uid)
-    print("DEBUG FORMS:", verb["inf"], "LEVEL:", verb["level"])
-
-    user_state[uid]["verb"] = verb
-
-    await bot.send_message(
-        cid,
-        f"📘 *Verb Forms*\n\n"
-        f"Infinitive: *{verb['inf']}*\n"
-        f"Translation: *{verb['ru']}*\n\n"
-        f"Write the 2nd and 3rd forms of the verb.\n"
-        f"Example: go → went, gone",
-        reply_markup=forms_kb("forms")
-    )
+    return keyboards.main[bool(get_user(uid).daily)]
 
 
-async def start_translation(uid, cid):
-    ensure_user_settings(uid)
+# ============================
+#  TRANSLATION PROCESSING
+# ============================
 
-    user_state[uid] = {
-        "mode": "translation",
-        "pool": build_verb_pool(get_user_level(uid)),
-        "index": 0
-    }
+async def process_translation(uid, st, text, msg, kb):
+    if st.verb is None:
+        await msg.answer("Session expired. Choose a mode 👇", reply_markup=main_menu(uid))
+        return
 
-    verb = get_next_verb(uid)
-    print("DEBUG TRANSLATION:", verb["inf"], "LEVEL:", verb["level"])
+    verb = st.verb
+    ok = check_translation(session_catalog(st).answers_for(verb), text)
+    record_review(uid, verb, "translation", ok)
+    record_result(uid, verb, ok, msg.from_user.first_name)
+    adapt(st, verb, ok)
+    log_answer(uid, st, verb, ok)
 
-    user_state[uid]["verb"] = verb
+    reply = session_catalog(st).text("translation_ok" if ok else "translation_wrong", verb)
+    await msg.answer(reply, parse_mode=ParseMode.MARKDOWN_V2, reply_markup=kb)
 
-    await bot.send_message(
-        cid,
-        f"🌐 *Translation*\n\nTranslate:\n*{verb['inf']}*",
-        reply_markup=translation_kb("translation")
-    )
+    # NEW VERB (LEVEL-BASED)
+    st.verb = MODES[st.mode].next_verb(uid, st)
 
-async def start_mix(uid, cid):
-    ensure_user_settings(uid)
-
-    user_state[uid] = {
-        "mode": "mix",
-        "pool": build_verb_pool(get_user_level(uid)),
-        "index": 0
-    }
-
-    sub = random.choice(["forms", "translation"])
-    verb = get_next_verb(uid)
-    print("DEBUG MIX:", verb["inf"], "LEVEL:", verb["level"], "SUB:", sub)
-
-    user_state[uid]["verb"] = verb
-    user_state[uid]["sub"] = sub
-
-    if sub == "forms":
-        await bot.send_message(
-            cid,
-            f"🎲 *Mix — Forms*\n\n"
-            f"Infinitive: *{verb['inf']}*\n"
-            f"Translation: *{verb['ru']}*\n\n"
-            f"Write the 2nd and 3rd forms of the verb.\n"
-            f"Example: go → went, gone",
-            reply_markup=forms_kb("mix")
-        )
-    else:
-        await bot.send_message(
-            cid,
-            f"🎲 *Mix — Translation*\n\nTranslate:\n*{verb['inf']}*",
-            reply_markup=translation_kb("mix")
-        )
 
 
-async def start_speed(uid, cid):
-    ensure_user_settings(uid)
+# ============================
+#  FORMS PROCESSING
+# ============================
+
+async def process_forms(uid, st, text, msg, kb):
+    if st.verb is None:
+        await msg.answer("Session expired. Choose a mode 👇", reply_markup=main_menu(uid))
+        return
 
-    user_state[uid] = {
-        "mode": "speed",
-        "pool": build_verb_pool(get_user_level(uid)),
-        "index": 0,
-        "correct": 0,
-        "total": 0,
-        "end": time.time() + 60,
-        "wrong": []
-    }
+    verb = st.verb
 
-    verb = get_next_verb(uid)
-    print("DEBUG SPEED:", verb["inf"], "LEVEL:", verb["level"])
+    cat = session_catalog(st)
+    ok = check_forms(cat.answers_for(verb), text)
+    record_review(uid, verb, "forms", ok)
+    record_result(uid, verb, ok, msg.from_user.first_name)
+    adapt(st, verb, ok)
+    log_answer(uid, st, verb, ok)
 
-    user_state[uid]["verb"] = verb
+    # Ответ
+    reply = cat.text("forms_ok" if ok else "forms_wrong", verb)
+    await msg.answer(reply, parse_mode=ParseMode.MARKDOWN_V2, reply_markup=kb)
+
+    # Следующий глагол
+    st.verb = MODES[st.mode].next_verb(uid, st)
 
-    await bot.send_message(
-        cid,
-        f"⚡ *Speed Mode — 60 sec*\n\nInfinitive: *{verb['inf']}*",
-        reply_markup=speed_kb()
-    )
 # ============================
-#  ANSWER PROCESSING
+#  SPEED MODE
 # ============================
 
-def norm(text):
-    return [p.strip().lower() for p in text.replace(",", " ").split() if p.strip()]
+SPEED_SECONDS = 60
 
+# Один общий таймер на все speed-сессии
+speed_timers = TimingWheel()
 
-# ============================
-#  TRANSLATION PROCESSING
-# ============================
+def speed_results(st):
+    wrong_list = st.wrong or []
+    cat = session_catalog(st)
+
+    wrong_text = (
+        "\n".join(cat.text("mistake", w) for w in wrong_list)
+        if wrong_list else "No mistakes — great job\\!"
+    )
+
+    # MarkdownV2, как и шаблоны: строки ошибок уже экранированы
+    return (
+        f"⏰ *Time is up\\!*\n\n"
+        f"Correct: {st.correct}\n"
+        f"Total: {st.total}\n\n"
+        f"❗ Mistakes:\n{wrong_text}"
+    )
+
+async def finish_speed(uid, cid, st):
+    # Сессию уже остановили, заменили другим режимом или выселили
+    if user_state.get(uid, count=False) is not st:
+        return
+
+    user_state.pop(uid)
+    st.timer.cancel()
+    await bot.send_message(cid, speed_results(st), parse_mode=ParseMode.MARKDOWN_V2, reply_markup=main_menu(uid))
+
+async def on_speed_timeout(uid, cid, st):
+    # Таймер срабатывает вне апдейта — берём тот же лок пользователя
+    async with user_locks(uid):
+        await finish_speed(uid, cid, st)
 
-async def process_translation(uid, text, msg, mode=None):
-    init_user(uid)
-    st = user_state.get(uid, {})
+async def process_speed(uid, st, text, msg):
+    # TIME IS UP (таймер ещё не успел сработать)
+    if speed_timers.clock() >= st.end:
+        await finish_speed(uid, msg.chat.id, st)
+        return
 
-    if "verb" not in st:
+    # NORMAL PROCESSING
+    if st.verb is None:
         await msg.answer("Session expired. Choose a mode 👇", reply_markup=main_menu(uid))
         return
 
-    verb = st["verb"]
-    expected = [p.strip() for p in verb["ru"].lower().replace(",", "/").split("/")]
+    verb = st.verb
+    cat = session_catalog(st)
+    ok = check_speed(cat.answers_for(verb), text)
+    adapt(st, verb, ok)
+    log_answer(uid, st, verb, ok)
 
-    ok = any(text.lower() == e or text.lower() in e for e in expected)
+    st.total += 1
 
     if ok:
-        user_stats[uid]["correct"] += 1
-        reply = f"✅ Correct!\n\n*{verb['inf']}* — *{verb['ru']}*"
+        st.correct += 1
     else:
-        user_stats[uid]["wrong"] += 1
-        add_error(uid, {"verb": verb, "mode": "translation"})
-        reply = f"❌ Wrong!\n\nCorrect: *{verb['inf']}* — *{verb['ru']}*"
+        # Словарь глагола из каталога, без копии
+        st.wrong.append(verb)
 
-    # send reply
-    if st["mode"] == "mix":
-        await msg.answer(reply, reply_markup=translation_kb("mix"))
-    else:
-        await msg.answer(reply, reply_markup=translation_kb("translation"))
+    await msg.answer(cat.text("forms_ok" if ok else "forms_wrong", verb), parse_mode=ParseMode.MARKDOWN_V2)
 
     # NEW VERB (LEVEL-BASED)
-    st["verb"] = get_next_verb(uid)
-
-
+    st.verb = get_next_verb(uid, st)
 
 # ============================
-#  FORMS PROCESSING
+#  MODES
 # ============================
+#
+# Режим — объект, который создаёт сессию, рисует вопрос и проверяет
+# ответ. Кнопки (menu_*, *_next) и текстовые ответы находят режим
+# по имени в MODES; новый режим — это новый класс, а не ветка в if.
+
+TASKS = ("forms", "translation")
+
+# Шаблоны MarkdownV2 (templates.py): рендерятся на каждый глагол при
+# загрузке каталога. Заголовки режимов — без спецсимволов MarkdownV2.
+
+def forms_prompt(title):
+    return (
+        f"{title}\n\n"
+        "Infinitive: *{inf}*\n"
+        "Translation: *{ru}*\n\n"
+        "Write the 2nd and 3rd forms of the verb\\.\n"
+        "Example: go → went, gone"
+    )
 
-def normalize_forms(value):
-    # Если список — нормализуем каждый элемент
-    if isinstance(value, list):
-        return [v.lower().strip() for v in value]
+def translation_prompt(title):
+    return f"{title}\n\nTranslate:\n*{{inf}}*"
 
-    # Если строка — поддерживаем варианты через "/"
-    if isinstance(value, str):
-        # НЕ разбиваем по пробелам — multi-word формы должны быть целыми
-        variants = value.split("/")
-        return [v.lower().strip() for v in variants]
+FEEDBACK = {
+    "translation_ok": "✅ Correct\\!\n\n*{inf}* — *{ru}*",
+    "translation_wrong": "❌ Wrong\\!\n\nCorrect: *{inf}* — *{ru}*",
+    "forms_ok": "✅ Correct\\!\n\n{inf} — {past}, {part}",
+    "forms_wrong": "❌ Wrong\\!\n\nCorrect: {inf} — {past}, {part}",
+    "mistake": "• *{inf}* — {past}, {part} \\({ru}\\)",
+}
 
-    return []
 
+class Mode:
+    name = None
+    titles = {}             # task -> заголовок вопроса
+    empty_text = None       # что сказать, если сессию не из чего собрать
+    edit_in_place = False   # первый вопрос — в сообщении меню, а не новым сообщением
 
-async def process_forms(uid, text, msg, mode=None):
-    ensure_user_settings(uid)
-    st = user_state.get(uid, {})
+    def new_session(self, uid, cid):
+        return new_session(uid, self.name)
 
-    if "verb" not in st:
-        await msg.answer("Session expired. Choose a mode 👇", reply_markup=main_menu(uid))
-        return
+    def empty_message(self, uid):
+        return self.empty_text
 
-    verb = st["verb"]
+    def next_verb(self, uid, st):
+        return get_next_verb(uid, st)
 
-    # Правильные формы
-    past_forms = normalize_forms(verb["past"])     # ["was", "were"]
-    part_forms = normalize_forms(verb["part"])     # ["been"]
+    def first_verb(self, uid, st):
+        return self.next_verb(uid, st)
 
-    # Для красивого вывода
-    correct_past = ", ".join(past_forms)
-    correct_part = ", ".join(part_forms)
+    def task(self, st):
+        # Что спрашиваем сейчас: "forms" или "translation"
+        return self.name
 
-    # Ввод пользователя
-    user_input = text.lower().strip()
+    def templates(self):
+        # (режим, задание) -> шаблон вопроса
+        return {
+            (self.name, task): forms_prompt(title) if task == "forms" else translation_prompt(title)
+            for task, title in self.titles.items()
+        }
 
-    # 1) Через запятую
-    if "," in user_input:
-        parts = [p.strip() for p in user_input.split(",")]
+    def prompt(self, st, verb):
+        return session_catalog(st).text((self.name, self.task(st)), verb)
 
-    else:
-        raw = user_input.split()
+    def keyboard(self, st):
+        return keyboards.next[self.name]
 
-        # === НОВОЕ: поддержка 3 форм ===
-        if len(raw) == 3:
-            # Пример: "was were been"
-            # past = ["was", "were"], part = "been"
-            parts = [" ".join(raw[:-1]), raw[-1]]
+    async def grade(self, uid, st, text, msg):
+        if self.task(st) == "forms":
+            await process_forms(uid, st, text, msg, self.keyboard(st))
+        else:
+            await process_translation(uid, st, text, msg, self.keyboard(st))
 
-        elif len(raw) == 2:
-            parts = raw
 
-        elif len(raw) > 3:
-            # multi-word V3: "was been able to" — маловероятно, но поддержим
-            parts = [raw[0], " ".join(raw[1:])]
+class FormsMode(Mode):
+    name = "forms"
+    titles = {"forms": "📘 *Verb Forms*"}
 
-        else:
-            parts = []
 
-    # Проверка
-    if len(parts) != 2:
-        ok = False
-    else:
-        user_past_raw = parts[0]
-        user_part = parts[1]
+class TranslationMode(Mode):
+    name = "translation"
+    titles = {"translation": "🌐 *Translation*"}
 
-        # past может содержать несколько слов → разбиваем
-        user_past_list = user_past_raw.split()
 
-        # Все past должны быть допустимыми
-        ok_past = all(p in past_forms for p in user_past_list)
-        ok_part = user_part in part_forms
+class MixMode(Mode):
+    name = "mix"
+    titles = {"forms": "🎲 *Mix — Forms*", "translation": "🎲 *Mix — Translation*"}
 
-        ok = ok_past and ok_part
+    def new_session(self, uid, cid):
+        return new_session(uid, self.name, sub=random.choice(TASKS))
 
-    # Ответ
-    if ok:
-        user_stats[uid]["correct"] += 1
-        reply = (
-            f"✅ Correct!\n\n"
-            f"{verb['inf']} — {correct_past}, {correct_part}"
-        )
-    else:
-        user_stats[uid]["wrong"] += 1
-        add_error(uid, {"verb": verb, "mode": "forms"})
-        reply = (
-            f"❌ Wrong!\n\n"
-            f"Correct: {verb['inf']} — {correct_past}, {correct_part}"
-        )
+    def task(self, st):
+        return st.sub
 
-    # Отправка
-    if st["mode"] == "mix":
-        await msg.answer(reply, reply_markup=forms_kb("mix"))
-    else:
-        await msg.answer(reply, reply_markup=forms_kb("forms"))
 
-    # Следующий глагол
-    st["verb"] = get_next_verb(uid)
+class RepeatMode(Mode):
+    name = "repeat"
+    titles = {"forms": "🔁 *Repeat — Forms*", "translation": "🔁 *Repeat — Translation*"}
+    empty_text = "🎉 No mistakes!"
+    edit_in_place = True
 
-# ============================
-#  SPEED MODE
-# ============================
+    def new_session(self, uid, cid):
+        if get_user(uid).errors.due() is None:
+            return None
 
-async def process_speed(uid, text, msg):
-    init_user(uid)
-    st = user_state.get(uid)
+        st = user_state[uid] = Session(self.name, catalog)
+        return st
 
-    if not st or st.get("mode") != "speed":
-        await msg.answer("Choose a mode 👇", reply_markup=main_menu(uid))
-        return
+    def empty_message(self, uid):
+        deck = get_user(uid).errors
+        if not deck:
+            return self.empty_text
+        wait = format_wait(deck.next_due() - time.time())
+        return f"🎉 All caught up! Next review in {wait}."
 
-    # TIME IS UP
-    if time.time() >= st["end"]:
-        wrong_list = st.get("wrong", [])
+    def next_verb(self, uid, st):
+        # Самая «просроченная» карточка; None — повторять пока нечего
+        cat = session_catalog(st)
+        deck = get_user(uid).errors
+        card = deck.due()
+        while card is not None and card.inf not in cat.by_inf:
+            # Глагол убрали из словаря при перезагрузке
+            deck.discard(card.inf, card.mode)
+            store.mark_dirty(uid)
+            card = deck.due()
+        if card is None:
+            return None
+        st.repeat_mode = card.mode
+        st.asked = time.monotonic()
+        return cat[cat.by_inf[card.inf]]
 
-        wrong_text = (
-            "\n".join(
-                f"• *{w['inf']}* — {w['past']}, {w['part']} ({w['ru']})"
-                for w in wrong_list
-            )
-            if wrong_list else "No mistakes — great job!"
-        )
-
-        result = (
-            f"⏰ *Time is up!*\n\n"
-            f"Correct: {st['correct']}\n"
-            f"Total: {st['total']}\n\n"
-            f"❗ Mistakes:\n{wrong_text}"
-        )
+    def task(self, st):
+        return st.repeat_mode
 
-        user_state[uid] = {}
-        await msg.answer(result, reply_markup=main_menu(uid))
-        return
 
-    # NORMAL PROCESSING
-    if "verb" not in st:
-        await msg.answer("Session expired. Choose a mode 👇", reply_markup=main_menu(uid))
-        return
+class SpeedMode(Mode):
+    name = "speed"
 
-    verb = st["verb"]
-    ans = norm(text)
+    def new_session(self, uid, cid):
+        st = new_session(uid, self.name, end=speed_timers.clock() + SPEED_SECONDS)
+        st.wrong = []
+        # Итоги придут сами, как только минута закончится
+        st.timer = speed_timers.call_later(SPEED_SECONDS, on_speed_timeout, uid, cid, st)
+        return st
 
-    past_forms = normalize_forms(verb["past"])
-    part_forms = normalize_forms(verb["part"])
+    def templates(self):
+        return {(self.name, self.name): "⚡ *Speed Mode — 60 sec*\n\nInfinitive: *{inf}*"}
 
-    ok = (
-        len(ans) >= 2 and
-        ans[0] in past_forms and
-        ans[1] in part_forms
-    )
+    def keyboard(self, st):
+        return keyboards.speed
 
-    st["total"] += 1
+    async def grade(self, uid, st, text, msg):
+        await process_speed(uid, st, text, msg)
 
-    if ok:
-        st["correct"] += 1
-        reply = f"✅ Correct!\n\n{verb['inf']} — {verb['past']}, {verb['part']}"
-    else:
-        st["wrong"].append({
-            "inf": verb["inf"],
-            "past": verb["past"],
-            "part": verb["part"],
-            "ru": verb["ru"],
-        })
-        reply = f"❌ Wrong!\n\nCorrect: {verb['inf']} — {verb['past']}, {verb['part']}"
 
-    await msg.answer(reply)
+MODES = {mode.name: mode for mode in (FormsMode(), TranslationMode(), MixMode(), RepeatMode(), SpeedMode())}
 
-    # NEW VERB (LEVEL-BASED)
-    st["verb"] = get_next_verb(uid)
+TEMPLATES = dict(FEEDBACK)
+for mode in MODES.values():
+    TEMPLATES.update(mode.templates())
 
 # ============================
-#  CALLBACK HANDLER
+#  CALLBACK ROUTES
 # ============================
+#
+# callback_data -> обработчик(q, uid, cid); выбор ветки — один поиск в dict
 
-@dp.callback_query()
-async def cb(q: types.CallbackQuery):
-    await q.answer()   # подтверждаем callback сразу
+CALLBACKS = {}
+
+def on_callback(*names):
+    def register(handler):
+        for name in names:
+            CALLBACKS[name] = handler
+        return handler
+    return register
+
+
+@on_callback("back")
+async def on_back(q, uid, cid):
+    st = user_state.pop(uid)
+    if st and st.timer is not None:
+        st.timer.cancel()
+    try:
+        await q.message.edit_text("Choose a mode 👇", reply_markup=main_menu(uid))
+    except TelegramBadRequest:
+        # Сообщение слишком старое или уже такое же — пришлём новое
+        await bot.send_message(uid, "Choose a mode 👇", reply_markup=main_menu(uid))
 
-    uid = q.from_user.id
-    cid = q.message.chat.id
-    data = q.data
-    init_user(uid)
-
-    # ============================
-    # BACK
-    # ============================
-    if data == "back":
-        user_state[uid] = {}
-        try:
-            await q.message.edit_text("Choose a mode 👇", reply_markup=main_menu(uid))
-        except:
-            await bot.send_message(uid, "Choose a mode 👇", reply_markup=main_menu(uid))
-        return
 
-    # ============================
-    # MAIN MENU ACTIONS
-    # ============================
-    if data == "menu_help":
-        await q.message.edit_text(EXPLANATION, reply_markup=main_menu(uid))
+@on_callback("menu_help")
+async def on_help(q, uid, cid):
+    await q.message.edit_text(EXPLANATION, reply_markup=main_menu(uid))
+
+
+@on_callback(*(f"menu_{name}" for name in MODES))
+async def on_start_mode(q, uid, cid):
+    mode = MODES[q.data[len("menu_"):]]
+    st = mode.new_session(uid, cid)
+    if st is None:
+        await q.message.edit_text(mode.empty_message(uid), reply_markup=main_menu(uid))
         return
 
-    if data == "menu_forms":
-        await start_forms(uid, cid)
+    verb = st.verb = mode.first_verb(uid, st)
+    if verb is None:
+        # Все карточки повтора отброшены (глаголы пропали из словаря)
+        user_state.pop(uid)
+        await q.message.edit_text(mode.empty_message(uid), reply_markup=main_menu(uid))
         return
+    # Аргументы события собираются до вызова — без DEBUG не собираем их вовсе
+    if log.isEnabledFor(logging.DEBUG):
+        log_event(log, "question", uid=uid, mode=mode.name, task=mode.task(st), verb=verb["inf"], level=verb["level"])
+
+    text = mode.prompt(st, verb)
+    if mode.edit_in_place:
+        await q.message.edit_text(text, parse_mode=ParseMode.MARKDOWN_V2, reply_markup=mode.keyboard(st))
+    else:
+        await bot.send_message(cid, text, parse_mode=ParseMode.MARKDOWN_V2, reply_markup=mode.keyboard(st))
+
 
-    if data == "menu_translation":
-        await start_translation(uid, cid)
+@on_callback(*(f"{name}_next" for name in MODES))
+async def on_next(q, uid, cid):
+    if edit_coalescer.superseded(q):
+        # Пользователь уже нажал «Next» ещё раз — сообщение перерисует тот апдейт
         return
 
-    if data == "menu_mix":
-        await start_mix(uid, cid)
+    st = user_state.get(uid)
+    if not st:
+        # Сессию выселили (или её не было) — восстанавливаем по кнопке
+        st = MODES[q.data[:-len("_next")]].new_session(uid, cid)
+
+    if st is None:
+        await q.message.edit_text(MODES[q.data[:-len("_next")]].empty_message(uid), reply_markup=main_menu(uid))
         return
 
-    if data == "menu_speed":
-        await start_speed(uid, cid)
+    mode = MODES[st.mode]
+
+    # следующий глагол
+    verb = st.verb = mode.next_verb(uid, st)
+    if verb is None:
+        # Повторять больше нечего
+        user_state.pop(uid)
+        await q.message.edit_text(mode.empty_message(uid), reply_markup=main_menu(uid))
         return
+    await q.message.edit_text(mode.prompt(st, verb), parse_mode=ParseMode.MARKDOWN_V2, reply_markup=mode.keyboard(st))
 
-    if data == "menu_repeat":
-        if not user_errors[uid]:
-            await q.message.edit_text("🎉 No mistakes!", reply_markup=main_menu(uid))
-            return
 
-        err = user_errors[uid][0]
-        verb = err["verb"]
-        mode = err["mode"]
+def stats_text(uid):
+    s = get_user(uid).stats
+    rank = leaderboard.rank(uid)
+    return (
+        f"📊 Stats:\n"
+        f"Correct: {s.correct}\n"
+        f"Wrong: {s.wrong}\n"
+        f"Accuracy: {accuracy(s):.0%}\n"
+        f"Current streak: {s.streak}\n"
+        f"Best streak: {s.best}\n"
+        f"Today: {answers_on(s, time.time())} answers\n"
+        f"Rank: {f'#{rank} of {len(leaderboard)}' if rank else '—'} (/top)"
+    )
 
-        user_state[uid] = {"mode": "repeat", "verb": verb, "repeat_mode": mode}
 
-        if mode == "translation":
-            await q.message.edit_text(
-                f"🔁 Repeat — Translation\n\n*{verb['inf']}*",
-                reply_markup=translation_kb("repeat")
-            )
-        else:
-            await q.message.edit_text(
-                f"🔁 Repeat — Forms\n\n{verb['inf']} — {verb['ru']}",
-                reply_markup=forms_kb("repeat")
-            )
-        return
+@on_callback("menu_stats")
+async def on_stats(q, uid, cid):
+    await q.message.edit_text(stats_text(uid), reply_markup=main_menu(uid))
 
-    if data == "menu_stats":
-        s = user_stats[uid]
-        await q.message.edit_text(
-            f"📊 Stats:\n"
-            f"Correct: {s['correct']}\n"
-            f"Wrong: {s['wrong']}\n"
-            f"Best streak: {s['best']}",
-            reply_markup=main_menu(uid)
-        )
-        return
 
-    # ============================
-    #  SETTINGS
-    # ============================
-    if data == "menu_settings":
-        ensure_user_settings(uid)
-
-        lvl = user_settings[uid]["level"]
-        daily = user_settings[uid]["daily_enabled"]
-
-        kb = InlineKeyboardMarkup(inline_keyboard=[
-            [InlineKeyboardButton(text="🎚 Difficulty", callback_data="menu_difficulty")],
-            [InlineKeyboardButton(text="🔔 Daily reminder", callback_data="toggle_daily")],
-            [InlineKeyboardButton(text="⬅️ Back", callback_data="back")]
-        ])
-
-        await q.message.edit_text(
-            f"⚙️ Settings\n\n"
-            f"Difficulty level: {lvl}\n"
-            f"Daily: {'ON' if daily else 'OFF'}",
-            reply_markup=kb
-        )
-        return
+# ============================
+#  SETTINGS
+# ============================
 
-    if data == "toggle_daily":
-        ensure_user_settings(uid)
+@on_callback("menu_settings")
+async def on_settings(q, uid, cid):
+    user = get_user(uid)
+    lvl = user.level
+    daily = user.daily
+    tz = user.tz or REMINDER_TZ
+
+    await q.message.edit_text(
+        f"⚙️ Settings\n\n"
+        f"Difficulty level: {lvl}\n"
+        f"Daily: {'ON' if daily else 'OFF'} ({REMINDER_TIME}, {tz})\n\n"
+        f"Change time zone: /timezone Europe/Moscow",
+        # Пояса вида America/New_York — `_` сломал бы Markdown
+        parse_mode=None,
+        reply_markup=keyboards.settings
+    )
 
-        user_settings[uid]["daily_enabled"] = not user_settings[uid]["daily_enabled"]
 
-        await q.message.edit_text("Choose a mode 👇", reply_markup=main_menu(uid))
-        return
+@on_callback("toggle_daily")
+async def on_toggle_daily(q, uid, cid):
+    user = get_user(uid)
+    user.daily = not user.daily
+    store.mark_dirty(uid)
+    sync_reminder(uid)
 
-    if data == "menu_difficulty":
-        ensure_user_settings(uid)
+    await q.message.edit_text("Choose a mode 👇", reply_markup=main_menu(uid))
 
-        lvl = user_settings[uid]["level"]
 
-        kb = InlineKeyboardMarkup(inline_keyboard=[
-            [InlineKeyboardButton(text=("✅ Level 1" if lvl == 1 else "Level 1"), callback_data="set_level_1")],
-            [InlineKeyboardButton(text=("✅ Level 2" if lvl == 2 else "Level 2"), callback_data="set_level_2")],
-            [InlineKeyboardButton(text=("✅ Level 3" if lvl == 3 else "Level 3"), callback_data="set_level_3")],
-            [InlineKeyboardButton(text="⬅️ Back", callback_data="menu_settings")]
-        ])
+@on_callback("menu_difficulty")
+async def on_difficulty(q, uid, cid):
+    lvl = get_user(uid).level
 
-        await q.message.edit_text(
-            f"🎚 Difficulty\n\n"
-            f"Current level: {lvl}",
-            reply_markup=kb
-        )
-        return
+    await q.message.edit_text(
+        f"🎚 Difficulty\n\n"
+        f"Current level: {lvl}",
+        reply_markup=keyboards.level(lvl)
+    )
 
-    if data == "set_level_1":
-        ensure_user_settings(uid)
-        user_settings[uid]["level"] = 1
 
-        await q.message.edit_text("Level set to 1️⃣", reply_markup=main_menu(uid))
-        return
+LEVEL_EMOJI = {1: "1️⃣", 2: "2️⃣", 3: "3️⃣"}
 
-    if data == "set_level_2":
-        ensure_user_settings(uid)
-        user_settings[uid]["level"] = 2
+@on_callback(*(f"set_level_{lvl}" for lvl in LEVEL_EMOJI))
+async def on_set_level(q, uid, cid):
+    lvl = int(q.data.rpartition("_")[2])
+    get_user(uid).level = lvl
+    store.mark_dirty(uid)
 
-        await q.message.edit_text("Level set to 2️⃣", reply_markup=main_menu(uid))
-        return
+    await q.message.edit_text(f"Level set to {LEVEL_EMOJI[lvl]}", reply_markup=main_menu(uid))
 
-    if data == "set_level_3":
-        ensure_user_settings(uid)
-        user_settings[uid]["level"] = 3
 
-        await q.message.edit_text("Level set to 3️⃣", reply_markup=main_menu(uid))
-        return
+# ============================
+# SPEED STOP
+# ============================
+
+@on_callback("speed_stop")
+async def on_speed_stop(q, uid, cid):
+    st = user_state.get(uid)
+    if st and st.timer is not None:
+        st.timer.cancel()
+    await q.message.edit_text(
+        f"⏹ Stopped.\nCorrect: {st.correct if st else 0}\nTotal: {st.total if st else 0}",
+        reply_markup=main_menu(uid)
+    )
+    user_state.pop(uid)
+
+# ============================
+#  CALLBACK HANDLER
+# ============================
+
+@dp.callback_query()
+async def cb(q: types.CallbackQuery, callback_answered=False):
+    if not callback_answered:
+        await q.answer()   # подтверждаем callback сразу
+
+    uid = q.from_user.id
+    get_user(uid)
+
+    handler = CALLBACKS.get(q.data)
+    if handler is not None:
+        await handler(q, uid, q.message.chat.id)
 
-    # ============================
-    # NEXT BUTTONS
-    # ============================
-    if data.endswith("_next"):
-        st = user_state[uid]
-
-        # следующий глагол
-        st["verb"] = get_next_verb(uid)
-        verb = st["verb"]
-        mode = st["mode"]
-
-        # FORMS
-        if mode == "forms":
-            await q.message.edit_text(
-                f"📘 *Verb Forms*\n\n"
-                f"Infinitive: *{verb['inf']}*\n"
-                f"Translation: *{verb['ru']}*\n\n"
-                f"Write the 2nd and 3rd forms.\n"
-                f"Example: go → went, gone",
-                reply_markup=forms_kb("forms")
-            )
-            return
-
-        # TRANSLATION
-        if mode == "translation":
-            await q.message.edit_text(
-                f"🌐 *Translation*\n\nTranslate:\n*{verb['inf']}*",
-                reply_markup=translation_kb("translation")
-            )
-            return
-
-        # MIX
-        if mode == "mix":
-            sub = st.get("sub")
-            if sub == "forms":
-                await q.message.edit_text(
-                    f"🎲 *Mix — Forms*\n\n"
-                    f"Infinitive: *{verb['inf']}*\n"
-                    f"Translation: *{verb['ru']}*\n\n"
-                    f"Write the 2nd and 3rd forms.",
-                    reply_markup=forms_kb("mix")
-                )
-            else:
-                await q.message.edit_text(
-                    f"🎲 *Mix — Translation*\n\nTranslate:\n*{verb['inf']}*",
-                    reply_markup=translation_kb("mix")
-                )
-            return
-
-        # REPEAT
-        if mode == "repeat":
-            repeat_mode = st.get("repeat_mode")
-            if repeat_mode == "forms":
-                await q.message.edit_text(
-                    f"🔁 Repeat — Forms\n\n{verb['inf']} — {verb['ru']}",
-                    reply_markup=forms_kb("repeat")
-                )
-            else:
-                await q.message.edit_text(
-                    f"🔁 Repeat — Translation\n\n*{verb['inf']}*",
-                    reply_markup=translation_kb("repeat")
-                )
-            return
-
-    # ============================
-    # SPEED STOP
-    # ============================
-    if data == "speed_stop":
-        st = user_state.get(uid, {})
-        await q.message.edit_text(
-            f"⏹ Stopped.\nCorrect: {st.get('correct', 0)}\nTotal: {st.get('total', 0)}",
-            reply_markup=main_menu(uid)
-        )
-        user_state[uid] = {}
-        return
-    
 # ============================
 #  COMMANDS
 # ============================
@@ -733,7 +903,7 @@ async def cb(q: types.CallbackQuery):
 @dp.message(Command("start"))
 async def cmd_start(msg: types.Message):
     uid = msg.from_user.id
-    init_user(uid)
+    get_user(uid)
     await msg.answer(
         "👋 Welcome!\n\n"
         "I will help you practise irregular verbs.\n\n"
@@ -758,15 +928,68 @@ async def cmd_help(msg: types.Message):
 @dp.message(Command("stats"))
 async def cmd_stats(msg: types.Message):
     uid = msg.from_user.id
-    init_user(uid)
-    s = user_stats[uid]
-    await msg.answer(
-        f"📊 Stats:\n"
-        f"Correct: {s['correct']}\n"
-        f"Wrong: {s['wrong']}\n"
-        f"Best streak: {s['best']}",
-        reply_markup=main_menu(uid)
-    )
+    get_user(uid)
+    await msg.answer(stats_text(uid), reply_markup=main_menu(uid))
+
+
+TOP_SIZE = 10
+
+@dp.message(Command("top"))
+async def cmd_top(msg: types.Message):
+    uid = msg.from_user.id
+    get_user(uid)
+
+    lines = ["🏆 Top players:"]
+    rank, last = 0, None
+    for i, (other, score) in enumerate(leaderboard.top(TOP_SIZE), 1):
+        if score != last:
+            rank, last = i, score
+        name = leaderboard.names.get(other) or "Anonymous"
+        you = " ← you" if other == uid else ""
+        lines.append(f"{rank}. {name} — {score}{you}")
+    if len(lines) == 1:
+        lines.append("Nobody yet — be the first!")
+
+    own = leaderboard.rank(uid)
+    if own is not None and own > TOP_SIZE:
+        lines.append(f"\nYou: #{own} of {len(leaderboard)}")
+
+    # Имена пользователей — не Markdown
+    await msg.answer("\n".join(lines), parse_mode=None, reply_markup=main_menu(uid))
+
+
+@dp.message(Command("timezone"))
+async def cmd_timezone(msg: types.Message):
+    uid = msg.from_user.id
+    get_user(uid)
+
+    parts = msg.text.split(maxsplit=1)
+    name = parts[1].strip() if len(parts) > 1 else ""
+
+    if not name or get_zone(name) is None:
+        await msg.answer(
+            "Send your time zone, for example:\n/timezone Europe/Moscow",
+            parse_mode=None
+        )
+        return
+
+    get_user(uid).tz = name
+    store.mark_dirty(uid)
+    sync_reminder(uid)
+
+    await msg.answer(f"🕘 Time zone set: {name}", parse_mode=None, reply_markup=main_menu(uid))
+
+
+@dp.message(Command("reload"), F.from_user.id.in_(ADMIN_IDS))
+async def cmd_reload(msg: types.Message):
+    try:
+        new = reload_catalog()
+    except (OSError, DatasetError) as e:
+        # Старый каталог остаётся в работе
+        await msg.answer(f"❗ Reload failed: {e}", parse_mode=None)
+        return
+
+    await msg.answer(f"📚 Reloaded {len(new)} verbs, levels {new.levels}", parse_mode=None)
 
 
 # ============================
@@ -776,95 +999,193 @@ async def cmd_stats(msg: types.Message):
 @dp.message(F.text)
 async def text_handler(msg: types.Message):
     uid = msg.from_user.id
-    init_user(uid)
+    get_user(uid)
     st = user_state.get(uid)
 
-    if not st or "mode" not in st:
+    if not st:
         await msg.answer("Choose a mode 👇", reply_markup=main_menu(uid))
         return
 
-    mode = st["mode"]
-    text = msg.text.strip()
-
-    # FORMS
-    if mode == "forms":
-        await process_forms(uid, text, msg)
-        return
-
-    # TRANSLATION
-    if mode == "translation":
-        await process_translation(uid, text, msg)
-        return
+    mode = MODES.get(st.mode)
+    if mode is not None:
+        await mode.grade(uid, st, msg.text.strip(), msg)
 
-    # MIX
-    if mode == "mix":
-        sub = st.get("sub")
-        if sub == "forms":
-            await process_forms(uid, text, msg)
-        else:
-            await process_translation(uid, text, msg)
-        return
+# ============================
+#  STARTUP / SHUTDOWN
+# ============================
 
-    # REPEAT
-    if mode == "repeat":
-        repeat_mode = st.get("repeat_mode")
-        if repeat_mode == "forms":
-            await process_forms(uid, text, msg)
-        else:
-            await process_translation(uid, text, msg)
-        return
+async def start_services():
+    with startup_phase("verbs"):
+        reload_catalog()
+    with startup_phase("keyboards"):
+        build_keyboards()
+    with startup_phase("store"):
+        await store.start()
+        leaderboard.load(store.scores())
+    if answer_log is not None:
+        answer_log.start()
+
+    reminder_lease.start()
+    speed_timers.start()
+    if VERBS_WATCH > 0:
+        verbs_watcher.start()
+
+    services_ready.set()
+
+async def stop_services():
+    log.info("📦 Sessions: %s", user_state.stats())
+    log.info("📦 Users: %s", users.stats())
+    await verbs_watcher.stop()
+    await speed_timers.stop()
+    await reminder_lease.stop()
+    await store.close()
+    if answer_log is not None:
+        await answer_log.close()
+    await bot.session.close()
 
-    # SPEED
-    if mode == "speed":
-        await process_speed(uid, text, msg)
-        return
 # ============================
 #  WEBHOOK SERVER
 # ============================
 
-async def on_startup(app):
-    # Устанавливаем вебхук
+async def set_webhook():
     if not WEBHOOK_URL:
-        print("❗ WEBHOOK_URL is missing — webhook not set")
+        log.warning("❗ WEBHOOK_URL is missing — webhook not set")
         return
 
-    await bot.set_webhook(WEBHOOK_URL)
-    print(f"🌐 Webhook set: {WEBHOOK_URL}")
-
-    # Запускаем ежедневное напоминание
-    asyncio.create_task(daily_task())
+    await bot.set_webhook(WEBHOOK_URL, secret_token=WEBHOOK_SECRET)
+    log.info("🌐 Webhook set: %s", WEBHOOK_URL)
 
 async def on_shutdown(app):
-    await bot.session.close()
-
-import asyncio
-from datetime import datetime
-
-async def daily_task():
-    while True:
-        now = datetime.now().strftime("%H:%M")
-        if now == "09:00":   # время напоминания
-            for uid, settings in user_settings.items():
-                if settings.get("daily_enabled"):
-                    try:
-                        await bot.send_message(uid, "⏰ Time to practise your verbs!")
-                    except:
-                        pass
-        await asyncio.sleep(60)
-
-# Создаём aiohttp приложение
-app = web.Application()
-
-# Регистрируем обработчик вебхука (ОБЯЗАТЕЛЬНО!)
-SimpleRequestHandler(dp, bot).register(app, path=WEBHOOK_PATH)
+    await stop_services()
+
+async def metrics_handler(request):
+    return web.Response(text=REGISTRY.render(), content_type="text/plain", charset="utf-8",
+                        headers={"X-Prometheus-Format": "0.0.4"})
+
+@web.middleware
+async def http_timing(request, handler):
+    path = request.path if request.path in (WEBHOOK_PATH, METRICS_PATH) else "other"
+    with HTTP_SECONDS.time(path):
+        return await handler(request)
+
+def create_app():
+    # Нужен только вебхуку — в режиме polling не импортируем
+    from aiogram.webhook.aiohttp_server import setup_application
+    from webhook import WebhookIngress
+
+    app = web.Application(middlewares=[http_timing])
+    app.router.add_get(METRICS_PATH, metrics_handler)
+
+    # Регистрируем обработчик вебхука (ОБЯЗАТЕЛЬНО!)
+    ingress = WebhookIngress(
+        dp, bot,
+        workers=WEBHOOK_WORKERS,
+        maxsize=WEBHOOK_QUEUE,
+        secret=WEBHOOK_SECRET,
+        shed=WEBHOOK_SHED,
+        answer_callbacks=WEBHOOK_ANSWER_CALLBACKS,
+        tracker=edit_coalescer,
+        rejected=WEBHOOK_REJECTED,
+        shed_counter=WEBHOOK_SHED_TOTAL,
+        drain_timeout=SHUTDOWN_DRAIN_SECONDS,
+    )
+    ingress.register(app, path=WEBHOOK_PATH)
+    Gauge("bot_webhook_queue_depth", "Updates accepted by the webhook and waiting for a worker", func=ingress.depth)
+
+    async def start_ingress(app):
+        ingress.start()
+
+    async def stop_ingress(app):
+        await ingress.stop()
+
+    # Подключаем aiogram к aiohttp
+    setup_application(app, dp, bot=bot)
+
+    # Сервисы запускает webhook_main() уже после открытия порта;
+    # при остановке сначала дорабатываем очередь, потом гасим сервисы
+    app.on_startup.append(start_ingress)
+    app.on_shutdown.append(stop_ingress)
+    app.on_shutdown.append(on_shutdown)
+    return app
+
+async def wait_for_signal():
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    await stop.wait()
+
+async def webhook_main(port=None, path=None):
+    # Сначала открываем порт (healthcheck Railway проходит сразу),
+    # потом грузим глаголы, хранилище и ставим вебхук
+    with startup_phase("bind"):
+        runner = web.AppRunner(create_app())
+        await runner.setup()
+        if path:
+            # Процесс кластера: апдейты приходят от диспетчера через unix-сокет
+            await web.UnixSite(runner, path).start()
+        else:
+            await web.TCPSite(runner, "0.0.0.0", port).start()
+    log.info("🌐 Listening on %s", path or f"port {port}")
+
+    try:
+        await start_services()
+        if WORKER_ID == 0:
+            # Вебхук один на весь кластер
+            with startup_phase("webhook"):
+                await set_webhook()
+        log_startup()
+        await wait_for_signal()
+    finally:
+        await runner.cleanup()
 
-# Подключаем aiogram к aiohttp
-setup_application(app, dp, bot=bot)
+# ============================
+#  LONG POLLING
+# ============================
 
-# Регистрируем события
-app.on_startup.append(on_startup)
-app.on_shutdown.append(on_shutdown)
+async def polling_main(workers):
+    pool = UserOrderedWorkers(lambda update: dp.feed_update(bot, update), workers=workers, maxsize=100)
+    Gauge("bot_polling_queue_depth", "Updates queued for polling workers", func=pool.depth)
+
+    # /metrics доступен и без вебхука
+    with startup_phase("bind"):
+        metrics_app = web.Application()
+        metrics_app.router.add_get(METRICS_PATH, metrics_handler)
+        runner = web.AppRunner(metrics_app)
+        await runner.setup()
+        await web.TCPSite(runner, "0.0.0.0", int(os.getenv("PORT", 8080))).start()
+
+    await start_services()
+    log_startup()
+    # Railway останавливает контейнер SIGTERM: без обработчика процесс
+    # умирает сразу, и finally со сбросом стора не выполняется
+    polling = asyncio.create_task(run_polling(bot, dp, pool, drain_timeout=SHUTDOWN_DRAIN_SECONDS))
+    signalled = asyncio.create_task(wait_for_signal())
+    try:
+        await asyncio.wait((polling, signalled), return_when=asyncio.FIRST_COMPLETED)
+        if polling.done():
+            polling.result()
+    finally:
+        signalled.cancel()
+        polling.cancel()
+        await asyncio.gather(polling, signalled, return_exceptions=True)
+        await stop_services()
+        await runner.cleanup()
+
+STARTUP_PHASES["module"] = time.perf_counter() - IMPORTS_STARTED - STARTUP_PHASES["imports"]
 
 # Запуск сервера
 if __name__ == "__main__":
-    web.run_app(app, host="0.0.0.0", port=int(os.getenv("PORT", 8080)))
\ No newline at end of file
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mode", choices=["webhook", "polling", "worker"], default=RUN_MODE)
+    parser.add_argument("--workers", type=int, default=POLLING_WORKERS)
+    args = parser.parse_args()
+
+    if args.mode == "polling":
+        asyncio.run(polling_main(args.workers))
+    elif args.mode == "worker":
+        asyncio.run(webhook_main(path=WORKER_SOCKET))
+    else:
+        asyncio.run(webhook_main(int(os.getenv("PORT", 8080))))
\ No newline at end of file
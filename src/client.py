@@ -0,0 +1,33 @@
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.types import InlineKeyboardMarkup
+
+from keyboards import MARKUP_JSON
+
+# ============================
+#  BOT API SESSION
+# ============================
+
+class CachedMarkupSession(AiohttpSession):
+    """Подставляет заранее сериализованный JSON закэшированных клавиатур.
+
+    Пул соединений к Bot API настроен под один хост: все `pool_size`
+    соединений могут идти к api.telegram.org, простаивающее соединение
+    держится `keepalive` секунд, а DNS кэшируется на 5 минут — TLS
+    рукопожатие не повторяется на каждый запрос после паузы.
+    """
+
+    def __init__(self, pool_size=100, keepalive=60.0, **kwargs):
+        super().__init__(**kwargs)
+        self._connector_init.update(
+            limit=pool_size,
+            limit_per_host=pool_size,
+            keepalive_timeout=keepalive,
+            ttl_dns_cache=300,
+        )
+
+    def prepare_value(self, value, bot, files, _dumps_json=True):
+        if _dumps_json and type(value) is InlineKeyboardMarkup:
+            cached = MARKUP_JSON.get(id(value))
+            if cached is not None:
+                return cached
+        return super().prepare_value(value, bot=bot, files=files, _dumps_json=_dumps_json)
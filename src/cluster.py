@@ -0,0 +1,210 @@
+import asyncio
+import json
+import logging
+import os
+import signal
+import sys
+import tempfile
+
+from aiohttp import ClientError, ClientSession, UnixConnector, web
+
+from logs import setup_logging
+from metrics import REGISTRY, Counter, Histogram
+from updates import raw_user_id
+
+# ============================
+#  MULTI-PROCESS WEBHOOK
+# ============================
+#
+# Диспетчер принимает вебхук на PORT и передаёт апдейт одному из N
+# процессов бота (bot_railway.py в режиме worker) через unix-сокет.
+# Процесс выбирается по uid % N: все апдейты пользователя попадают
+# в один и тот же процесс, поэтому его сессия и кэш настроек живут
+# только там. Общие данные — в SQLite (DB_PATH), аренда напоминаний —
+# там же. Упавший процесс перезапускается.
+#
+#     python3 src/cluster.py --workers 4
+#
+# aiogram здесь не импортируется: диспетчер только разбирает JSON.
+
+log = logging.getLogger("cluster")
+
+WEBHOOK_PATH = "/webhook"
+METRICS_PATH = "/metrics"
+BOT_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bot_railway.py")
+
+# Сколько ждать процесс, который перезапускается, прежде чем отдать 503
+FORWARD_WAIT = 10.0
+
+FORWARD_SECONDS = Histogram("bot_cluster_forward_seconds", "Webhook forwarding time", ["worker"])
+FORWARD_ERRORS = Counter("bot_cluster_forward_errors_total", "Updates not delivered to a worker", ["worker"])
+RESTARTS = Counter("bot_cluster_restarts_total", "Worker process restarts", ["worker"])
+
+def merge_metrics(texts):
+    """Склеивает /metrics нескольких процессов, добавляя метку worker.
+
+    Сэмплы одной метрики из разных процессов должны идти подряд
+    под одним HELP/TYPE, поэтому группируем по имени метрики.
+    """
+    families = {}               # name -> [заголовки, сэмплы]
+    for worker, text in enumerate(texts):
+        current = None
+        for line in text.splitlines():
+            if line.startswith("# "):
+                current = line.split()[2]
+                head, _ = families.setdefault(current, ([], []))
+                if line not in head:
+                    head.append(line)
+                continue
+            if not line or current is None:
+                continue
+            brace, space = line.find("{"), line.find(" ")
+            if brace != -1 and brace < space:
+                line = f'{line[:brace + 1]}worker="{worker}",{line[brace + 1:]}'
+            else:
+                line = f'{line[:space]}{{worker="{worker}"}}{line[space:]}'
+            families[current][1].append(line)
+
+    lines = []
+    for head, samples in families.values():
+        lines.extend(head)
+        lines.extend(samples)
+    return "\n".join(lines) + "\n"
+
+
+class Cluster:
+    def __init__(self, size, socket_dir=None):
+        self.size = size
+        self.socket_dir = socket_dir or tempfile.mkdtemp(prefix="bot-cluster-")
+        self.sockets = [os.path.join(self.socket_dir, f"worker-{i}.sock") for i in range(size)]
+        self._workers = [None] * size
+        self.sessions = []
+        self._stopping = False
+
+    def spawn(self, i):
+        if os.path.exists(self.sockets[i]):
+            os.unlink(self.sockets[i])
+        env = dict(
+            os.environ,
+            RUN_MODE="worker",
+            WORKER_ID=str(i),
+            CLUSTER_SIZE=str(self.size),
+            WORKER_SOCKET=self.sockets[i],
+        )
+        self._workers[i] = asyncio.create_task(self._run_worker(i, env))
+
+    async def _run_worker(self, i, env):
+        # Процесс живёт, пока его не остановили; упал — запускаем заново
+        while not self._stopping:
+            proc = await asyncio.create_subprocess_exec(sys.executable, BOT_SCRIPT, env=env)
+            log.info("⚙️ Worker %d started (pid %d)", i, proc.pid)
+            try:
+                code = await proc.wait()
+            except asyncio.CancelledError:
+                if proc.returncode is None:
+                    proc.terminate()
+                    try:
+                        await asyncio.wait_for(proc.wait(), 15)
+                    except asyncio.TimeoutError:
+                        proc.kill()
+                raise
+            if self._stopping:
+                return
+            log.warning("❗ Worker %d exited with %s, restarting", i, code)
+            RESTARTS.inc(str(i))
+            await asyncio.sleep(1.0)
+
+    async def start(self):
+        for i in range(self.size):
+            self.spawn(i)
+        self.sessions = [ClientSession(connector=UnixConnector(path)) for path in self.sockets]
+
+    async def stop(self):
+        self._stopping = True
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        for session in self.sessions:
+            await session.close()
+
+    async def forward(self, request):
+        body = await request.read()
+        try:
+            update = json.loads(body)
+        except ValueError:
+            return web.Response(status=400)
+        if not isinstance(update, dict):
+            return web.Response(status=400)
+        uid = raw_user_id(update)
+
+        worker = uid % self.size
+        headers = {"Content-Type": "application/json"}
+        secret = request.headers.get("X-Telegram-Bot-Api-Secret-Token")
+        if secret is not None:
+            headers["X-Telegram-Bot-Api-Secret-Token"] = secret
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + FORWARD_WAIT
+        with FORWARD_SECONDS.time(str(worker)):
+            while True:
+                try:
+                    async with self.sessions[worker].post(f"http://worker{WEBHOOK_PATH}", data=body, headers=headers) as resp:
+                        # Content-Type целиком: в ответе может быть вызов метода (multipart с boundary)
+                        return web.Response(body=await resp.read(), status=resp.status,
+                                            headers={"Content-Type": resp.headers.get("Content-Type", "application/json")})
+                except ClientError:
+                    # Процесс ещё стартует или перезапускается
+                    if loop.time() >= deadline:
+                        FORWARD_ERRORS.inc(str(worker))
+                        # Telegram повторит доставку позже
+                        return web.Response(status=503)
+                    await asyncio.sleep(0.2)
+
+    async def metrics(self, request):
+        async def fetch(session):
+            try:
+                async with session.get(f"http://worker{METRICS_PATH}") as resp:
+                    return await resp.text()
+            except ClientError:
+                return ""
+
+        texts = await asyncio.gather(*(fetch(session) for session in self.sessions))
+        text = REGISTRY.render() + merge_metrics(texts)
+        return web.Response(text=text, content_type="text/plain", charset="utf-8",
+                            headers={"X-Prometheus-Format": "0.0.4"})
+
+
+async def main(size, port):
+    cluster = Cluster(size)
+    await cluster.start()
+
+    app = web.Application()
+    app.router.add_post(WEBHOOK_PATH, cluster.forward)
+    app.router.add_get(METRICS_PATH, cluster.metrics)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "0.0.0.0", port).start()
+    log.info("🌐 Cluster of %d workers listening on port %d", size, port)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    try:
+        await stop.wait()
+    finally:
+        await runner.cleanup()
+        await cluster.stop()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    setup_logging()
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_WORKERS", os.cpu_count() or 1)))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", 8080)))
+    args = parser.parse_args()
+
+    asyncio.run(main(args.workers, args.port))
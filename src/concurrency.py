@@ -0,0 +1,103 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
+log = logging.getLogger(__name__)
+
+# ============================
+#  PER-KEY LOCKS
+# ============================
+
+class KeyedLock:
+    """Отдельный asyncio.Lock на каждый ключ (uid).
+
+    Лок создаётся при первом обращении и удаляется, когда его никто
+    не держит и не ждёт, так что словарь не растёт с числом пользователей.
+    """
+
+    def __init__(self):
+        self._locks = {}   # key -> [lock, users]
+
+    def __len__(self):
+        return len(self._locks)
+
+    def waiting(self, key):
+        entry = self._locks.get(key)
+        return entry[1] - 1 if entry else 0
+
+    @asynccontextmanager
+    async def __call__(self, key):
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[key]
+
+
+# ============================
+#  LEADER LEASE
+# ============================
+
+class Lease:
+    """Роль лидера среди процессов через аренду в общем хранилище.
+
+    Раз в ttl/3 аренда продлевается. Получили — зовём on_acquire,
+    потеряли (или остановились) — on_release. Если лидер умер, не
+    отпустив аренду, её заберёт другой процесс через ttl секунд.
+    """
+
+    def __init__(self, store, name, owner, on_acquire, on_release, ttl=30.0):
+        self.store = store
+        self.name = name
+        self.owner = owner
+        self.on_acquire = on_acquire
+        self.on_release = on_release
+        self.ttl = ttl
+        self.held = False
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        if self.held:
+            self.held = False
+            await self.on_release()
+            await self.store.release_lease(self.name, self.owner)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        renewed = loop.time()
+        while True:
+            try:
+                ok = await self.store.try_lease(self.name, self.owner, self.ttl)
+                renewed = loop.time()
+            except Exception as e:
+                # Хранилище недоступно: пока аренда не истекла, она всё ещё наша
+                log.warning("❗ Lease %s check failed: %r", self.name, e)
+                ok = self.held and loop.time() - renewed < self.ttl
+
+            if ok and not self.held:
+                self.held = True
+                log.info("👑 Lease acquired: %s", self.name)
+                await self.on_acquire()
+            elif not ok and self.held:
+                self.held = False
+                log.warning("❗ Lease lost: %s", self.name)
+                await self.on_release()
+
+            await asyncio.sleep(self.ttl / 3)
@@ -0,0 +1,156 @@
+import asyncio
+import hashlib
+import json
+import logging
+import marshal
+import os
+
+# ============================
+#  VERB DATASET
+# ============================
+#
+# verbs.json проверяется при загрузке (обязательные поля, типы,
+# дубликаты), а проверенный список сохраняется рядом в marshal-кэш
+# с хэшем содержимого. При следующем старте, если хэш совпал,
+# парсинг и проверка пропускаются. Файл кэша пишется атомарно.
+
+log = logging.getLogger(__name__)
+
+TEXT_FIELDS = ("inf", "ru")
+FORM_FIELDS = ("past", "part")      # строка или список вариантов: ["was", "were"]
+CACHE_VERSION = 1
+MAX_VERBS = 65535                   # индексы пулов каталога — array('H')
+
+
+class DatasetError(ValueError):
+    pass
+
+
+def _is_text(value):
+    return isinstance(value, str) and bool(value.strip())
+
+
+def validate_verbs(data):
+    """Проверяет список глаголов и возвращает его с заполненным level."""
+    if not isinstance(data, list) or not data:
+        raise DatasetError("dataset must be a non-empty list of verbs")
+    if len(data) > MAX_VERBS:
+        raise DatasetError(f"dataset has {len(data)} verbs, at most {MAX_VERBS} are supported")
+
+    seen = set()
+    verbs = []
+    for n, item in enumerate(data):
+        if not isinstance(item, dict):
+            raise DatasetError(f"verb #{n}: expected an object, got {type(item).__name__}")
+        for key in TEXT_FIELDS:
+            if not _is_text(item.get(key)):
+                raise DatasetError(f"verb #{n}: field {key!r} must be a non-empty string")
+        for key in FORM_FIELDS:
+            value = item.get(key)
+            if isinstance(value, list):
+                ok = bool(value) and all(_is_text(v) for v in value)
+            else:
+                ok = _is_text(value)
+            if not ok:
+                raise DatasetError(f"verb #{n} ({item['inf']}): field {key!r} must be a string or a list of strings")
+
+        level = item.get("level", 1)
+        if not isinstance(level, int) or isinstance(level, bool) or level < 1:
+            raise DatasetError(f"verb #{n} ({item['inf']}): level must be a positive integer")
+
+        if item["inf"] in seen:
+            raise DatasetError(f"verb #{n}: duplicate infinitive {item['inf']!r}")
+        seen.add(item["inf"])
+
+        verbs.append({**item, "level": level})
+    return verbs
+
+
+def _read_cache(path, digest):
+    try:
+        with open(path, "rb") as f:
+            version, cached_digest, verbs = marshal.load(f)
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    if version != CACHE_VERSION or cached_digest != digest:
+        return None
+    return verbs
+
+
+def _write_cache(path, digest, verbs):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "wb") as f:
+            marshal.dump((CACHE_VERSION, digest, verbs), f)
+        os.replace(tmp, path)
+    except OSError as e:
+        # Кэш — только ускорение; read-only диск не повод падать
+        log.warning("❗ Can't write dataset cache %s: %r", path, e)
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+
+
+def load_verbs(path, cache_path=None):
+    """Читает и проверяет датасет; бросает DatasetError при ошибке."""
+    cache_path = cache_path or path + ".cache"
+
+    with open(path, "rb") as f:
+        raw = f.read()
+    digest = hashlib.sha256(raw).hexdigest()
+
+    verbs = _read_cache(cache_path, digest)
+    if verbs is not None:
+        return verbs
+
+    try:
+        data = json.loads(raw)
+    except ValueError as e:
+        raise DatasetError(f"{os.path.basename(path)}: invalid JSON: {e}") from None
+
+    verbs = validate_verbs(data)
+    _write_cache(cache_path, digest, verbs)
+    return verbs
+
+
+class DatasetWatcher:
+    """Раз в `interval` секунд проверяет mtime/size файла и зовёт on_change."""
+
+    def __init__(self, path, on_change, interval=5.0):
+        self.path = path
+        self.on_change = on_change
+        self.interval = interval
+        self._stamp = self._stat()
+        self._task = None
+
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            stamp = self._stat()
+            if stamp is None or stamp == self._stamp:
+                continue
+            self._stamp = stamp
+            try:
+                self.on_change()
+            except Exception:
+                log.exception("❗ Dataset reload failed")
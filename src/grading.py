@@ -0,0 +1,105 @@
+# ============================
+#  ANSWER MATCHING
+# ============================
+#
+# Допустимые ответы для каждого глагола компилируются один раз при
+# загрузке каталога: формы — во frozenset, переводы — в frozenset плюс
+# одну строку для проверки «ввод — часть перевода». Проверка ответа
+# во всех режимах — это поиск в хэше вместо split/normalize на каждом
+# сообщении.
+
+# Разделитель переводов в `ru_joined`; в тексте сообщения его не бывает
+SEP = "\x00"
+
+
+def norm(text):
+    return [p.strip().lower() for p in text.replace(",", " ").split() if p.strip()]
+
+
+def normalize_forms(value):
+    # Если список — нормализуем каждый элемент
+    if isinstance(value, list):
+        return [v.lower().strip() for v in value]
+
+    # Если строка — поддерживаем варианты через "/"
+    if isinstance(value, str):
+        # НЕ разбиваем по пробелам — multi-word формы должны быть целыми
+        variants = value.split("/")
+        return [v.lower().strip() for v in variants]
+
+    return []
+
+
+def translations(ru):
+    return [p.strip() for p in ru.lower().replace(",", "/").split("/")]
+
+
+class VerbAnswers:
+    __slots__ = ("past", "part", "past_text", "part_text", "ru", "ru_joined")
+
+    def __init__(self, verb):
+        past_forms = normalize_forms(verb["past"])     # ["was", "were"]
+        part_forms = normalize_forms(verb["part"])     # ["been"]
+        expected = translations(verb["ru"])
+
+        self.past = frozenset(past_forms)
+        self.part = frozenset(part_forms)
+
+        # Для красивого вывода
+        self.past_text = ", ".join(past_forms)
+        self.part_text = ", ".join(part_forms)
+
+        self.ru = frozenset(expected)
+        self.ru_joined = SEP.join(expected)
+
+
+def compile_answers(verbs):
+    return [VerbAnswers(v) for v in verbs]
+
+
+def split_forms(text):
+    # Ввод пользователя → [past, part] или [] если не разобрать
+    user_input = text.lower().strip()
+
+    # 1) Через запятую
+    if "," in user_input:
+        return [p.strip() for p in user_input.split(",")]
+
+    raw = user_input.split()
+
+    if len(raw) == 3:
+        # Пример: "was were been"
+        # past = ["was", "were"], part = "been"
+        return [" ".join(raw[:-1]), raw[-1]]
+
+    if len(raw) == 2:
+        return raw
+
+    if len(raw) > 3:
+        # multi-word V3: "was been able to" — маловероятно, но поддержим
+        return [raw[0], " ".join(raw[1:])]
+
+    return []
+
+
+def check_forms(answers, text):
+    parts = split_forms(text)
+    if len(parts) != 2:
+        return False
+
+    # past может содержать несколько слов → все должны быть допустимыми
+    past = answers.past
+    return all(p in past for p in parts[0].split()) and parts[1] in answers.part
+
+
+def check_speed(answers, text):
+    ans = norm(text)
+    return len(ans) >= 2 and ans[0] in answers.past and ans[1] in answers.part
+
+
+def check_translation(answers, text):
+    text = text.lower()
+    if text in answers.ru:
+        return True
+    # Засчитываем и часть перевода («стро» для «строить») — как раньше
+    return SEP not in text and text in answers.ru_joined
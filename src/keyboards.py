@@ -0,0 +1,107 @@
+import json
+
+from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+
+# ============================
+#  KEYBOARD CACHE
+# ============================
+#
+# Клавиатуры зависят только от префикса, флага daily и уровня,
+# поэтому все варианты строятся один раз. Модели aiogram неизменяемые
+# (frozen), так что один объект можно отдавать во все ответы.
+# Для каждого объекта заранее храним и готовый JSON — его подставляет
+# CachedMarkupSession вместо повторной сериализации.
+
+LEVELS = (1, 2, 3)
+PREFIXES = ("forms", "translation", "mix", "repeat")
+
+MARKUP_JSON = {}   # id(markup) -> json
+
+
+def _main_menu(daily):
+    daily_text = "🔔 Daily reminder: ON" if daily else "🔕 Daily reminder: OFF"
+
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [
+            InlineKeyboardButton(text="📘 Verb Forms", callback_data="menu_forms"),
+            InlineKeyboardButton(text="🌐 Translation", callback_data="menu_translation"),
+        ],
+        [
+            InlineKeyboardButton(text="🎲 Mix", callback_data="menu_mix"),
+            InlineKeyboardButton(text="⚡ Speed", callback_data="menu_speed"),
+        ],
+        [InlineKeyboardButton(text="🔁 Repeat Mistakes", callback_data="menu_repeat")],
+        [
+            InlineKeyboardButton(text="📊 My Stats", callback_data="menu_stats"),
+            InlineKeyboardButton(text="⚙️ Settings", callback_data="menu_settings"),
+        ],
+        [InlineKeyboardButton(text=daily_text, callback_data="toggle_daily")],
+        [InlineKeyboardButton(text="ℹ️ Help", callback_data="menu_help")],
+    ])
+
+
+def _next_kb(prefix):
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="▶️ Next", callback_data=f"{prefix}_next")],
+        [InlineKeyboardButton(text="⬅️ Back", callback_data="back")]
+    ])
+
+
+def _speed_kb():
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="⏹ Stop", callback_data="speed_stop")],
+        [InlineKeyboardButton(text="⬅️ Back", callback_data="back")]
+    ])
+
+
+def _difficulty_kb():
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [
+            InlineKeyboardButton(text="1️⃣ Level 1", callback_data="difficulty_1"),
+            InlineKeyboardButton(text="2️⃣ Level 2", callback_data="difficulty_2"),
+            InlineKeyboardButton(text="3️⃣ Level 3", callback_data="difficulty_3"),
+        ],
+        [InlineKeyboardButton(text="⬅️ Back", callback_data="menu_settings")]
+    ])
+
+
+def _settings_kb():
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="🎚 Difficulty", callback_data="menu_difficulty")],
+        [InlineKeyboardButton(text="🔔 Daily reminder", callback_data="toggle_daily")],
+        [InlineKeyboardButton(text="⬅️ Back", callback_data="back")]
+    ])
+
+
+def _level_kb(lvl):
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(
+            text=(f"✅ Level {n}" if lvl == n else f"Level {n}"),
+            callback_data=f"set_level_{n}"
+        )]
+        for n in LEVELS
+    ] + [
+        [InlineKeyboardButton(text="⬅️ Back", callback_data="menu_settings")]
+    ])
+
+
+def _remember(markup, dumps):
+    MARKUP_JSON[id(markup)] = dumps(markup.model_dump(exclude_none=True))
+    return markup
+
+
+class Keyboards:
+    def __init__(self, dumps=json.dumps):
+        self.main = {daily: _remember(_main_menu(daily), dumps) for daily in (False, True)}
+        # forms_kb и translation_kb одинаковы — общий объект на префикс
+        self.next = {prefix: _remember(_next_kb(prefix), dumps) for prefix in PREFIXES}
+        self.speed = _remember(_speed_kb(), dumps)
+        self.difficulty = _remember(_difficulty_kb(), dumps)
+        self.settings = _remember(_settings_kb(), dumps)
+        self.levels = {lvl: _remember(_level_kb(lvl), dumps) for lvl in LEVELS}
+
+    def level(self, lvl):
+        markup = self.levels.get(lvl)
+        if markup is None:
+            markup = _level_kb(lvl)
+        return markup
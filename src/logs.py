@@ -0,0 +1,87 @@
+import atexit
+import logging
+import os
+import queue
+import random
+import sys
+from logging.handlers import QueueHandler, QueueListener
+
+# ============================
+#  LOGGING
+# ============================
+#
+# Запись в stdout идёт из фонового потока: обработчик в event loop
+# только кладёт запись в очередь. Форматирование тоже делается
+# в фоновом потоке. DEBUG-события структурные (uid, mode, verb, level),
+# по умолчанию выключены и могут сэмплироваться через LOG_SAMPLE.
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_SAMPLE = float(os.getenv("LOG_SAMPLE", 1.0))
+
+_listener = None
+
+
+class _DeferredQueueHandler(QueueHandler):
+    # Стандартный QueueHandler форматирует запись ещё в потоке вызова
+    def prepare(self, record):
+        return record
+
+
+class SampleFilter(logging.Filter):
+    """Пропускает только долю `rate` DEBUG-записей; остальные уровни — все."""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno > logging.DEBUG or random.random() < self.rate
+
+
+class EventFormatter(logging.Formatter):
+    def format(self, record):
+        line = super().format(record)
+        fields = getattr(record, "fields", None)
+        if fields:
+            line += " " + " ".join(f"{k}={v}" for k, v in fields.items())
+        return line
+
+
+def setup_logging(level=LOG_LEVEL, sample=LOG_SAMPLE, stream=None):
+    global _listener
+    if _listener is not None:
+        return
+
+    handler = logging.StreamHandler(stream or sys.stdout)
+    handler.setFormatter(EventFormatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = _DeferredQueueHandler(log_queue)
+    if sample < 1.0:
+        queue_handler.addFilter(SampleFilter(sample))
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(queue_handler)
+
+    # aiogram пишет INFO на каждый апдейт — это тот же горячий путь
+    if logging.getLevelName(level) != logging.DEBUG:
+        logging.getLogger("aiogram.event").setLevel(logging.WARNING)
+
+    _listener = QueueListener(log_queue, handler)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def log_event(logger, event, log_level=logging.DEBUG, **fields):
+    # Проверка уровня до сборки записи. Поля (kwargs) вызывающий собирает
+    # раньше неё — на горячем пути вызов стоит под logger.isEnabledFor
+    if logger.isEnabledFor(log_level):
+        logger.log(log_level, event, extra={"fields": fields})
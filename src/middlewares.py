@@ -0,0 +1,189 @@
+import time
+
+from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import TelegramAPIError, TelegramRetryAfter
+
+from ratelimit import PRIORITY, PRIORITY_NAMES, RateLimitDropped
+
+# ============================
+#  MIDDLEWARES
+# ============================
+
+class UserLockMiddleware(BaseMiddleware):
+    """Апдейты одного пользователя обрабатываются строго по одному.
+
+    Повторное «▶️ Next», пока ещё проверяется ответ, ждёт его
+    окончания, а не меняет user_state[uid] параллельно. Апдейты
+    разных пользователей по-прежнему идут одновременно.
+    """
+
+    def __init__(self, locks):
+        self.locks = locks
+
+    async def __call__(self, handler, event, data):
+        user = data.get("event_from_user")
+        if user is None:
+            return await handler(event, data)
+
+        async with self.locks(user.id):
+            return await handler(event, data)
+
+
+class ReadyMiddleware(BaseMiddleware):
+    """Держит апдейты, пока сервисы бота не запущены."""
+
+    def __init__(self, ready):
+        self.ready = ready
+
+    async def __call__(self, handler, event, data):
+        if not self.ready.is_set():
+            await self.ready.wait()
+        return await handler(event, data)
+
+
+class EditCoalescer(BaseMiddleware):
+    """Считает нажатия кнопок, которые перерисовывают одно и то же сообщение.
+
+    Счётчик растёт, как только апдейт пришёл (до лока пользователя).
+    Если к сообщению уже стоит в очереди ещё одно такое нажатие,
+    текущее можно пропустить: следующее всё равно перерисует сообщение.
+    Очередь вебхука считает сама (raw_key/enter/leave) и передаёт
+    edit_tracked=True — тогда middleware второй раз не считает.
+    """
+
+    def __init__(self, match, counter=None):
+        self.match = match              # callback_data -> bool
+        self.counter = counter
+        self.pending = {}               # (chat_id, message_id) -> нажатий в обработке
+
+    @staticmethod
+    def _key(q):
+        return (q.message.chat.id, q.message.message_id)
+
+    def raw_key(self, update):
+        # То же по сырому JSON апдейта; None — не наш случай
+        q = update.get("callback_query")
+        if not q or not q.get("message") or not self.match(q.get("data")):
+            return None
+        return (q["message"]["chat"]["id"], q["message"]["message_id"])
+
+    def enter(self, key):
+        self.pending[key] = self.pending.get(key, 0) + 1
+
+    def leave(self, key):
+        left = self.pending[key] - 1
+        if left:
+            self.pending[key] = left
+        else:
+            del self.pending[key]
+
+    async def __call__(self, handler, event, data):
+        q = event.callback_query
+        if data.get("edit_tracked") or q is None or q.message is None or not self.match(q.data):
+            return await handler(event, data)
+
+        key = self._key(q)
+        self.enter(key)
+        try:
+            return await handler(event, data)
+        finally:
+            self.leave(key)
+
+    def superseded(self, q):
+        if q.message is None or self.pending.get(self._key(q), 0) <= 1:
+            return False
+        if self.counter is not None:
+            self.counter.inc()
+        return True
+
+
+class InFlightMiddleware(BaseMiddleware):
+    """Сколько апдейтов сейчас внутри диспетчера (включая ждущих лок)."""
+
+    def __init__(self, gauge):
+        self.gauge = gauge
+
+    async def __call__(self, handler, event, data):
+        self.gauge.inc()
+        try:
+            return await handler(event, data)
+        finally:
+            self.gauge.dec()
+
+
+class HandlerTimingMiddleware(BaseMiddleware):
+    """Гистограмма времени обработки по «маршруту» (ветка cb / режим текста)."""
+
+    def __init__(self, histogram, route):
+        self.histogram = histogram
+        self.route = route
+
+    async def __call__(self, handler, event, data):
+        with self.histogram.time(self.route(event)):
+            return await handler(event, data)
+
+
+class RateLimitMiddleware(BaseRequestMiddleware):
+    """Отправки и правки сообщений идут через RateLimiter.
+
+    На 429 чат (и вся рассылка) ставится на паузу retry_after,
+    запрос повторяется до `retries` раз. Остальные методы
+    (answerCallbackQuery, getMe, ...) лимитом не ограничены.
+    """
+
+    def __init__(self, limiter, retries=3, retried=None, dropped=None):
+        self.limiter = limiter
+        self.retries = retries
+        self.retried = retried
+        self.dropped = dropped
+
+    @staticmethod
+    def limited(name):
+        return name.startswith(("send", "edit", "copy", "forward"))
+
+    async def __call__(self, make_request, bot, method):
+        name = method.__api_method__
+        if not self.limited(name):
+            return await make_request(bot, method)
+
+        chat_id = getattr(method, "chat_id", None)
+        priority = PRIORITY.get()
+        attempt = 0
+        while True:
+            try:
+                await self.limiter.acquire(chat_id, priority)
+            except RateLimitDropped:
+                if self.dropped is not None:
+                    self.dropped.inc(PRIORITY_NAMES[priority], "queue_full")
+                raise
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                self.limiter.backoff(chat_id, e.retry_after)
+                if attempt >= self.retries:
+                    if self.dropped is not None:
+                        self.dropped.inc(PRIORITY_NAMES[priority], "retry_after")
+                    raise
+                attempt += 1
+                if self.retried is not None:
+                    self.retried.inc(name)
+
+
+class ApiTimingMiddleware(BaseRequestMiddleware):
+    """Время каждого запроса к Bot API (sendMessage, editMessageText, ...)."""
+
+    def __init__(self, histogram, errors):
+        self.histogram = histogram
+        self.errors = errors
+
+    async def __call__(self, make_request, bot, method):
+        name = method.__api_method__
+        start = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        except TelegramAPIError as e:
+            self.errors.inc(name, type(e).__name__)
+            raise
+        finally:
+            self.histogram.observe(time.perf_counter() - start, name)
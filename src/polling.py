@@ -0,0 +1,108 @@
+import asyncio
+import logging
+
+from aiogram.exceptions import TelegramNetworkError, TelegramRetryAfter, TelegramServerError
+
+from updates import update_user_id
+
+# ============================
+#  LONG POLLING
+# ============================
+#
+# Альтернатива вебхуку: сами забираем апдейты через getUpdates и
+# раскладываем их по N воркерам. Воркер выбирается по uid, поэтому
+# апдейты одного пользователя всегда обрабатываются по очереди,
+# а разные пользователи — параллельно.
+
+log = logging.getLogger(__name__)
+
+class UserOrderedWorkers:
+    """N очередей, апдейт попадает в очередь uid % N."""
+
+    def __init__(self, handle, workers=8, maxsize=0, key=update_user_id):
+        self.handle = handle
+        self.key = key
+        self.queues = [asyncio.Queue(maxsize) for _ in range(workers)]
+        self._tasks = []
+
+    def start(self):
+        self._tasks = [asyncio.create_task(self._worker(q)) for q in self.queues]
+
+    def depth(self):
+        return sum(q.qsize() for q in self.queues)
+
+    def queue_for(self, item):
+        return self.queues[self.key(item) % len(self.queues)]
+
+    async def put(self, item):
+        await self.queue_for(item).put(item)
+
+    def offer(self, item):
+        # Без ожидания: False, если очередь воркера полна
+        try:
+            self.queue_for(item).put_nowait(item)
+        except asyncio.QueueFull:
+            return False
+        return True
+
+    async def _worker(self, queue):
+        while True:
+            item = await queue.get()
+            try:
+                await self.handle(item)
+            except Exception as e:
+                log.exception("❗ Update failed: %r", e)
+            finally:
+                queue.task_done()
+
+    async def stop(self, drain=True, timeout=None):
+        # Дорабатываем очереди не дольше timeout: апдейтам нужны вызовы
+        # Bot API, а он может быть медленным или недоступным
+        if drain:
+            try:
+                await asyncio.wait_for(asyncio.gather(*(q.join() for q in self.queues)), timeout)
+            except asyncio.TimeoutError:
+                log.warning("❗ Workers stopped with %d updates still queued", self.depth())
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+
+async def run_polling(bot, dp, pool, timeout=30, drain_timeout=None):
+    # Вебхук и getUpdates взаимоисключающие
+    await bot.delete_webhook()
+
+    pool.start()
+    allowed = dp.resolve_used_update_types()
+    log.info("🛰 Polling with %d workers", len(pool.queues))
+
+    offset = None
+    backoff = 1.0
+    try:
+        while True:
+            try:
+                updates = await bot.get_updates(
+                    offset=offset,
+                    timeout=timeout,
+                    allowed_updates=allowed,
+                    request_timeout=timeout + 10,
+                )
+            except TelegramRetryAfter as e:
+                await asyncio.sleep(e.retry_after)
+                continue
+            except (TelegramNetworkError, TelegramServerError) as e:
+                log.warning("❗ getUpdates failed: %r", e)
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30.0)
+                continue
+
+            backoff = 1.0
+            for update in updates:
+                # Очередь ограничена: если воркеры не успевают,
+                # перестаём забирать новые апдейты
+                await pool.put(update)
+                offset = update.update_id + 1
+    finally:
+        # Отмена (остановка процесса) — дорабатываем очередь, но не дольше drain_timeout
+        await pool.stop(drain=True, timeout=drain_timeout)
@@ -0,0 +1,156 @@
+import asyncio
+import heapq
+import time
+from contextvars import ContextVar
+
+# ============================
+#  OUTBOUND RATE LIMIT
+# ============================
+#
+# Telegram режет бота примерно на 30 сообщений в секунду всего и около
+# одного в секунду на чат; дальше — 429 с retry_after. Перед каждой
+# отправкой / правкой берём токен из корзины чата и из общей корзины.
+# Общие токены раздаются по приоритету: ответы пользователю раньше
+# рассылки напоминаний. Приоритет запроса — в контекстной переменной,
+# так что код, который шлёт сообщения, ничего не передаёт явно.
+
+INTERACTIVE = 0
+BULK = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BULK: "bulk"}
+
+PRIORITY = ContextVar("api_priority", default=INTERACTIVE)
+
+
+class RateLimitDropped(Exception):
+    """Запрос низкого приоритета не поставлен в переполненную очередь."""
+
+
+class TokenBucket:
+    def __init__(self, rate, burst, now):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.stamp = now
+        self.paused_until = 0.0
+
+    def _refill(self, now):
+        if now > self.stamp:
+            self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+            self.stamp = now
+
+    def delay(self, now):
+        """Через сколько секунд можно взять токен (0 — можно сейчас)."""
+        self._refill(now)
+        wait = 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+        return max(wait, self.paused_until - now)
+
+    def take(self):
+        self.tokens -= 1
+
+    def full(self, now):
+        self._refill(now)
+        return self.tokens >= self.burst and self.paused_until <= now
+
+
+class RateLimiter:
+    """Общая корзина на `rate` msg/s и по корзине на каждый чат.
+
+    Ждущие общего токена стоят в куче (приоритет, номер), поэтому
+    внутри одного приоритета порядок сохраняется. Когда в очереди уже
+    `max_queue` запросов, новые запросы BULK отклоняются
+    (RateLimitDropped); интерактивные ждут всегда.
+    """
+
+    def __init__(self, rate=30.0, chat_rate=1.0, chat_burst=3, max_queue=1000, clock=time.monotonic):
+        self.clock = clock
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_queue = max_queue
+        self.bucket = TokenBucket(rate, max(1.0, rate), clock())
+        self.chats = {}             # chat_id -> TokenBucket
+        self.bulk_paused_until = 0.0
+
+        self._waiters = []          # (priority, seq, future)
+        self._seq = 0
+        self._depth = {INTERACTIVE: 0, BULK: 0}
+        self._timer = None
+        self._prune_at = 1024
+
+    def depth(self):
+        return {PRIORITY_NAMES[p]: n for p, n in self._depth.items()}
+
+    def _chat(self, chat_id, now):
+        bucket = self.chats.get(chat_id)
+        if bucket is None:
+            if len(self.chats) >= self._prune_at:
+                # Полные корзины ничего не помнят — их можно выбросить
+                self.chats = {k: b for k, b in self.chats.items() if not b.full(now)}
+                self._prune_at = max(1024, 2 * len(self.chats))
+            bucket = self.chats[chat_id] = TokenBucket(self.chat_rate, self.chat_burst, now)
+        return bucket
+
+    def _global_delay(self, priority, now):
+        delay = self.bucket.delay(now)
+        if priority == BULK:
+            delay = max(delay, self.bulk_paused_until - now)
+        return delay
+
+    async def acquire(self, chat_id, priority=INTERACTIVE):
+        if chat_id is not None:
+            while True:
+                now = self.clock()
+                bucket = self._chat(chat_id, now)
+                delay = bucket.delay(now)
+                if delay <= 0:
+                    bucket.take()
+                    break
+                await asyncio.sleep(delay)
+
+        if not self._waiters and self._global_delay(priority, self.clock()) <= 0:
+            self.bucket.take()
+            return
+
+        if priority == BULK and len(self._waiters) >= self.max_queue:
+            raise RateLimitDropped()
+
+        future = asyncio.get_running_loop().create_future()
+        self._seq += 1
+        heapq.heappush(self._waiters, (priority, self._seq, future))
+        self._depth[priority] += 1
+        self._wake()
+        try:
+            await future
+        finally:
+            self._depth[priority] -= 1
+
+    def backoff(self, chat_id, seconds):
+        """429: чат молчит `seconds`, рассылка — тоже, целиком."""
+        now = self.clock()
+        if chat_id is not None:
+            bucket = self._chat(chat_id, now)
+            bucket.paused_until = max(bucket.paused_until, now + seconds)
+        self.bulk_paused_until = max(self.bulk_paused_until, now + seconds)
+        self._wake()
+
+    def _wake(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self._pump()
+
+    def _pump(self):
+        self._timer = None
+        waiters = self._waiters
+        while waiters:
+            priority, _, future = waiters[0]
+            if future.done():
+                # Ждавший запрос отменили
+                heapq.heappop(waiters)
+                continue
+            delay = self._global_delay(priority, self.clock())
+            if delay > 0:
+                self._timer = asyncio.get_running_loop().call_later(delay, self._pump)
+                return
+            heapq.heappop(waiters)
+            self.bucket.take()
+            future.set_result(None)
@@ -0,0 +1,162 @@
+import asyncio
+import heapq
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from aiogram.exceptions import TelegramForbiddenError
+
+# ============================
+#  DAILY REMINDERS
+# ============================
+#
+# Вместо опроса «сейчас 09:00?» раз в минуту держим кучу
+# (время_срабатывания, uid, версия) по всем подписанным пользователям.
+# Цикл спит ровно до ближайшего срабатывания, забирает всех, у кого
+# время наступило, и отдаёт их рассыльщику. Отписка / смена пояса
+# увеличивает версию — старые записи в куче просто пропускаются.
+
+log = logging.getLogger(__name__)
+
+def get_zone(name):
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return None
+
+
+class ReminderScheduler:
+    def __init__(self, broadcaster, at="09:00", default_tz="UTC", grace=3600, clock=time.time):
+        hour, minute = at.split(":")
+        self.at = (int(hour), int(minute))
+        self.default_tz = default_tz
+        self.grace = grace          # насколько поздно ещё можно отправить (сек)
+        self.clock = clock
+        self.broadcaster = broadcaster
+
+        self._heap = []             # (fire_ts, uid, version)
+        self._version = {}          # uid -> версия записи, только растёт
+        self._tz = {}               # uid -> имя пояса (есть — напоминание включено)
+        self._changed = asyncio.Event()
+        self._task = None
+
+    def __len__(self):
+        return len(self._tz)
+
+    def next_fire(self, tz_name, after):
+        zone = get_zone(tz_name) or get_zone(self.default_tz) or timezone.utc
+        local = datetime.fromtimestamp(after, zone)
+        fire = local.replace(hour=self.at[0], minute=self.at[1], second=0, microsecond=0)
+        if fire.timestamp() <= after:
+            # Через дату, а не +24ч — чтобы переход на летнее время не сдвигал час
+            fire = datetime.combine(fire.date() + timedelta(days=1), fire.timetz())
+        return fire.timestamp()
+
+    def _push(self, uid, after):
+        version = self._version.get(uid, 0) + 1
+        self._version[uid] = version
+        tz_name = self._tz.get(uid) or self.default_tz
+        heapq.heappush(self._heap, (self.next_fire(tz_name, after), uid, version))
+        self._changed.set()
+
+    def enable(self, uid, tz=None):
+        self._tz[uid] = tz
+        self._push(uid, self.clock())
+
+    def disable(self, uid):
+        # Запись в куче остаётся, но версия ушла вперёд — она будет пропущена.
+        # Версию не удаляем: иначе следующий enable начнёт снова с 1 и
+        # оживит старую запись с тем же номером
+        if uid in self._version:
+            self._version[uid] += 1
+        self._tz.pop(uid, None)
+
+    def pop_due(self, now):
+        due = []
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            fire_ts, uid, version = heapq.heappop(heap)
+            if self._version.get(uid) != version:
+                continue
+            if now - fire_ts <= self.grace:
+                due.append(uid)
+            # Следующее срабатывание — завтра в то же местное время
+            self._push(uid, max(now, fire_ts))
+        return due
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            self._changed.clear()
+            now = self.clock()
+            due = self.pop_due(now)
+            if due:
+                # Рассылка идёт отдельной задачей — планировщик не ждёт её
+                asyncio.create_task(self.broadcaster.deliver(due))
+
+            delay = 3600.0
+            if self._heap:
+                delay = min(delay, max(0.0, self._heap[0][0] - self.clock()))
+            try:
+                await asyncio.wait_for(self._changed.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+
+# ============================
+#  BROADCASTER
+# ============================
+
+class Broadcaster:
+    """Параллельная рассылка, не более `max_in_flight` запросов сразу.
+
+    Темп, лимит на чат и повторы после 429 — забота RateLimiter
+    (ratelimit.py): `send` помечает запросы как BULK, и ответы
+    пользователям обгоняют рассылку в общей очереди.
+    """
+
+    def __init__(self, send, max_in_flight=50, on_blocked=None):
+        self.send = send
+        self.on_blocked = on_blocked
+        self._slots = asyncio.Semaphore(max_in_flight)
+
+        self.sent = 0
+        self.failed = 0
+
+    async def _send_one(self, uid):
+        try:
+            await self.send(uid)
+            self.sent += 1
+        except TelegramForbiddenError:
+            # Пользователь заблокировал бота — больше не пишем
+            if self.on_blocked:
+                self.on_blocked(uid)
+            self.failed += 1
+        except Exception as e:
+            # В т.ч. 429 после всех повторов и отброшенные лимитером
+            log.warning("❗ Reminder failed: %s %r", uid, e)
+            self.failed += 1
+        finally:
+            self._slots.release()
+
+    async def deliver(self, uids):
+        started = time.monotonic()
+        tasks = []
+        for uid in uids:
+            await self._slots.acquire()
+            tasks.append(asyncio.create_task(self._send_one(uid)))
+        await asyncio.gather(*tasks)
+        log.info("⏰ Reminders: %d users in %.1fs (sent %d, failed %d)",
+                 len(uids), time.monotonic() - started, self.sent, self.failed)
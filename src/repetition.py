@@ -0,0 +1,146 @@
+import heapq
+import itertools
+import sys
+import time
+
+# ============================
+#  SPACED REPETITION
+# ============================
+#
+# Колода ошибок одного пользователя по схеме Лейтнера. Карточка —
+# пара (inf, mode) с номером коробки и временем следующего повтора.
+# Ошибка возвращает карточку в коробку 0 (повторить сразу), верный
+# ответ на повторе переносит её в следующую коробку с большим
+# интервалом; после последней коробки карточка выбывает.
+#
+# Карточки лежат в куче по времени повтора, плюс dict (inf, mode) ->
+# карточка для O(1) проверки. При переносе старая запись в куче
+# помечается пустой и пропускается — перестройка кучи не нужна.
+
+# Интервал до следующего повтора для каждой коробки (сек)
+INTERVALS = (0, 10 * 60, 24 * 3600, 3 * 24 * 3600, 7 * 24 * 3600)
+
+
+class Card:
+    __slots__ = ("inf", "mode", "box", "due", "entry")
+
+    def __init__(self, inf, mode, box, due):
+        self.inf = inf
+        self.mode = mode
+        self.box = box
+        self.due = due
+        self.entry = None           # [due, seq, card] в куче
+
+    @property
+    def key(self):
+        return (self.inf, self.mode)
+
+
+class RepetitionDeck:
+    __slots__ = ("clock", "_cards", "_heap", "_seq", "_stale")
+
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self._cards = {}            # (inf, mode) -> Card
+        self._heap = []
+        self._seq = itertools.count()
+        self._stale = 0
+
+    def __len__(self):
+        return len(self._cards)
+
+    def __contains__(self, key):
+        return key in self._cards
+
+    def _schedule(self, card, due):
+        if card.entry is not None:
+            card.entry[2] = None
+            self._stale += 1
+        card.due = due
+        card.entry = [due, next(self._seq), card]
+        heapq.heappush(self._heap, card.entry)
+
+        # Мусора больше, чем живых записей — пересобираем кучу
+        if self._stale > len(self._cards) + 16:
+            self._heap = [entry for entry in self._heap if entry[2] is not None]
+            heapq.heapify(self._heap)
+            self._stale = 0
+
+    def _top(self):
+        heap = self._heap
+        while heap and heap[0][2] is None:
+            heapq.heappop(heap)
+            self._stale -= 1
+        return heap[0][2] if heap else None
+
+    def miss(self, inf, mode, now=None):
+        """Ошибка: карточка (новая или старая) ставится на повтор сейчас.
+
+        Уже просроченные карточки идут раньше, так что ошибка на повторе
+        отправляет карточку в конец текущей очереди.
+        """
+        now = self.clock() if now is None else now
+        card = self._cards.get((inf, mode))
+        if card is None:
+            card = self._cards[(inf, mode)] = Card(inf, mode, 0, now)
+        card.box = 0
+        self._schedule(card, now)
+        return True
+
+    def hit(self, inf, mode, now=None):
+        """Верный ответ. Засчитывается, только если карточке пора на повтор."""
+        now = self.clock() if now is None else now
+        card = self._cards.get((inf, mode))
+        if card is None or card.due > now:
+            return False
+
+        card.box += 1
+        if card.box >= len(INTERVALS):
+            # Выучено — убираем из колоды
+            del self._cards[card.key]
+            card.entry[2] = None
+            self._stale += 1
+        else:
+            self._schedule(card, now + INTERVALS[card.box])
+        return True
+
+    def discard(self, inf, mode):
+        card = self._cards.pop((inf, mode), None)
+        if card is not None:
+            card.entry[2] = None
+            self._stale += 1
+
+    def due(self, now=None):
+        """Ближайшая карточка, которой пора на повтор, или None."""
+        now = self.clock() if now is None else now
+        card = self._top()
+        if card is None or card.due > now:
+            return None
+        return card
+
+    def next_due(self):
+        # Когда появится следующая карточка (для сообщения «всё повторено»)
+        card = self._top()
+        return card.due if card else None
+
+    def to_json(self):
+        return [
+            {"inf": c.inf, "mode": c.mode, "box": c.box, "due": c.due}
+            for c in self._cards.values()
+        ]
+
+    @classmethod
+    def from_json(cls, items, known=None, clock=time.time):
+        # known — множество допустимых инфинитивов (глагол мог пропасть из словаря).
+        # Старые записи без box/due становятся карточками, которые пора повторить.
+        deck = cls(clock=clock)
+        for item in items:
+            if known is not None and item["inf"] not in known:
+                continue
+            if (item["inf"], item["mode"]) in deck._cards:
+                continue
+            # Строки из JSON — свои у каждого пользователя; intern делает их общими
+            card = Card(sys.intern(item["inf"]), sys.intern(item["mode"]), item.get("box", 0), item.get("due", 0))
+            deck._cards[card.key] = card
+            deck._schedule(card, card.due)
+        return deck
@@ -0,0 +1,114 @@
+import random
+from array import array
+from bisect import bisect_left
+
+# ============================
+#  ADAPTIVE VERB SAMPLER
+# ============================
+#
+# Следующий глагол выбирается с весом, равным квадрату сглаженной доли
+# ошибок пользователя в нём: ((ошибок + 0.5) / (ответов + 1)) ** 2.
+# Квадрат усиливает разницу: после одной ошибки глагол весит 0.56,
+# после одного верного ответа — 0.06, новый — 0.25. Выученный весит
+# не меньше MIN_WEIGHT, чтобы изредка всплывать.
+# Веса лежат в дереве Фенвика: выбор и обновление веса — O(log n).
+# Всё состояние — плоские массивы array: пул индексов каталога общий
+# с VerbCatalog, своё у сессии — только счётчики и дерево.
+
+MIN_WEIGHT = 0.05
+
+def error_weight(correct, total):
+    return max(MIN_WEIGHT, ((total - correct + 0.5) / (total + 1)) ** 2)
+
+
+class FenwickTree:
+    __slots__ = ("n", "tree", "top")
+
+    def __init__(self, values):
+        tree = array("d", [0.0])
+        tree.extend(values)
+        n = len(tree) - 1
+        # Построение за O(n): каждый узел добавляет себя родителю
+        for i in range(1, n + 1):
+            parent = i + (i & -i)
+            if parent <= n:
+                tree[parent] += tree[i]
+        self.n = n
+        self.tree = tree
+        self.top = 1 << n.bit_length() >> 1 if n else 0
+
+    def add(self, i, delta):
+        i += 1
+        tree = self.tree
+        while i <= self.n:
+            tree[i] += delta
+            i += i & -i
+
+    def total(self):
+        s, i = 0.0, self.n
+        tree = self.tree
+        while i > 0:
+            s += tree[i]
+            i -= i & -i
+        return s
+
+    def find(self, x):
+        """Наименьший индекс, у которого сумма префикса (включительно) > x."""
+        pos, step = 0, self.top
+        tree = self.tree
+        while step:
+            nxt = pos + step
+            if nxt <= self.n and tree[nxt] <= x:
+                pos = nxt
+                x -= tree[nxt]
+            step >>= 1
+        # Из-за округления x может дойти до конца — берём последний
+        return min(pos, self.n - 1)
+
+
+class AdaptiveSampler:
+    """Взвешенный выбор из `indices` (индексы каталога по возрастанию) по ошибкам.
+
+    `counts[k]` — (верных, всего) для indices[k] или None. Только что
+    показанный глагол не выпадает два раза подряд: его вес в дереве
+    обнуляется до следующего выбора.
+    """
+
+    __slots__ = ("indices", "correct", "total", "weights", "tree", "rng", "_held")
+
+    def __init__(self, indices, counts, rng=random):
+        # array('H') из каталога берём как есть, без копии
+        self.indices = indices if isinstance(indices, array) else array("H", indices)
+        self.correct = array("I", (c[0] if c else 0 for c in counts))
+        self.total = array("I", (c[1] if c else 0 for c in counts))
+        self.weights = array("d", map(error_weight, self.correct, self.total))
+        self.tree = FenwickTree(self.weights)
+        self.rng = rng
+        self._held = None
+
+    def __len__(self):
+        return len(self.indices)
+
+    def draw(self):
+        held = self._held
+        if held is not None and (self.tree.total() <= 0 or len(self.indices) == 1):
+            self.tree.add(held, self.weights[held])
+            held = None
+
+        k = self.tree.find(self.rng.random() * self.tree.total())
+        if held is not None:
+            self.tree.add(held, self.weights[held])
+        self.tree.add(k, -self.weights[k])
+        self._held = k
+        return self.indices[k]
+
+    def record(self, idx, ok):
+        k = bisect_left(self.indices, idx)
+        if k == len(self.indices) or self.indices[k] != idx:
+            return
+        self.correct[k] += ok
+        self.total[k] += 1
+        old, new = self.weights[k], error_weight(self.correct[k], self.total[k])
+        self.weights[k] = new
+        if k != self._held:
+            self.tree.add(k, new - old)
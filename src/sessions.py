@@ -0,0 +1,118 @@
+import time
+from collections import OrderedDict
+
+# ============================
+#  TRAINING SESSION
+# ============================
+
+class Session:
+    """Состояние одной тренировки пользователя.
+
+    Класс со __slots__ вместо dict: у сессии нет __dict__, поля лежат
+    прямо в объекте. Поля, не нужные режиму, остаются по умолчанию.
+    """
+
+    __slots__ = (
+        "mode", "catalog", "sampler", "verb", "asked",
+        "sub", "repeat_mode",                       # mix / repeat: что спрашиваем
+        "correct", "total", "wrong", "end", "timer",  # speed
+    )
+
+    def __init__(self, mode, catalog, sampler=None, sub=None, end=None):
+        self.mode = mode
+        self.catalog = catalog
+        self.sampler = sampler
+        self.verb = None
+        self.asked = None           # time.monotonic() показа вопроса
+        self.sub = sub
+        self.repeat_mode = None
+        self.correct = 0
+        self.total = 0
+        self.wrong = None           # speed: список ошибок для итогов
+        self.end = end
+        self.timer = None
+
+
+# ============================
+#  SESSION CACHE
+# ============================
+
+class SessionCache:
+    """LRU + idle TTL для сессий тренировки (user_state).
+
+    Порядок в OrderedDict — порядок последнего обращения, поэтому
+    протухшие сессии всегда лежат в начале и чистятся за O(1)
+    амортизированно при каждом обращении. Выселенная сессия просто
+    пропадает: обработчики пересобирают её при следующем сообщении.
+    """
+
+    def __init__(self, max_entries=100_000, ttl=6 * 3600, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+
+        self._data = OrderedDict()   # uid -> (session, last_access)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, uid):
+        return self.get(uid, count=False) is not None
+
+    def _expire(self, now):
+        data = self._data
+        deadline = now - self.ttl
+        while data:
+            uid, (_, last) = next(iter(data.items()))
+            if last > deadline:
+                break
+            del data[uid]
+            self.evictions += 1
+
+    def get(self, uid, default=None, count=True):
+        now = self.clock()
+        self._expire(now)
+
+        entry = self._data.get(uid)
+        if entry is None:
+            if count:
+                self.misses += 1
+            return default
+
+        if count:
+            self.hits += 1
+        self._data[uid] = (entry[0], now)
+        self._data.move_to_end(uid)
+        return entry[0]
+
+    def __getitem__(self, uid):
+        session = self.get(uid)
+        if session is None:
+            raise KeyError(uid)
+        return session
+
+    def __setitem__(self, uid, session):
+        now = self.clock()
+        self._expire(now)
+
+        self._data[uid] = (session, now)
+        self._data.move_to_end(uid)
+
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, uid, default=None):
+        entry = self._data.pop(uid, None)
+        return default if entry is None else entry[0]
+
+    def stats(self):
+        return {
+            "size": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
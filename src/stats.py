@@ -0,0 +1,170 @@
+import calendar
+import sys
+import time
+from array import array
+from itertools import islice
+
+from sortedcontainers import SortedList
+
+# ============================
+#  USER STATISTICS
+# ============================
+#
+# Каждый ответ меняет статистику за O(1): счётчики, текущую и лучшую
+# серию, точность по глаголу и число ответов за день (UTC, последние
+# DAYS_KEPT дней). Ничего не пересчитывается при показе /stats.
+#
+# В памяти — UserStats со __slots__: счётчики глагола упакованы в одно
+# int (всего << 32 | верных), инфинитивы интернированы и общие у всех
+# пользователей, дни — плоский array('I') пар (номер дня с эпохи,
+# ответов), старые в начале. В стор уходит прежний JSON.
+
+DAYS_KEPT = 30
+
+class UserStats:
+    __slots__ = ("correct", "wrong", "best", "streak", "last_training", "name", "verbs", "days")
+
+    def __init__(self):
+        self.correct = 0
+        self.wrong = 0
+        self.best = 0
+        self.streak = 0
+        self.last_training = 0
+        self.name = None
+        self.verbs = {}             # inf -> всего << 32 | верных
+        self.days = array("I")      # день, ответов, день, ответов, ...
+
+    def to_json(self):
+        data = {
+            "correct": self.correct, "wrong": self.wrong, "best": self.best,
+            "streak": self.streak, "last_training": self.last_training,
+            "verbs": {inf: [packed & 0xFFFFFFFF, packed >> 32] for inf, packed in self.verbs.items()},
+            "days": {day_key(day * 86400): n for day, n in zip(self.days[::2], self.days[1::2])},
+        }
+        if self.name:
+            data["name"] = self.name
+        return data
+
+    @classmethod
+    def from_json(cls, data):
+        # Записи, сохранённые до появления части полей, дополняются нулями
+        stats = cls()
+        for field in ("correct", "wrong", "best", "streak", "last_training"):
+            setattr(stats, field, data.get(field, 0))
+        stats.name = data.get("name")
+        stats.verbs = {
+            sys.intern(inf): total << 32 | correct
+            for inf, (correct, total) in data.get("verbs", {}).items()
+        }
+        for day, n in data.get("days", {}).items():
+            stats.days.append(day_number(calendar.timegm(time.strptime(day, "%Y-%m-%d"))))
+            stats.days.append(n)
+        return stats
+
+
+def day_key(ts):
+    return time.strftime("%Y-%m-%d", time.gmtime(ts))
+
+def day_number(ts):
+    return int(ts // 86400)
+
+def record_answer(stats, inf, ok, now=None):
+    now = time.time() if now is None else now
+
+    if ok:
+        stats.correct += 1
+        stats.streak += 1
+        if stats.streak > stats.best:
+            stats.best = stats.streak
+    else:
+        stats.wrong += 1
+        stats.streak = 0
+    stats.last_training = now
+
+    inf = sys.intern(inf)
+    stats.verbs[inf] = stats.verbs.get(inf, 0) + (1 << 32 | ok)
+
+    days = stats.days
+    day = day_number(now)
+    if days and days[-2] == day:
+        days[-1] += 1
+    else:
+        days.append(day)
+        days.append(1)
+        if len(days) > 2 * DAYS_KEPT:
+            del days[:2]
+
+def accuracy(stats):
+    total = stats.correct + stats.wrong
+    return stats.correct / total if total else 0.0
+
+def answers_on(stats, ts):
+    days, day = stats.days, day_number(ts)
+    for i in range(len(days) - 2, -1, -2):
+        if days[i] == day:
+            return days[i + 1]
+    return 0
+
+def verb_counts(stats, inf):
+    # (верных, всего) по глаголу или None, если ответов не было
+    packed = stats.verbs.get(inf)
+    if packed is None:
+        return None
+    return packed & 0xFFFFFFFF, packed >> 32
+
+def verb_accuracy(stats, inf):
+    correct, total = verb_counts(stats, inf) or (0, 0)
+    return correct / total if total else None
+
+
+# ============================
+#  LEADERBOARD
+# ============================
+
+class Leaderboard:
+    """Рейтинг по числу верных ответов.
+
+    SortedList из (-очки, uid): обновление и место — O(log n),
+    первые N — O(log n + N). Пользователи без очков в рейтинг не входят.
+    """
+
+    def __init__(self):
+        self._scores = {}           # uid -> очки
+        self._sorted = SortedList()
+        self.names = {}             # uid -> имя для /top
+
+    def __len__(self):
+        return len(self._scores)
+
+    def load(self, rows):
+        # (uid, очки, имя) из стора при запуске: одна сортировка вместо n вставок
+        for uid, score, name in rows:
+            if name:
+                self.names[uid] = name
+            if score and score > 0:
+                self._scores[uid] = score
+        self._sorted = SortedList((-score, uid) for uid, score in self._scores.items())
+
+    def update(self, uid, score, name=None):
+        if name:
+            self.names[uid] = name
+        old = self._scores.get(uid)
+        if old == score:
+            return
+        if old is not None:
+            self._sorted.remove((-old, uid))
+        if score > 0:
+            self._scores[uid] = score
+            self._sorted.add((-score, uid))
+        else:
+            self._scores.pop(uid, None)
+
+    def rank(self, uid):
+        # 1 + сколько пользователей набрали строго больше; одинаковые очки — одно место
+        score = self._scores.get(uid)
+        if score is None:
+            return None
+        return self._sorted.bisect_left((-score,)) + 1
+
+    def top(self, n=10):
+        return [(uid, -neg) for neg, uid in islice(self._sorted, n)]
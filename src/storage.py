@@ -0,0 +1,255 @@
+import asyncio
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# ============================
+#  USER STORE
+# ============================
+#
+# Хранилище настроек / статистики / ошибок пользователей.
+# Обработчики работают с UserRecord в памяти (users.py), а стор только
+# подгружает пользователя при первом обращении и сохраняет
+# изменённых пользователей пачками в фоне (write-behind).
+
+log = logging.getLogger(__name__)
+
+class MemoryStore:
+    """Ничего не сохраняет — всё живёт до перезапуска процесса."""
+
+    def load(self, uid):
+        return None
+
+    def mark_dirty(self, uid):
+        pass
+
+    def daily_users(self):
+        return []
+
+    def scores(self):
+        return []
+
+    def pending(self):
+        return 0
+
+    def is_pending(self, uid):
+        # True — изменения пользователя ещё не дошли до базы
+        return False
+
+    async def start(self):
+        pass
+
+    async def try_lease(self, name, owner, ttl):
+        # Один процесс — он всегда лидер
+        return True
+
+    async def release_lease(self, name, owner):
+        pass
+
+    async def flush(self):
+        pass
+
+    async def close(self):
+        pass
+
+
+class SqliteStore(MemoryStore):
+    """SQLite в режиме WAL с отложенной пакетной записью.
+
+    `snapshot(uid)` должен вернуть dict с ключами settings/stats/errors,
+    готовый к json.dumps. Он вызывается в event loop в момент сброса,
+    так что в базу попадает последнее состояние пользователя.
+    """
+
+    def __init__(self, path, snapshot, flush_interval=2.0, flush_size=500):
+        self.path = path
+        self.snapshot = snapshot
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+
+        self._dirty = set()
+        self._flushing = set()      # снятые в сброс, но ещё не записанные
+        self._wakeup = asyncio.Event()
+        self._task = None
+
+        # Все записи идут через один поток — одно соединение, без гонок
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite-writer")
+
+        self._reader = self._connect()
+        self._reader.executescript(
+            "CREATE TABLE IF NOT EXISTS users ("
+            " uid INTEGER PRIMARY KEY,"
+            " settings TEXT NOT NULL,"
+            " stats TEXT NOT NULL,"
+            " errors TEXT NOT NULL"
+            ");"
+            "CREATE TABLE IF NOT EXISTS leases ("
+            " name TEXT PRIMARY KEY,"
+            " owner TEXT NOT NULL,"
+            " expires REAL NOT NULL"
+            ")"
+        )
+        self._writer = None
+
+    def _connect(self):
+        # sqlite3 нужен только с DB_PATH — без базы его не импортируем
+        import sqlite3
+
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        # Базу могут делить несколько процессов — ждём чужую запись, а не падаем
+        conn.execute("PRAGMA busy_timeout=5000")
+        return conn
+
+    # ---------- чтение ----------
+
+    def load(self, uid):
+        # Чтение в WAL не ждёт писателя и не делает fsync,
+        # поэтому выполняется синхронно один раз на пользователя
+        row = self._reader.execute(
+            "SELECT settings, stats, errors FROM users WHERE uid = ?", (uid,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {
+            "settings": json.loads(row[0]),
+            "stats": json.loads(row[1]),
+            "errors": json.loads(row[2]),
+        }
+
+    def daily_users(self):
+        # (uid, settings) всех подписанных на ежедневное напоминание
+        rows = self._reader.execute(
+            "SELECT uid, settings FROM users WHERE json_extract(settings, '$.daily_enabled')"
+        ).fetchall()
+        return [(uid, json.loads(settings)) for uid, settings in rows]
+
+    def scores(self):
+        # (uid, верных ответов, имя) всех, кто хоть раз ответил верно — для рейтинга
+        return self._reader.execute(
+            "SELECT uid, json_extract(stats, '$.correct'), json_extract(stats, '$.name')"
+            " FROM users WHERE json_extract(stats, '$.correct') > 0"
+        ).fetchall()
+
+    # ---------- запись ----------
+
+    def pending(self):
+        return len(self._dirty)
+
+    def is_pending(self, uid):
+        return uid in self._dirty or uid in self._flushing
+
+    def mark_dirty(self, uid):
+        self._dirty.add(uid)
+        if len(self._dirty) >= self.flush_size:
+            self._wakeup.set()
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        self._writer = await loop.run_in_executor(self._executor, self._connect)
+        self._task = asyncio.create_task(self._flush_loop())
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                # Пользователи остаются «грязными» и уйдут в следующий сброс
+                log.warning("❗ Store flush failed: %r", e)
+
+    async def flush(self):
+        if not self._dirty:
+            return
+
+        dirty, self._dirty = self._dirty, set()
+        rows = []
+        for uid in dirty:
+            data = self.snapshot(uid)
+            if data is None:
+                continue
+            rows.append((
+                uid,
+                json.dumps(data["settings"], ensure_ascii=False),
+                json.dumps(data["stats"], ensure_ascii=False),
+                json.dumps(data["errors"], ensure_ascii=False),
+            ))
+
+        loop = asyncio.get_running_loop()
+        self._flushing |= dirty
+        try:
+            await loop.run_in_executor(self._executor, self._write_rows, rows)
+        except Exception:
+            self._dirty |= dirty
+            raise
+        finally:
+            self._flushing -= dirty
+
+    def _write_rows(self, rows):
+        conn = self._writer
+        # IMMEDIATE — сразу берём блокировку записи, без апгрейда посреди транзакции
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT INTO users (uid, settings, stats, errors) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(uid) DO UPDATE SET "
+                " settings = excluded.settings,"
+                " stats = excluded.stats,"
+                " errors = excluded.errors",
+                rows,
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    # ---------- аренда (лидер среди процессов) ----------
+
+    async def try_lease(self, name, owner, ttl):
+        """Взять или продлить аренду `name` на ttl секунд. True — аренда наша."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._try_lease, name, owner, ttl, time.time())
+
+    def _try_lease(self, name, owner, ttl, now):
+        # Одна команда в autocommit — атомарно: чужую аренду забираем,
+        # только если она истекла
+        conn = self._writer
+        conn.execute(
+            "INSERT INTO leases (name, owner, expires) VALUES (?, ?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET owner = excluded.owner, expires = excluded.expires "
+            "WHERE leases.owner = excluded.owner OR leases.expires < ?",
+            (name, owner, now + ttl, now),
+        )
+        row = conn.execute("SELECT owner FROM leases WHERE name = ?", (name,)).fetchone()
+        return row is not None and row[0] == owner
+
+    async def release_lease(self, name, owner):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(
+            self._executor,
+            lambda: self._writer.execute("DELETE FROM leases WHERE name = ? AND owner = ?", (name, owner)),
+        )
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        if self._writer is not None:
+            await self.flush()
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(self._executor, self._writer.close)
+            self._writer = None
+
+        self._executor.shutdown(wait=True)
+        self._reader.close()
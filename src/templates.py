@@ -0,0 +1,47 @@
+# ============================
+#  MESSAGE TEMPLATES
+# ============================
+#
+# Вопросы и ответы по глаголу рендерятся один раз на загрузку
+# каталога: шаблон MarkdownV2 + поля глагола, экранированные заранее.
+# На вопросе остаётся поиск готовой строки. Экранирование убирает
+# "can't parse entities", если в переводе встретится `_`, `*` или `[`.
+#
+# Шаблоны — обычные str.format с полями {inf}, {ru}, {past}, {part};
+# постоянный текст в них уже экранирован (`\!`, `\.`).
+
+SPECIAL = "\\_*[]()~`>#+-=|{}.!"
+_ESCAPE = str.maketrans({c: "\\" + c for c in SPECIAL})
+
+def escape(text):
+    """Текст как есть внутри сообщения MarkdownV2."""
+    return str(text).translate(_ESCAPE)
+
+
+def verb_fields(verb, answers):
+    return {
+        "inf": escape(verb["inf"]),
+        "ru": escape(verb["ru"]),
+        "past": escape(answers.past_text),
+        "part": escape(answers.part_text),
+    }
+
+
+class VerbTexts:
+    """Готовые тексты всех шаблонов для каждого глагола каталога.
+
+    На глагол — кортеж строк в порядке `keys`, номер ключа общий
+    для всех глаголов.
+    """
+
+    __slots__ = ("keys", "_texts")
+
+    def __init__(self, templates, verbs, answers):
+        self.keys = {key: n for n, key in enumerate(templates)}
+        self._texts = [
+            tuple(template.format(**fields) for template in templates.values())
+            for fields in map(verb_fields, verbs, answers)
+        ]
+
+    def get(self, idx, key):
+        return self._texts[idx][self.keys[key]]
@@ -0,0 +1,110 @@
+import asyncio
+import inspect
+import logging
+import math
+import time
+
+# ============================
+#  TIMING WHEEL
+# ============================
+#
+# Общий таймер для тысяч коротких сессий (speed mode): одна задача
+# тикает раз в `tick` секунд и срабатывает таймеры из текущего слота,
+# вместо отдельной спящей задачи на каждую сессию. Добавление и отмена
+# таймера — O(1). Часы монотонные и подменяемые: в тестах можно
+# передать фейковые часы и двигать время через advance(now).
+
+log = logging.getLogger(__name__)
+
+
+def _log_failure(task):
+    if not task.cancelled() and task.exception() is not None:
+        log.error("❗ Timer callback failed", exc_info=task.exception())
+
+
+class Timer:
+    __slots__ = ("deadline", "callback", "args", "cancelled", "_tick", "_wheel")
+
+    def __init__(self, wheel, deadline, tick, callback, args):
+        self._wheel = wheel
+        self.deadline = deadline
+        self._tick = tick
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        if not self.cancelled:
+            self.cancelled = True
+            self._wheel._slot_of(self._tick).discard(self)
+
+
+class TimingWheel:
+    def __init__(self, tick=0.25, slots=256, clock=time.monotonic):
+        self.tick = tick
+        self.clock = clock
+        self._slots = [set() for _ in range(slots)]
+        self._current = int(clock() / tick)   # последний обработанный тик
+        self._task = None
+
+    def __len__(self):
+        return sum(len(slot) for slot in self._slots)
+
+    def _slot_of(self, tick):
+        return self._slots[tick % len(self._slots)]
+
+    def call_later(self, delay, callback, *args):
+        deadline = self.clock() + delay
+        tick = max(math.ceil(deadline / self.tick), self._current + 1)
+        timer = Timer(self, deadline, tick, callback, args)
+        self._slot_of(tick).add(timer)
+        return timer
+
+    def advance(self, now=None):
+        """Срабатывают все таймеры с дедлайном ≤ now. Возвращает их число."""
+        now = self.clock() if now is None else now
+        target = int(now / self.tick)
+        if target <= self._current:
+            return 0
+
+        # Если отстали больше чем на оборот колеса, хватает одного прохода по всем слотам
+        last = min(target, self._current + len(self._slots))
+        due = []
+        for tick in range(self._current + 1, last + 1):
+            slot = self._slot_of(tick)
+            ready = [timer for timer in slot if timer._tick <= target]
+            for timer in ready:
+                slot.discard(timer)
+            due.extend(ready)
+        self._current = target
+
+        due.sort(key=lambda timer: timer.deadline)
+        for timer in due:
+            timer.cancelled = True
+            self._fire(timer)
+        return len(due)
+
+    def _fire(self, timer):
+        try:
+            result = timer.callback(*timer.args)
+            if inspect.isawaitable(result):
+                asyncio.ensure_future(result).add_done_callback(_log_failure)
+        except Exception:
+            log.exception("❗ Timer callback failed")
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.tick)
+            self.advance()
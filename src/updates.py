@@ -0,0 +1,45 @@
+# ============================
+#  UPDATE OWNER
+# ============================
+#
+# uid пользователя, к которому относится апдейт: по нему апдейты
+# раскладываются по воркерам (polling, webhook) и процессам (cluster).
+# aiogram здесь не импортируется — модуль нужен и диспетчеру кластера.
+
+UPDATE_FIELDS = (
+    "message", "edited_message", "callback_query", "inline_query",
+    "chosen_inline_result", "my_chat_member", "pre_checkout_query",
+    "shipping_query", "poll_answer", "chat_join_request",
+)
+
+
+def update_user_id(update):
+    # Апдейт aiogram (модель)
+    for name in UPDATE_FIELDS:
+        event = getattr(update, name, None)
+        if event is None:
+            continue
+        user = getattr(event, "from_user", None) or getattr(event, "user", None)
+        if user is not None:
+            return user.id
+        chat = getattr(event, "chat", None)
+        if chat is not None:
+            return chat.id
+    return 0
+
+
+def raw_user_id(data):
+    # То же по сырому JSON апдейта; поля не того типа пропускаются
+    if not isinstance(data, dict):
+        return 0
+    for name in UPDATE_FIELDS:
+        event = data.get(name)
+        if not isinstance(event, dict):
+            continue
+        user = event.get("from") or event.get("user")
+        if isinstance(user, dict) and isinstance(user.get("id"), int):
+            return user["id"]
+        chat = event.get("chat")
+        if isinstance(chat, dict) and isinstance(chat.get("id"), int):
+            return chat["id"]
+    return 0
@@ -0,0 +1,132 @@
+import time
+from collections import OrderedDict
+
+from repetition import RepetitionDeck
+from stats import UserStats
+
+# ============================
+#  USER RECORD
+# ============================
+#
+# Всё, что бот помнит о пользователе между сессиями: настройки,
+# статистика и колода ошибок — один объект со __slots__ вместо трёх
+# dict в трёх разных таблицах. В стор по-прежнему уходят три JSON
+# (settings / stats / errors), формат базы не меняется.
+
+class UserRecord:
+    __slots__ = ("level", "daily", "tz", "stats", "errors")
+
+    def __init__(self, level=1, daily=False, tz=None, stats=None, errors=None):
+        self.level = level
+        self.daily = daily
+        self.tz = tz
+        self.stats = stats if stats is not None else UserStats()
+        self.errors = errors if errors is not None else RepetitionDeck()
+
+    def settings(self):
+        settings = {"daily_enabled": self.daily, "level": self.level}
+        if self.tz:
+            settings["tz"] = self.tz
+        return settings
+
+    def to_json(self):
+        return {
+            "settings": self.settings(),
+            "stats": self.stats.to_json(),
+            "errors": self.errors.to_json(),
+        }
+
+    @classmethod
+    def from_json(cls, data, known=None):
+        # known — инфинитивы текущего каталога: карточки пропавших глаголов отбрасываются
+        settings = data["settings"]
+        return cls(
+            level=settings.get("level", 1),
+            daily=bool(settings.get("daily_enabled")),
+            tz=settings.get("tz"),
+            stats=UserStats.from_json(data["stats"]),
+            errors=RepetitionDeck.from_json(data["errors"], known=known),
+        )
+
+
+# ============================
+#  USER CACHE
+# ============================
+
+class UserCache:
+    """uid -> UserRecord с выселением простаивающих записей.
+
+    Как SessionCache: порядок в OrderedDict — порядок последнего
+    обращения, записи дольше `ttl` без обращений или сверх `max_entries`
+    выселяются с начала. Но выселяется только запись, уже сохранённая
+    в стор (`persisted(uid)`), — иначе пропали бы несброшенные ответы.
+    Несохранённая запись в начале останавливает выселение до
+    следующего сброса. Без `persisted` (MemoryStore) записи не
+    выселяются: кроме памяти процесса их хранить негде.
+    """
+
+    def __init__(self, max_entries=100_000, ttl=6 * 3600, persisted=None, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.persisted = persisted
+        self.clock = clock
+
+        self._data = OrderedDict()   # uid -> (record, last_access)
+        self.loads = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, uid):
+        return uid in self._data
+
+    def _evict(self, now):
+        if self.persisted is None:
+            return
+        data = self._data
+        deadline = now - self.ttl
+        while data:
+            uid, (_, last) = next(iter(data.items()))
+            if last > deadline and len(data) <= self.max_entries:
+                break
+            if not self.persisted(uid):
+                break
+            del data[uid]
+            self.evictions += 1
+
+    def get(self, uid, touch=True):
+        # touch=False — заглянуть, не продлевая жизнь записи (снимок для стора)
+        entry = self._data.get(uid)
+        if entry is None:
+            return None
+        if touch:
+            now = self.clock()
+            self._data[uid] = (entry[0], now)
+            self._data.move_to_end(uid)
+            self._evict(now)
+        return entry[0]
+
+    def __getitem__(self, uid):
+        user = self.get(uid)
+        if user is None:
+            raise KeyError(uid)
+        return user
+
+    def __setitem__(self, uid, user):
+        now = self.clock()
+        self._data[uid] = (user, now)
+        self._data.move_to_end(uid)
+        self.loads += 1
+        self._evict(now)
+
+    def pop(self, uid, default=None):
+        entry = self._data.pop(uid, None)
+        return default if entry is None else entry[0]
+
+    def stats(self):
+        return {
+            "size": len(self._data),
+            "loads": self.loads,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,51 @@
+from array import array
+
+from grading import compile_answers
+from templates import VerbTexts
+
+# ============================
+#  VERB CATALOG
+# ============================
+
+class VerbCatalog:
+    """Глаголы + заранее посчитанные индексы по уровням (≤ level).
+
+    Строится один раз при загрузке. Сессии выбирают глаголы по
+    индексам в `verbs`, а не по копиям словарей. Пул уровня — array('H')
+    (2 байта на глагол), общий для всех сессий этого уровня.
+    `templates` (ключ -> шаблон) рендерятся для каждого глагола сразу.
+    """
+
+    def __init__(self, verbs, templates=None):
+        self.verbs = verbs
+        self.levels = sorted({v.get("level", 1) for v in verbs})
+        self.by_inf = {v["inf"]: i for i, v in enumerate(verbs)}
+        self.answers = compile_answers(verbs)
+        self.texts = VerbTexts(templates, verbs, self.answers) if templates else None
+        self._by_level = {}
+
+        for lvl in self.levels:
+            self._by_level[lvl] = self._pool(lvl)
+
+    def __len__(self):
+        return len(self.verbs)
+
+    def __getitem__(self, idx):
+        return self.verbs[idx]
+
+    def answers_for(self, verb):
+        return self.answers[self.by_inf[verb["inf"]]]
+
+    def text(self, key, verb):
+        return self.texts.get(self.by_inf[verb["inf"]], key)
+
+    def _pool(self, level):
+        return array("H", (i for i, v in enumerate(self.verbs) if v.get("level", 1) <= level))
+
+    def indices(self, level):
+        # Уровни — маленькие целые, поэтому нестандартные значения
+        # (0, 5, ...) считаем один раз и кладём в тот же кэш
+        cached = self._by_level.get(level)
+        if cached is None:
+            cached = self._by_level[level] = self._pool(level)
+        return cached
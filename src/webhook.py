@@ -0,0 +1,127 @@
+import hmac
+import json
+
+from aiohttp import MultipartWriter, web
+
+from polling import UserOrderedWorkers
+from updates import raw_user_id
+
+try:
+    import orjson
+except ImportError:             # orjson необязателен — тогда обычный json
+    orjson = None
+
+# ============================
+#  WEBHOOK INGRESS
+# ============================
+#
+# Запрос Telegram только проверяется и кладётся в очередь: секрет,
+# разбор JSON, очередь воркера по uid — и сразу 200. Обработку ведут
+# воркеры (UserOrderedWorkers, как в polling), так что медленный
+# editMessageText не держит соединение вебхука, а апдейты одного
+# пользователя идут строго по порядку.
+#
+# Очереди ограничены. Если очередь воркера полна, апдейт сбрасывается
+# по политике `shed`: "retry" — ответить 503, Telegram пришлёт апдейт
+# ещё раз позже; "drop" — ответить 200 и потерять апдейт.
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+def loads(body):
+    return orjson.loads(body) if orjson is not None else json.loads(body)
+
+
+def method_reply(method, **params):
+    # Вызов метода в ответе на вебхук — multipart-форма, как у aiogram
+    writer = MultipartWriter("form-data")
+    for name, value in (("method", method), *params.items()):
+        part = writer.append(str(value))
+        part.set_content_disposition("form-data", name=name)
+    return writer
+
+
+class WebhookIngress:
+    """Быстрый приём вебхука с очередью и воркерами.
+
+    `answer_callbacks`: на callback_query сразу возвращаем
+    answerCallbackQuery в теле ответа (не тратим отдельный запрос),
+    обработчики получают callback_answered=True.
+    `tracker` (EditCoalescer) считает «Next» в момент постановки в
+    очередь — иначе воркер увидит их только по одному.
+    """
+
+    def __init__(self, dp, bot, workers=16, maxsize=100, secret=None, shed="retry",
+                 answer_callbacks=True, tracker=None, rejected=None, shed_counter=None,
+                 drain_timeout=10.0):
+        self.dp = dp
+        self.bot = bot
+        self.secret = secret
+        self.shed = shed
+        self.answer_callbacks = answer_callbacks
+        self.tracker = tracker
+        self.rejected = rejected
+        self.shed_counter = shed_counter
+        self.drain_timeout = drain_timeout
+        self.pool = UserOrderedWorkers(self._process, workers=workers, maxsize=maxsize,
+                                       key=lambda item: raw_user_id(item[0]))
+
+    def register(self, app, path):
+        app.router.add_post(path, self.handle)
+
+    def depth(self):
+        return self.pool.depth()
+
+    def start(self):
+        self.pool.start()
+
+    async def stop(self):
+        # Уже принятые апдейты дорабатываем: Telegram их повторно не пришлёт.
+        # Но не дольше drain_timeout — иначе недоступный Bot API держит SIGTERM
+        await self.pool.stop(drain=True, timeout=self.drain_timeout)
+
+    def _reject(self, reason, status):
+        if self.rejected is not None:
+            self.rejected.inc(reason)
+        return web.Response(status=status)
+
+    async def handle(self, request):
+        if self.secret is not None:
+            token = request.headers.get(SECRET_HEADER, "")
+            if not hmac.compare_digest(token.encode(), self.secret.encode()):
+                return self._reject("secret", 401)
+
+        try:
+            update = loads(await request.read())
+            if not isinstance(update, dict):
+                raise TypeError("update is not an object")
+            update["update_id"]
+        except (ValueError, TypeError, KeyError):
+            return self._reject("body", 400)
+
+        key = self.tracker.raw_key(update) if self.tracker is not None else None
+        if key is not None:
+            self.tracker.enter(key)
+        if not self.pool.offer((update, key)):
+            if key is not None:
+                self.tracker.leave(key)
+            if self.shed_counter is not None:
+                self.shed_counter.inc(self.shed)
+            if self.shed == "retry":
+                return web.Response(status=503)
+
+        query = update.get("callback_query")
+        if not (self.answer_callbacks and query):
+            return web.Response()
+        return web.Response(body=method_reply("answerCallbackQuery", callback_query_id=query["id"]))
+
+    async def _process(self, item):
+        update, key = item
+        try:
+            await self.dp.feed_raw_update(
+                self.bot, update,
+                callback_answered=self.answer_callbacks,
+                edit_tracked=key is not None,
+            )
+        finally:
+            if key is not None:
+                self.tracker.leave(key)
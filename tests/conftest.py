@@ -0,0 +1,33 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+os.environ.setdefault("TELEGRAM_TOKEN", "1:test")
+
+
+@pytest.fixture
+def bot_env(monkeypatch):
+    """bot_railway с каталогом, фейковым Bot API и таймерами на фейковых часах."""
+    import bot_railway
+    from fakes import UID, FakeClock, FakeSession
+    from timing_wheel import TimingWheel
+
+    # Каталог и клавиатуры — как в start_services()
+    if bot_railway.catalog is None:
+        bot_railway.reload_catalog()
+    if bot_railway.keyboards is None:
+        bot_railway.build_keyboards()
+    bot_railway.services_ready.set()
+
+    clock = FakeClock()
+    wheel = TimingWheel(clock=clock)
+    session = FakeSession()
+    monkeypatch.setattr(bot_railway, "speed_timers", wheel)
+    monkeypatch.setattr(bot_railway.bot, "session", session)
+    bot_railway.user_state.pop(UID)
+    bot_railway.users.pop(UID, None)
+    yield clock, wheel, session
+    bot_railway.user_state.pop(UID)
+    bot_railway.users.pop(UID, None)
@@ -0,0 +1,50 @@
+import datetime
+import time
+
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import EditMessageText, SendMessage
+from aiogram.types import Chat, Message
+
+UID = 42
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class FakeSession(BaseSession):
+    """Bot API без сети: запоминает тексты отправленных сообщений."""
+
+    def __init__(self):
+        super().__init__()
+        self.texts = []
+
+    async def close(self):
+        pass
+
+    async def stream_content(self, *args, **kwargs):
+        yield b""
+
+    async def make_request(self, bot, method, timeout=None):
+        if isinstance(method, (SendMessage, EditMessageText)):
+            self.texts.append(method.text)
+            return Message(
+                message_id=len(self.texts),
+                date=datetime.datetime.now(),
+                chat=Chat(id=method.chat_id or UID, type="private"),
+                text=method.text,
+            )
+        return True
+
+
+def callback(data, n, uid=UID):
+    return {"update_id": n, "callback_query": {
+        "id": str(n), "chat_instance": "s", "data": data,
+        "from": {"id": uid, "is_bot": False, "first_name": "u"},
+        "message": {"message_id": 1, "date": int(time.time()), "text": "-",
+                    "chat": {"id": uid, "type": "private"}},
+    }}
@@ -0,0 +1,39 @@
+from reminders import ReminderScheduler
+
+DAY = 86400
+NINE_UTC = 9 * 3600
+
+
+def make_scheduler():
+    return ReminderScheduler(None, at="09:00", default_tz="UTC", clock=lambda: 0.0)
+
+
+def test_fires_daily_at_local_time():
+    scheduler = make_scheduler()
+    scheduler.enable(1)
+
+    assert scheduler.pop_due(NINE_UTC - 1) == []
+    assert scheduler.pop_due(NINE_UTC) == [1]
+    assert scheduler.pop_due(NINE_UTC + 60) == []
+    assert scheduler.pop_due(DAY + NINE_UTC) == [1]
+
+
+def test_disabled_user_is_skipped():
+    scheduler = make_scheduler()
+    scheduler.enable(1)
+    scheduler.disable(1)
+
+    assert len(scheduler) == 0
+    assert scheduler.pop_due(DAY + NINE_UTC) == []
+
+
+def test_reenable_does_not_revive_old_entry():
+    # Запись, оставшаяся в куче до disable, не срабатывает после нового enable
+    scheduler = make_scheduler()
+    scheduler.enable(1)
+    scheduler.disable(1)
+    scheduler.enable(1, "Asia/Tokyo")     # 09:00 JST = 00:00 UTC
+
+    assert len(scheduler) == 1
+    assert scheduler.pop_due(NINE_UTC) == []
+    assert scheduler.pop_due(DAY) == [1]
@@ -0,0 +1,17 @@
+import asyncio
+
+import bot_railway
+from fakes import UID, callback
+
+
+def test_repeat_with_only_removed_verbs_shows_empty_message(bot_env):
+    clock, wheel, session = bot_env
+    # Карточка глагола, которого нет в каталоге (убрали при перезагрузке)
+    user = bot_railway.get_user(UID)
+    user.errors.miss("no-such-verb", "forms")
+
+    asyncio.run(bot_railway.dp.feed_raw_update(bot_railway.bot, callback("menu_repeat", 1)))
+
+    assert bot_railway.user_state.get(UID) is None
+    assert len(user.errors) == 0
+    assert session.texts and "No mistakes" in session.texts[-1]
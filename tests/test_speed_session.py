@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+
+import bot_railway
+from fakes import UID, callback
+
+
+async def feed(*datas):
+    for n, data in enumerate(datas, 1):
+        await bot_railway.dp.feed_raw_update(bot_railway.bot, callback(data, n))
+
+
+async def settle():
+    # Колбэк таймера — задача в loop; даём ей отработать
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+def test_speed_session_finishes_on_timer(bot_env):
+    clock, wheel, session = bot_env
+
+    async def scenario():
+        await feed("menu_speed")
+        st = bot_railway.user_state.get(UID)
+        assert st is not None and st.timer is not None
+        assert len(wheel) == 1
+
+        clock.now += bot_railway.SPEED_SECONDS - 1
+        assert wheel.advance() == 0
+        await settle()
+        assert bot_railway.user_state.get(UID) is st
+
+        clock.now += 1
+        assert wheel.advance() == 1
+        await settle()
+
+        assert bot_railway.user_state.get(UID) is None
+        assert any("Time is up" in text for text in session.texts)
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("action", ["speed_stop", "back"])
+def test_stop_and_back_cancel_the_timer(bot_env, action):
+    clock, wheel, session = bot_env
+
+    async def scenario():
+        await feed("menu_speed")
+        timer = bot_railway.user_state.get(UID).timer
+
+        await feed(action)
+        assert timer.cancelled
+        assert len(wheel) == 0
+        assert bot_railway.user_state.get(UID) is None
+
+        clock.now += bot_railway.SPEED_SECONDS + 1
+        assert wheel.advance() == 0
+        await settle()
+        assert not any("Time is up" in text for text in session.texts)
+
+    asyncio.run(scenario())
+
+
+def test_finish_speed_ignores_replaced_session(bot_env):
+    # Таймер старой сессии не завершает новую
+    clock, wheel, session = bot_env
+
+    async def scenario():
+        await feed("menu_speed")
+        old = bot_railway.user_state.get(UID)
+        await feed("menu_forms")
+
+        await bot_railway.finish_speed(UID, UID, old)
+        assert bot_railway.user_state.get(UID).mode == "forms"
+        assert not any("Time is up" in text for text in session.texts)
+
+    asyncio.run(scenario())
@@ -0,0 +1,114 @@
+import asyncio
+
+from fakes import FakeClock
+from timing_wheel import TimingWheel
+
+
+def make_wheel(**kwargs):
+    clock = FakeClock()
+    return TimingWheel(clock=clock, **kwargs), clock
+
+
+def test_fires_after_deadline_only():
+    wheel, clock = make_wheel()
+    fired = []
+    wheel.call_later(60, fired.append, "speed")
+
+    clock.now += 59.5
+    assert wheel.advance() == 0
+    assert fired == []
+
+    clock.now += 0.5
+    assert wheel.advance() == 1
+    assert fired == ["speed"]
+    assert len(wheel) == 0
+
+    # Второй раз не срабатывает
+    clock.now += 60
+    assert wheel.advance() == 0
+    assert fired == ["speed"]
+
+
+def test_cancelled_timer_does_not_fire():
+    wheel, clock = make_wheel()
+    fired = []
+    timer = wheel.call_later(60, fired.append, 1)
+    wheel.call_later(60, fired.append, 2)
+
+    timer.cancel()
+    assert timer.cancelled
+    assert len(wheel) == 1
+
+    clock.now += 61
+    wheel.advance()
+    assert fired == [2]
+
+
+def test_fires_in_deadline_order():
+    wheel, clock = make_wheel(tick=1.0)
+    fired = []
+    for delay in (0.9, 0.3, 0.6):
+        wheel.call_later(delay, fired.append, delay)
+
+    clock.now += 1
+    assert wheel.advance() == 3
+    assert fired == [0.3, 0.6, 0.9]
+
+
+def test_jump_past_full_rotation():
+    # Больше оборота колеса за один advance: все таймеры всё равно срабатывают
+    wheel, clock = make_wheel(tick=1.0, slots=8)
+    fired = []
+    for delay in range(1, 21):
+        wheel.call_later(delay, fired.append, delay)
+
+    clock.now += 100
+    assert wheel.advance() == 20
+    assert fired == list(range(1, 21))
+
+
+def test_late_timer_is_kept_for_next_rotation():
+    wheel, clock = make_wheel(tick=1.0, slots=8)
+    fired = []
+    wheel.call_later(20, fired.append, "late")
+
+    # Слот таймера проходится раньше его оборота
+    clock.now += 4
+    wheel.advance()
+    clock.now += 8
+    wheel.advance()
+    assert fired == []
+
+    clock.now += 8
+    wheel.advance()
+    assert fired == ["late"]
+
+
+def test_coroutine_callback_is_scheduled():
+    async def scenario():
+        wheel, clock = make_wheel()
+        done = asyncio.Event()
+
+        async def callback():
+            done.set()
+
+        wheel.call_later(1, callback)
+        clock.now += 1
+        wheel.advance()
+        await asyncio.wait_for(done.wait(), 1)
+
+    asyncio.run(scenario())
+
+
+def test_failing_callback_does_not_stop_others():
+    wheel, clock = make_wheel()
+    fired = []
+
+    def boom():
+        raise RuntimeError("boom")
+
+    wheel.call_later(1, boom)
+    wheel.call_later(2, fired.append, "ok")
+    clock.now += 2
+    assert wheel.advance() == 2
+    assert fired == ["ok"]
@@ -0,0 +1,55 @@
+import asyncio
+
+from fakes import FakeClock
+from storage import SqliteStore
+from users import UserCache, UserRecord
+
+TTL = 60
+
+
+def test_idle_record_is_evicted_only_after_flush(tmp_path):
+    async def scenario():
+        clock = FakeClock()
+        store = SqliteStore(str(tmp_path / "users.db"), lambda uid: users.get(uid, touch=False).to_json())
+        users = UserCache(ttl=TTL, persisted=lambda uid: not store.is_pending(uid), clock=clock)
+        await store.start()
+
+        users[1] = UserRecord(level=2)
+        store.mark_dirty(1)
+
+        clock.now += TTL + 1
+        users[2] = UserRecord()
+        assert 1 in users           # ещё не в базе — не выселяем
+
+        await store.flush()
+        clock.now += TTL + 1
+        users[3] = UserRecord()
+        assert 1 not in users and 2 not in users
+        assert users.stats()["evictions"] == 2
+
+        # Выселенная запись возвращается из базы как была
+        assert UserRecord.from_json(store.load(1)).level == 2
+        await store.close()
+
+    asyncio.run(scenario())
+
+
+def test_over_limit_keeps_unsaved_records():
+    pending = {1}
+    users = UserCache(max_entries=2, persisted=lambda uid: uid not in pending, clock=FakeClock())
+    for uid in (1, 2, 3):
+        users[uid] = UserRecord()
+    assert len(users) == 3
+
+    pending.clear()
+    users.get(3)
+    assert 1 not in users and len(users) == 2
+
+
+def test_without_store_nothing_is_evicted():
+    clock = FakeClock()
+    users = UserCache(max_entries=1, ttl=TTL, clock=clock)
+    users[1] = UserRecord()
+    clock.now += TTL + 1
+    users[2] = UserRecord()
+    assert 1 in users and 2 in users